@@ -0,0 +1,403 @@
+# Jeu de données synthétique et banc d'essai des requêtes de ReleasesDB.
+#   python bench_db.py generate --rows 1m [--db bench_1m.db] [--seed 1] [--years 5] [--end AAAA-MM-JJ]
+#   python bench_db.py run --db bench_1m.db [--repeat 3] [--quick] [--out rapport.json]
+#   python bench_db.py compare avant.json apres.json [--threshold 1.2]
+# `generate` remplit une base au schéma de irc_logs.db avec des releases de style
+# scène (types, channels, nicks et dates sur plusieurs années); `run` chronomètre
+# chaque combinaison filtre/tri des appels faits par /api/releases, /api/page,
+# /api/count, /api/filters et la GUI (pages, défilement virtuel, mode live), et
+# produit un rapport JSON comparable d'une exécution à l'autre.
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+from releases_db import ReleasesDB
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+INSERT_BATCH = 50_000
+
+# --- Génération ---
+
+# Types et poids observés sur les channels de pre (TV et films dominent)
+TYPES = [
+    ("TV", 30), ("X264", 14), ("FOREIGN", 10), ("MP3", 12), ("FLAC", 6), ("UHD", 5),
+    ("BLURAY", 3), ("GAMES", 6), ("EBOOKS", 5), ("PRE", 9),
+]
+SERVERS = [("tardis.swiftirc.net", 70), ("irc.swiftirc.net", 20), ("irc.epiknet.org", 10)]
+CHANNELS = [("#dupefr-pre", 55), ("#dupefr", 20), ("#pre-fr", 12), ("#scene-fr", 8), ("#mp3-fr", 5)]
+NICKS = [("DupeFR", 50), ("PreBot", 18), ("FRpre", 10), ("Announcer", 8), ("SceneBot", 6)] + \
+        [(f"bot{i:02d}", 1) for i in range(8)]
+GROUPS = ["BAWLS", "VETO", "BDA", "FtLi", "EXTREME", "LAZARUS", "FRATERNiTY", "SUPPLY", "NEWCINE", "SERQPH",
+          "ARK01", "TFA", "HiggsBoson", "QTZ", "FUNKY", "MARCHANDS", "FCK", "SANCTUARY", "DUSTiN", "SO",
+          "ALLiANCE", "WEEZ", "AMB3R", "UKDHD", "R3MiX", "PREUMS", "FiDELiO", "TiMELiNE", "LiBERTAD", "GUACAMOLE"]
+WORDS = ["la", "le", "les", "nuit", "jour", "maison", "secret", "dernier", "amour", "guerre", "temps", "monde",
+         "ombre", "lumiere", "coeur", "route", "ville", "histoire", "enfants", "famille", "retour", "fin", "reve",
+         "silence", "ange", "diable", "roi", "reine", "mer", "terre", "feu", "ciel", "loup", "chasse", "piege",
+         "mission", "justice", "destin", "vengeance", "souvenir", "voyage", "frontiere", "empire", "legende",
+         "mystere", "paradis", "enfer", "tempete", "etoile", "soleil", "lune", "hiver", "ete", "printemps",
+         "automne", "minuit", "aube", "crepuscule", "echo", "miroir", "cle", "porte", "ile", "montagne", "riviere",
+         "foret", "desert", "ocean", "volcan", "glace", "sang", "or", "argent", "fer", "pierre", "verre", "papier",
+         "the", "dark", "last", "lost", "night", "house", "city", "blood", "king", "queen", "war", "love", "game"]
+ARTISTS = ["Kata", "Zaz", "Orelsan", "Nekfeu", "Angele", "Stromae", "Indochine", "Aya", "Vianney", "Soprano",
+           "Jul", "Damso", "Louane", "Christine", "Gims", "Booba", "Pomme", "Calogero", "Bigflo", "Oli"]
+
+
+def _weighted(pairs):
+    values = [v for v, _ in pairs]
+    weights = [w for _, w in pairs]
+    return values, weights
+
+
+def _title(rng: random.Random, words: int) -> list[str]:
+    return [rng.choice(WORDS).capitalize() for _ in range(words)]
+
+
+def scene_name(rng: random.Random, rtype: str, year: int) -> str:
+    """Nom de release plausible pour un type (conventions de nommage de la scène)."""
+    group = rng.choice(GROUPS)
+    if rtype == "TV":
+        show = ".".join(_title(rng, rng.randint(1, 3)))
+        res = rng.choice(["", "720p.", "1080p.", "1080p."])
+        return f"{show}.S{rng.randint(1, 12):02d}E{rng.randint(1, 24):02d}.FRENCH.{res}WEB.x264-{group}"
+    if rtype in ("X264", "FOREIGN", "BLURAY", "UHD"):
+        movie = ".".join(_title(rng, rng.randint(1, 4)))
+        lang = rng.choice(["FRENCH", "MULTi", "TRUEFRENCH", "VOSTFR"])
+        if rtype == "UHD":
+            return f"{movie}.{year}.{lang}.2160p.UHD.BluRay.x265-{group}"
+        if rtype == "BLURAY":
+            return f"{movie}.{year}.COMPLETE.BLURAY-{group}"
+        return f"{movie}.{year}.{lang}.{rng.choice(['720p', '1080p', 'BDRip'])}.BluRay.x264-{group}"
+    if rtype in ("MP3", "FLAC"):
+        artist = rng.choice(ARTISTS) + rng.choice(["", "_feat-" + rng.choice(ARTISTS)])
+        album = "_".join(_title(rng, rng.randint(1, 3)))
+        src = "WEB-FR-FLAC" if rtype == "FLAC" else rng.choice(["FR", "WEB-FR", "CD-FR"])
+        return f"{artist}-{album}-{src}-{year}-{group}"
+    if rtype == "GAMES":
+        return f"{'.'.join(_title(rng, rng.randint(1, 3)))}.MULTi{rng.randint(2, 12)}-{group}"
+    if rtype == "EBOOKS":
+        return f"{rng.choice(ARTISTS)}.{'.'.join(_title(rng, rng.randint(2, 4)))}.{year}.FRENCH.EPUB.eBook-{group}"
+    # PRE: étiquettes de tête comme dans les annonces réelles
+    return f"[PRE] [{rng.choice(['TV', 'X264', 'MP3'])}] {'.'.join(_title(rng, 3))}.{year}.FRENCH-{group}"
+
+
+def iter_rows(count: int, seed: int = 1, years: float = 5.0, end: datetime | None = None):
+    """Lignes (ts, ts_iso, server, channel, nick, message, type), par ts croissant comme le logger."""
+    rng = random.Random(seed)
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_ts = int(end.timestamp())
+    start_ts = int((end - timedelta(days=365 * years)).timestamp())
+    step = (end_ts - start_ts) / max(count, 1)
+    types, type_w = _weighted(TYPES)
+    servers, server_w = _weighted(SERVERS)
+    channels, channel_w = _weighted(CHANNELS)
+    nicks, nick_w = _weighted(NICKS)
+    ts = float(start_ts)
+    for _ in range(count):
+        # Intervalles exponentiels: rafales et creux autour du débit moyen
+        ts += rng.expovariate(1.0 / step) if step > 0 else 0
+        its = min(int(ts), end_ts)
+        dt = datetime.fromtimestamp(its)
+        rtype = rng.choices(types, type_w)[0]
+        yield (
+            its,
+            dt.strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choices(servers, server_w)[0],
+            rng.choices(channels, channel_w)[0],
+            rng.choices(nicks, nick_w)[0],
+            scene_name(rng, rtype, dt.year - rng.choice((0, 0, 0, 1, 2, 5))),
+            rtype,
+        )
+
+
+def generate(db_path: str, count: int, seed: int = 1, years: float = 5.0, end: datetime | None = None,
+             force: bool = False, progress=print) -> dict:
+    if os.path.exists(db_path):
+        if not force:
+            raise FileExistsError(f"{db_path} existe déjà (--force pour le remplacer)")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    started = time.perf_counter()
+    # Schéma créé par ReleasesDB; l'index est reconstruit après le chargement (plus rapide)
+    db = ReleasesDB(db_path)
+    db.conn.execute("DROP INDEX IF EXISTS idx_message")
+    db.conn.execute("PRAGMA synchronous=OFF")
+    sql = "INSERT INTO releases (ts, ts_iso, server, channel, nick, message, type) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    batch = []
+    done = 0
+    for row in iter_rows(count, seed=seed, years=years, end=end):
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            db.conn.executemany(sql, batch)
+            db.conn.commit()
+            done += len(batch)
+            batch.clear()
+            progress(f"  {done}/{count} lignes")
+    if batch:
+        db.conn.executemany(sql, batch)
+        db.conn.commit()
+    load_s = time.perf_counter() - started
+    db.conn.close()
+    ReleasesDB(db_path).conn.close()
+    return {"rows": count, "seed": seed, "years": years, "load_s": load_s,
+            "total_s": time.perf_counter() - started, "bytes": os.path.getsize(db_path)}
+
+
+# --- Banc d'essai ---
+
+SORT_COLUMNS = ("id", "ts", "ts_iso", "server", "channel", "nick", "message", "type")
+# Tris proposés par défaut (en-têtes cliqués dans la GUI et la Web UI)
+QUICK_SORTS = {
+    "default": None,
+    "ts:DESC": [("ts", "DESC")],
+    "id:DESC": [("id", "DESC")],
+    "message:ASC": [("message", "ASC")],
+}
+PAGE_LIMIT = 100
+DEEP_OFFSET = 10_000
+
+
+def all_sorts() -> dict:
+    sorts = {"default": None}
+    for col in SORT_COLUMNS:
+        for direction in ("ASC", "DESC"):
+            sorts[f"{col}:{direction}"] = [(col, direction)]
+    # Tri multi-colonnes (Maj+clic dans la GUI)
+    sorts["type:ASC,ts:DESC"] = [("type", "ASC"), ("ts", "DESC")]
+    return sorts
+
+
+def _top_value(db: ReleasesDB, column: str, rare: bool = False):
+    order = "ASC" if rare else "DESC"
+    with db.lock:
+        row = db.conn.execute(
+            f"SELECT {column}, COUNT(*) AS n FROM releases WHERE {column} <> '' "
+            f"GROUP BY {column} ORDER BY n {order} LIMIT 1"
+        ).fetchone()
+    return row[0] if row else ""
+
+
+def filter_sets(db: ReleasesDB) -> dict:
+    """Filtres représentatifs, tirés des données (fonctionne aussi sur une vraie base)."""
+    with db.lock:
+        lo, hi, sample = db.conn.execute(
+            "SELECT MIN(ts_iso), MAX(ts_iso), (SELECT message FROM releases ORDER BY id DESC LIMIT 1) FROM releases"
+        ).fetchone()
+    if hi is None:
+        return {"none": {}}
+    last = datetime.strptime(hi[:10], "%Y-%m-%d")
+    day = last.strftime("%Y-%m-%d")
+    month_ago = (last - timedelta(days=30)).strftime("%Y-%m-%d")
+    year_ago = (last - timedelta(days=365)).strftime("%Y-%m-%d")
+    common_type = _top_value(db, "type")
+    # Terme fréquent (partie d'un nom) et nom exact d'une release (très sélectif)
+    common_term = "1080p" if "1080p" in (sample or "") else (sample or "a").split(".")[0][:4]
+    return {
+        "none": {},
+        "type": {"type": common_type},
+        "type-rare": {"type": _top_value(db, "type", rare=True)},
+        "channel": {"channel": _top_value(db, "channel")},
+        "nick-rare": {"nick": _top_value(db, "nick", rare=True)},
+        "server": {"server": _top_value(db, "server")},
+        "query-common": {"query": common_term},
+        "query-exact": {"query": sample or ""},
+        "date-day": {"date_from": day, "date_to": day},
+        "date-month": {"date_from": month_ago, "date_to": day},
+        "combined": {"type": common_type, "query": common_term, "date_from": year_ago, "date_to": day},
+        "all-filters": {"server": _top_value(db, "server"), "channel": _top_value(db, "channel"),
+                        "nick": _top_value(db, "nick"), "type": common_type, "date_from": lo[:10], "date_to": day},
+    }
+
+
+def _cases(db: ReleasesDB, sorts: dict):
+    """(op, filtre, tri, fonction) pour chaque appel mesuré."""
+    filters = filter_sets(db)
+    max_id = db.max_id()
+    for fname, flt in filters.items():
+        # Indépendants du tri
+        yield "count", fname, None, lambda f=flt: db.count(f)
+        yield "count_bounded", fname, None, lambda f=flt: db.count_bounded(f, 1000)
+        yield "search_since", fname, None, lambda f=flt: db.search_since(f, max(max_id - 1000, 0), limit=PAGE_LIMIT)
+        for sname, order in sorts.items():
+            yield "search", fname, sname, lambda f=flt, o=order: db.search(f, limit=PAGE_LIMIT, order_by=o)
+            yield "search_deep", fname, sname, \
+                lambda f=flt, o=order: db.search(f, limit=PAGE_LIMIT, offset=DEEP_OFFSET, order_by=o)
+            yield "search_page", fname, sname, \
+                lambda f=flt, o=order: db.search_page(f, limit=PAGE_LIMIT, order_by=o, count_mode="estimate")
+            yield "keyset", fname, sname, lambda f=flt, o=order: _keyset_two_pages(db, f, o)
+    for column in ("server", "channel", "nick", "type"):
+        yield "distinct_values", column, None, lambda c=column: db.distinct_values(c)
+
+
+def _keyset_two_pages(db: ReleasesDB, flt: dict, order):
+    # Défilement virtuel: première fenêtre puis la suivante par clé
+    rows = db.search_keyset(flt, order_by=order, limit=PAGE_LIMIT)
+    if rows:
+        rows = rows + db.search_keyset(flt, order_by=order, limit=PAGE_LIMIT, after=db.keyset_key(rows[-1], order))
+    return rows
+
+
+def _measure(fn, repeat: int) -> dict:
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    if isinstance(result, dict):
+        result = result["rows"]
+    n = result if isinstance(result, int) else len(result) if result is not None else 0
+    return {
+        "first_ms": samples[0] * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        "result": n,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BASE_DIR)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(db_path: str, repeat: int = 3, quick: bool = False, match: str | None = None, progress=print) -> dict:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    db = ReleasesDB(db_path)
+    sorts = QUICK_SORTS if quick else all_sorts()
+    results = []
+    started = time.perf_counter()
+    for op, fname, sname, fn in _cases(db, sorts):
+        name = f"{op}/{fname}" + (f"/{sname}" if sname else "")
+        if match and match not in name:
+            continue
+        entry = {"name": name, "op": op, "filter": fname, "sort": sname}
+        try:
+            entry.update(_measure(fn, repeat))
+        except sqlite3.Error as e:
+            entry["error"] = str(e)
+        results.append(entry)
+        progress(_format_case(entry))
+    return {
+        "meta": {
+            "db": os.path.abspath(db_path),
+            "rows": db.count({}),
+            "bytes": os.path.getsize(db_path),
+            "repeat": repeat,
+            "quick": quick,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "total_s": time.perf_counter() - started,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "commit": git_commit(),
+        },
+        "filters": filter_sets(db),
+        "cases": results,
+    }
+
+
+def _format_case(entry: dict) -> str:
+    if "error" in entry:
+        return f"  {entry['name']}: erreur {entry['error']}"
+    return f"  {entry['median_ms']:9.2f} ms (1er {entry['first_ms']:9.2f})  {entry['result']:>8}  {entry['name']}"
+
+
+def compare(base: dict, new: dict) -> list:
+    """Cas communs aux deux rapports: (nom, médiane avant, après, ratio), plus lents d'abord."""
+    before = {c["name"]: c for c in base["cases"] if "median_ms" in c}
+    rows = []
+    for c in new["cases"]:
+        old = before.get(c["name"])
+        if old is None or "median_ms" not in c:
+            continue
+        ratio = c["median_ms"] / old["median_ms"] if old["median_ms"] > 0 else float("inf")
+        rows.append((c["name"], old["median_ms"], c["median_ms"], ratio))
+    rows.sort(key=lambda r: r[3], reverse=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jeu de données synthétique et banc d'essai de ReleasesDB")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_gen = sub.add_parser("generate", help="Créer une base synthétique")
+    p_gen.add_argument("--rows", default="100k", help="Nombre de lignes: 100k, 1m, 10m ou un entier")
+    p_gen.add_argument("--db", help="Fichier de sortie (par défaut bench_<rows>.db)")
+    p_gen.add_argument("--seed", type=int, default=1)
+    p_gen.add_argument("--years", type=float, default=5.0, help="Étendue des dates (années jusqu'à aujourd'hui)")
+    p_gen.add_argument("--end", help="Date de la dernière release (AAAA-MM-JJ, par défaut aujourd'hui): "
+                                      "même graine et même date donnent la même base")
+    p_gen.add_argument("--force", action="store_true", help="Remplacer le fichier s'il existe")
+
+    p_run = sub.add_parser("run", help="Chronométrer les requêtes sur une base")
+    p_run.add_argument("--db", required=True)
+    p_run.add_argument("--repeat", type=int, default=3)
+    p_run.add_argument("--quick", action="store_true", help="Quelques tris seulement")
+    p_run.add_argument("--match", help="Ne mesurer que les cas dont le nom contient ce texte")
+    p_run.add_argument("--out", help="Écrire le rapport JSON dans ce fichier")
+    p_run.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+
+    p_cmp = sub.add_parser("compare", help="Comparer deux rapports JSON")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=1.2, help="Ratio signalé comme régression")
+    args = parser.parse_args()
+
+    if args.cmd == "generate":
+        count = SIZES.get(args.rows.lower()) or int(args.rows)
+        db_path = args.db or os.path.join(BASE_DIR, f"bench_{args.rows.lower()}.db")
+        try:
+            end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else None
+            info = generate(db_path, count, seed=args.seed, years=args.years, end=end, force=args.force)
+        except FileExistsError as e:
+            sys.exit(str(e))
+        print(f"{db_path}: {info['rows']} lignes en {info['total_s']:.1f} s "
+              f"(chargement {info['load_s']:.1f} s), {info['bytes'] / 1e6:.1f} Mo")
+        return
+
+    if args.cmd == "run":
+        progress = (lambda text: print(text, file=sys.stderr)) if args.json else print
+        try:
+            report = run(args.db, repeat=args.repeat, quick=args.quick, match=args.match, progress=progress)
+        except FileNotFoundError:
+            sys.exit(f"Base introuvable: {args.db}")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            meta = report["meta"]
+            print(f"{len(report['cases'])} cas sur {meta['rows']} lignes en {meta['total_s']:.1f} s"
+                  + (f", rapport: {args.out}" if args.out else ""))
+        return
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = 0
+    for name, before, after, ratio in compare(base, new):
+        flag = "  <-- plus lent" if ratio >= args.threshold else ""
+        regressions += bool(flag)
+        print(f"{ratio:6.2f}x  {before:9.2f} -> {after:9.2f} ms  {name}{flag}")
+    print(f"{regressions} cas au-delà de {args.threshold:g}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+# Essai de bout en bout du moteur de téléchargement (ftp_transfer.py) contre le
+# serveur local de ftp_standin.py, sans site distant:
+#   python bench_ftp.py [--releases 6] [--files 4] [--size 1m] [--rate 4m] [--parallel 1,2,4]
+#                       [--tls] [--out rapport.json]
+# Un arbre de releases synthétiques (archives, Sample/, Subs/, .nfo) est servi par
+# le serveur de test; la file (transfer_jobs) et les téléchargements sont dans un
+# répertoire temporaire. Scénarios, chacun vérifié octet par octet:
+# - parallel: toute la file à chaque niveau de max_parallel; durée, débit et
+#   transferts simultanés vus par le serveur;
+# - nlst: même chose quand le serveur refuse MLSD (repli NLST + SIZE/CWD);
+# - resume-cut: chaque fichier est coupé une fois en cours de route; les jobs
+#   échouent, « Relancer » reprend par REST sans retélécharger;
+# - resume-stop: arrêt du moteur au milieu de la file, nouveau moteur: les jobs
+#   remis en file reprennent là où ils s'étaient arrêtés;
+# - claim: plusieurs processus (GUI, ligne de commande), chacun sa file sur la
+#   même base, se disputent les jobs; chaque job est pris une fois;
+# - ftpes / ftps: parallel avec TLS explicite et implicite (--tls).
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+import bench_db
+import ftp_standin
+import ftp_transfer
+
+RELEASE_TYPE = "TV"
+REMOTE_BASE = "/incoming/tv"
+
+
+def make_tree(root: str, releases: int, files: int, size: int, seed: int) -> list[dict]:
+    """Releases synthétiques sous root + REMOTE_BASE; renvoie les lignes « releases » à mettre en file."""
+    import random
+    rng = random.Random(seed)
+    base = os.path.join(root, *REMOTE_BASE.strip("/").split("/"))
+    rows = []
+    for i in range(releases):
+        name = bench_db.scene_name(rng, "TV", datetime.now().year)
+        rel_dir = os.path.join(base, name)
+        os.makedirs(os.path.join(rel_dir, "Sample"), exist_ok=True)
+        os.makedirs(os.path.join(rel_dir, "Subs"), exist_ok=True)
+        parts = [f"{name.lower()}.rar"] + [f"{name.lower()}.r{n:02d}" for n in range(files - 1)]
+        content = [(os.path.join(rel_dir, p), size) for p in parts]
+        content += [
+            (os.path.join(rel_dir, "Sample", f"{name.lower()}-sample.mkv"), max(1, size // 4)),
+            (os.path.join(rel_dir, "Subs", f"{name.lower()}.subs.rar"), max(1, size // 16)),
+            (os.path.join(rel_dir, f"{name.lower()}.nfo"), 2048),
+        ]
+        for path, n in content:
+            with open(path, "wb") as f:
+                f.write(rng.randbytes(n))
+        rows.append({"id": i + 1, "message": name, "type": RELEASE_TYPE})
+    return rows
+
+
+def _digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def verify(remote_root: str, local_root: str) -> dict:
+    """Compare l'arbre téléchargé à la source: fichiers manquants, différents, en trop."""
+    src = os.path.join(remote_root, *REMOTE_BASE.strip("/").split("/"))
+    dst = os.path.join(local_root, RELEASE_TYPE)
+    expected = {os.path.relpath(os.path.join(d, f), src) for d, _, fs in os.walk(src) for f in fs}
+    got = {os.path.relpath(os.path.join(d, f), dst) for d, _, fs in os.walk(dst) for f in fs} \
+        if os.path.isdir(dst) else set()
+    different = [p for p in sorted(expected & got) if _digest(os.path.join(src, p)) != _digest(os.path.join(dst, p))]
+    return {"files": len(expected), "missing": len(expected - got), "different": len(different),
+            "extra": len(got - expected), "ok": expected == got and not different}
+
+
+class Run:
+    """Une file neuve (base et dossier local) contre un serveur de test."""
+
+    def __init__(self, workdir: str, name: str, server, rows, parallel: int, protocol: str = "ftp"):
+        self.local = os.path.join(workdir, f"dl-{name}")
+        self.server = server
+        self.site = {
+            "name": "standin", "protocol": protocol, "host": "127.0.0.1", "port": server.port,
+            "user": server.user, "pass": server.password, "local_base_dir": self.local,
+            "name_transform": "raw", "base_paths": {"default": REMOTE_BASE}, "max_parallel": parallel,
+            "tls_verify": False,
+        }
+        self.queue = ftp_transfer.TransferQueue(os.path.join(workdir, f"queue-{name}.db"))
+        self.ids = self.queue.enqueue(self.site, rows)
+        self.engine = None
+
+    def start(self):
+        self.engine = ftp_transfer.TransferEngine(self.queue, load_site=lambda site_name=None: dict(self.site),
+                                                  poll_interval=0.2)
+        self.engine.start()
+
+    def wait(self, timeout: float, until=None) -> bool:
+        """Attend la file vide (ou until(jobs) vrai); faux au bout de timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if until is not None and until(self.queue.jobs()):
+                return True
+            if until is None and self.engine.is_idle():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def stop(self):
+        if self.engine is not None:
+            self.engine.stop()
+
+    def summary(self) -> dict:
+        jobs = self.queue.jobs()
+        statuses = {}
+        for job in jobs:
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "jobs": len(jobs),
+            "statuses": statuses,
+            "bytes_total": sum(j["bytes_total"] for j in jobs),
+            "bytes_transferred": sum(j["bytes_transferred"] for j in jobs),
+            "attempts": sum(j["attempts"] for j in jobs),
+            "errors": sorted({j["error"] for j in jobs if j["error"]})[:5],
+        }
+
+
+def scenario_parallel(workdir, server, rows, parallel: int, timeout: float, label: str = "parallel",
+                      protocol: str = "ftp") -> dict:
+    server.reset_stats()
+    run = Run(workdir, f"{label}-{protocol}-{parallel}", server, rows, parallel, protocol)
+    t0 = time.perf_counter()
+    run.start()
+    finished = run.wait(timeout)
+    elapsed = time.perf_counter() - t0
+    run.stop()
+    out = {"scenario": label, "protocol": protocol, "parallel": parallel, "finished": finished,
+           "elapsed_s": round(elapsed, 3), **run.summary(), "server": dict(server.stats),
+           "check": verify(server.root, run.local)}
+    out["mb_per_s"] = round(out["bytes_transferred"] / elapsed / 1048576, 2) if elapsed else 0.0
+    # Le serveur doit avoir vu autant de transferts simultanés que de connexions permises
+    out["ok"] = finished and out["check"]["ok"] and server.stats["peak_active"] == min(parallel, len(rows))
+    return out
+
+
+def scenario_resume_cut(workdir, server, rows, parallel: int, timeout: float, cut_after: int) -> dict:
+    server.reset_stats()
+    server.cut_after = cut_after
+    run = Run(workdir, "resume-cut", server, rows, parallel)
+    failed_first, rounds = 0, 0
+    max_rounds = sum(len(fs) for _, _, fs in os.walk(server.root))
+    try:
+        run.start()
+        finished = run.wait(timeout)
+        # Un fichier coupé fait échouer son job: « Relancer » (fenêtre Transferts)
+        # jusqu'au bout, une coupure par fichier au plus
+        while finished:
+            failed = [j["id"] for j in run.queue.jobs() if j["status"] == "failed"]
+            if not failed or rounds > max_rounds:
+                break
+            failed_first = failed_first or len(failed)
+            rounds += 1
+            run.queue.retry(failed)
+            run.engine.wake()
+            finished = run.wait(timeout)
+    finally:
+        run.stop()
+        server.cut_after = 0
+    summary = run.summary()
+    check = verify(server.root, run.local)
+    return {"scenario": "resume-cut", "parallel": parallel, "finished": finished, "failed_first": failed_first,
+            "retry_rounds": rounds,
+            **summary, "server": dict(server.stats), "check": check,
+            # Chaque octet n'est transféré qu'une fois: reprise par REST, pas de nouveau départ
+            "ok": finished and check["ok"] and failed_first > 0 and server.stats["resumed"] > 0
+            and summary["bytes_transferred"] == summary["bytes_total"]}
+
+
+def scenario_resume_stop(workdir, server, rows, parallel: int, timeout: float) -> dict:
+    server.reset_stats()
+    run = Run(workdir, "resume-stop", server, rows, parallel)
+    src = os.path.join(server.root, *REMOTE_BASE.strip("/").split("/"))
+    total = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(src) for f in fs)
+    try:
+        run.start()
+        run.wait(timeout, until=lambda jobs: sum(j["bytes_done"] for j in jobs) >= total * 0.4)
+        # Arrêt du moteur (fermeture de la GUI): les jobs en cours reviennent en file
+        run.stop()
+        requeued = sum(1 for j in run.queue.jobs() if j["status"] == "queued")
+        run.start()
+        finished = run.wait(timeout)
+    finally:
+        run.stop()
+    summary = run.summary()
+    check = verify(server.root, run.local)
+    return {"scenario": "resume-stop", "parallel": parallel, "finished": finished, "requeued": requeued,
+            **summary, "server": dict(server.stats), "check": check,
+            "ok": finished and check["ok"] and requeued > 0 and server.stats["resumed"] > 0
+            and summary["bytes_transferred"] == total}
+
+
+def _claim_all(db_path: str, site_name: str, start, out):
+    # Processus concurrent (GUI, ligne de commande...): prend des jobs jusqu'à file vide
+    queue = ftp_transfer.TransferQueue(db_path)
+    start.wait()
+    got = []
+    try:
+        while True:
+            job = queue.claim(site_name)
+            if job is None:
+                break
+            got.append(job["id"])
+    finally:
+        queue.conn.close()
+        out.put(got)
+
+
+def scenario_claim(workdir, jobs: int = 300, processes: int = 4) -> dict:
+    """Plusieurs processus, chacun sa TransferQueue sur le même fichier: chaque job pris une fois."""
+    import multiprocessing
+    db_path = os.path.join(workdir, "queue-claim.db")
+    site = {"name": "standin", "local_base_dir": os.path.join(workdir, "dl-claim"),
+            "name_transform": "raw", "base_paths": {"default": REMOTE_BASE}}
+    rows = [{"id": i + 1, "message": f"Claim.Test.S01E{i + 1:03d}-GRP", "type": RELEASE_TYPE} for i in range(jobs)]
+    queue = ftp_transfer.TransferQueue(db_path)
+    ids = queue.enqueue(site, rows)
+    start = multiprocessing.Barrier(processes)
+    out = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_claim_all, args=(db_path, site["name"], start, out))
+               for _ in range(processes)]
+    t0 = time.perf_counter()
+    for p in workers:
+        p.start()
+    claimed = [out.get(timeout=60) for _ in workers]
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - t0
+    flat = [i for got in claimed for i in got]
+    duplicates = len(flat) - len(set(flat))
+    attempts = sum(j["attempts"] for j in queue.jobs())
+    queue.conn.close()
+    return {"scenario": "claim", "parallel": processes, "elapsed_s": round(elapsed, 3), "jobs": len(ids),
+            "claimed": len(flat), "duplicates": duplicates, "per_queue": [len(got) for got in claimed],
+            "attempts": attempts,
+            # Toutes les prises réussies, aucune deux fois, aucune tentative fantôme en base
+            "ok": sorted(flat) == sorted(ids) and duplicates == 0 and attempts == len(ids)}
+
+
+def _print(result: dict):
+    if result["scenario"] == "claim":
+        status = "OK " if result["ok"] else "ÉCHEC"
+        print(f"[{status}] {'claim':<12} {'-':<6} x{result['parallel']}  {result['claimed']}/{result['jobs']} jobs pris "
+              f"({' + '.join(map(str, result['per_queue']))} par processus), {result['duplicates']} en double, "
+              f"{result['elapsed_s']:.2f} s")
+        return
+    status = "OK " if result["ok"] else "ÉCHEC"
+    detail = f"{result['scenario']:<12} {result.get('protocol', 'ftp'):<6} x{result['parallel']}"
+    check = result["check"]
+    extra = ""
+    if "elapsed_s" in result:
+        extra = f"{result['elapsed_s']:7.2f} s {result['mb_per_s']:7.2f} Mo/s, pic {result['server']['peak_active']} transferts"
+    elif result["scenario"] == "resume-cut":
+        extra = (f"{result['failed_first']} jobs coupés, {result['retry_rounds']} relances, "
+                 f"{result['server']['resumed']} reprises REST")
+    else:
+        extra = f"{result['requeued']} jobs remis en file, {result['server']['resumed']} reprises REST"
+    print(f"[{status}] {detail}  {extra}; {check['files']} fichiers, {check['missing']} manquants, "
+          f"{check['different']} différents, {result['bytes_transferred']}/{result['bytes_total']} octets transférés")
+    if result.get("errors") and not result["ok"]:
+        print(f"        erreurs: {'; '.join(result['errors'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Essai du moteur de téléchargement contre un serveur FTP local")
+    parser.add_argument("--releases", type=int, default=6)
+    parser.add_argument("--files", type=int, default=4, help="Archives par release (plus Sample, Subs, .nfo)")
+    parser.add_argument("--size", default="1m", help="Taille d'une archive (ex. 512k, 4m)")
+    parser.add_argument("--rate", default="4m", help="Débit par transfert du serveur (0: illimité)")
+    parser.add_argument("--parallel", default="1,2,4", help="Niveaux de max_parallel testés")
+    parser.add_argument("--scenarios", default="claim,parallel,nlst,resume-cut,resume-stop")
+    parser.add_argument("--tls", action="store_true", help="Ajoute parallel en ftpes et ftps implicite")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Attente maximale par scénario (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="Garder le répertoire de travail")
+    parser.add_argument("--out", help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    args = parser.parse_args()
+
+    log = (lambda text: print(text, file=sys.stderr)) if args.json else print
+    size = ftp_standin.parse_size(args.size)
+    rate = ftp_standin.parse_size(args.rate)
+    levels = [int(p) for p in args.parallel.split(",") if p.strip()]
+    scenarios = {s.strip() for s in args.scenarios.split(",") if s.strip()}
+    workdir = tempfile.mkdtemp(prefix="bench_ftp-")
+    remote_root = os.path.join(workdir, "remote")
+    started = datetime.now().isoformat(timespec="seconds")
+    results = []
+    try:
+        if "claim" in scenarios:
+            log("claim...")
+            results.append(scenario_claim(workdir))
+        log(f"Arbre de test: {args.releases} releases de {args.files} x {args.size} dans {remote_root}")
+        rows = make_tree(remote_root, args.releases, args.files, size, args.seed)
+        server = ftp_standin.FtpStandin(remote_root, rate=rate)
+        try:
+            if "parallel" in scenarios:
+                for parallel in levels:
+                    log(f"parallel x{parallel}...")
+                    results.append(scenario_parallel(workdir, server, rows, parallel, args.timeout))
+            if "resume-cut" in scenarios:
+                log("resume-cut...")
+                results.append(scenario_resume_cut(workdir, server, rows, max(levels), args.timeout,
+                                                   cut_after=size // 3))
+            if "resume-stop" in scenarios:
+                log("resume-stop...")
+                results.append(scenario_resume_stop(workdir, server, rows, max(levels), args.timeout))
+        finally:
+            server.close()
+        if "nlst" in scenarios:
+            log("nlst...")
+            server = ftp_standin.FtpStandin(remote_root, rate=rate, mlsd=False)
+            try:
+                results.append(scenario_parallel(workdir, server, rows, max(levels), args.timeout, label="nlst"))
+            finally:
+                server.close()
+        if args.tls:
+            import irc_standin
+            context, _cert = irc_standin.self_signed_context(workdir)
+            for tls, protocol in (("explicit", "ftpes"), ("implicit", "ftps")):
+                log(f"parallel {protocol}...")
+                server = ftp_standin.FtpStandin(remote_root, rate=rate, tls=tls, ssl_context=context)
+                try:
+                    results.append(scenario_parallel(workdir, server, rows, max(levels), args.timeout,
+                                                     protocol=protocol))
+                finally:
+                    server.close()
+    finally:
+        if args.keep:
+            log(f"Répertoire de travail: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "releases": args.releases,
+            "files": args.files,
+            "size": size,
+            "rate": rate,
+            "seed": args.seed,
+            "started": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": bench_db.git_commit(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for result in results:
+            _print(result)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Mesure le temps d'import de chaque point d'entrée, dans un interpréteur neuf:
+#   python bench_imports.py [--runs 5] [--top 8] [--json]
+# Pour chaque script: temps médian (mur) de l'import, modules lourds présents
+# (tkinter, tkcalendar, irc) et, via `python -X importtime`, les imports de
+# premier niveau les plus coûteux.
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = ("web_server.py", "irc_suite.py", "irclog+.py")
+WATCHED_MODULES = ("tkinter", "tkcalendar", "irc", "irc_db_gui")
+
+# Charge le script comme module (irclog+.py n'est pas importable par son nom)
+# sans exécuter son bloc __main__, puis rapporte durée et modules chargés.
+_PROBE = r"""
+import sys, time, json, importlib.util
+path, watched = sys.argv[1], sys.argv[2].split(",")
+sys.path.insert(0, sys.argv[3])
+t0 = time.perf_counter()
+error = None
+try:
+    spec = importlib.util.spec_from_file_location("entry_point", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+except BaseException as e:
+    error = f"{e.__class__.__name__}: {e}"
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "error": error, "loaded": [m for m in watched if m in sys.modules]}))
+"""
+
+
+def _probe(script: str, importtime: bool = False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE, os.path.join(BASE_DIR, script), ",".join(WATCHED_MODULES), BASE_DIR]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=BASE_DIR)
+    lines = proc.stdout.strip().splitlines()
+    result = json.loads(lines[-1]) if lines else {"seconds": None, "error": proc.stderr.strip()[-200:], "loaded": []}
+    return result, proc.stderr
+
+
+def _top_imports(stderr: str, top: int) -> list[tuple[str, float]]:
+    # Lignes "import time: self [us] | cumulative | imported package"; les modules
+    # de premier niveau ne sont pas indentés.
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        if name.startswith("  "):
+            continue
+        out.append((name.strip(), int(parts[1]) / 1e6))
+    out.sort(key=lambda item: item[1], reverse=True)
+    return out[:top]
+
+
+def bench(script: str, runs: int = 5, top: int = 8) -> dict:
+    samples = []
+    result = {}
+    for _ in range(runs):
+        result, _ = _probe(script)
+        if result["error"] or result["seconds"] is None:
+            break
+        samples.append(result["seconds"])
+    _, stderr = _probe(script, importtime=True)
+    return {
+        "script": script,
+        "runs": len(samples),
+        "median_s": statistics.median(samples) if samples else None,
+        "min_s": min(samples) if samples else None,
+        "error": result.get("error"),
+        "loaded": result.get("loaded", []),
+        "top_imports": _top_imports(stderr, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import des points d'entrée")
+    parser.add_argument("scripts", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    args = parser.parse_args()
+
+    reports = [bench(s, runs=args.runs, top=args.top) for s in args.scripts]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for r in reports:
+        if r["median_s"] is None:
+            print(f"{r['script']}: échec de l'import ({r['error']})")
+        else:
+            print(f"{r['script']}: médiane {r['median_s'] * 1000:.1f} ms, min {r['min_s'] * 1000:.1f} ms "
+                  f"sur {r['runs']} essais" + (f" (erreur: {r['error']})" if r["error"] else ""))
+        print(f"  modules lourds chargés: {', '.join(r['loaded']) or 'aucun'}")
+        for name, seconds in r["top_imports"]:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
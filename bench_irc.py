@@ -0,0 +1,328 @@
+# Banc d'essai de bout en bout du logger IRC (irclog+.py) contre le serveur
+# local de irc_standin.py, sans réseau:
+#   python bench_irc.py [--rates 10,50,200,1000] [--duration 10] [--drops close,reset,silent,kick]
+#                       [--nfo 20] [--tls | --both] [--out rapport.json]
+# Le vrai logger tourne dans ce processus (Tk caché, base et journaux dans un
+# répertoire temporaire). Pour chaque mode (clair, TLS):
+# - ingestion: annonces à débit fixe; releases enregistrées, perdues, débit
+#   atteint, latence réception -> COMMIT (recv_ts) et envoi serveur -> COMMIT
+#   (inclut l'attente dans la socket quand le logger ne suit plus);
+# - NFO: aller-retour !nfo -> lien du bot via send_privmsg et NfoResolver;
+# - reconnexion: coupure du serveur (FIN, RST, silence détecté par le watchdog,
+#   KICK) pendant un flux d'annonces; délai jusqu'au JOIN suivant, annonces perdues.
+# Nécessite le paquet irc et un affichage (xvfb-run python bench_irc.py sans écran).
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import tkinter as tk
+from datetime import datetime
+
+import bench_db
+import event_bus
+import irc_standin
+import nfo_cache
+from loadtest_web import _percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHANNEL = "#dupefr-pre"
+NICK = "benchlog"
+PERCENTILES = (50, 90, 99)
+
+
+def _latency_summary(values: list) -> dict:
+    values = sorted(values)
+    out = {f"p{p}_ms": round(_percentile(values, p) * 1000, 2) for p in PERCENTILES}
+    out["max_ms"] = round(values[-1] * 1000, 2) if values else 0.0
+    return out
+
+
+class ReleaseCollector:
+    """Releases enregistrées par le logger (event_bus.RELEASE_LOGGED), rapprochées des envois du serveur."""
+
+    def __init__(self, bus):
+        self._lock = threading.Lock()
+        self.sent = {}
+        self.committed = {}
+        self.recv_to_commit = []
+        self.wire_to_commit = []
+        self.sub = bus.subscribe(event_bus.RELEASE_LOGGED, maxsize=1_000_000, policy=event_bus.DROP_NEWEST,
+                                 name="bench-irc", callback=self._on_release)
+
+    def reset(self):
+        with self._lock:
+            self.sent.clear()
+            self.committed.clear()
+            self.recv_to_commit.clear()
+            self.wire_to_commit.clear()
+
+    def on_sent(self, release: str, ts: float):
+        with self._lock:
+            self.sent[release] = ts
+
+    def _on_release(self, event):
+        release = nfo_cache.release_key(event.data.get("message") or "")
+        # event.ts: publication, juste après le COMMIT
+        with self._lock:
+            self.committed[release] = event.ts
+            recv_ts = event.data.get("recv_ts")
+            if recv_ts is not None:
+                self.recv_to_commit.append(event.ts - recv_ts)
+            sent_ts = self.sent.get(release)
+            if sent_ts is not None:
+                self.wire_to_commit.append(event.ts - sent_ts)
+
+    def wait_drained(self, idle: float = 2.0, timeout: float = 60.0) -> int:
+        """Attend que toutes les annonces envoyées soient enregistrées (ou plus aucun progrès)."""
+        deadline = time.monotonic() + timeout
+        last, last_change = -1, time.monotonic()
+        while time.monotonic() < deadline:
+            with self._lock:
+                done = sum(1 for r in self.sent if r in self.committed)
+                total = len(self.sent)
+            if done >= total:
+                return done
+            if done != last:
+                last, last_change = done, time.monotonic()
+            elif time.monotonic() - last_change > idle:
+                return done
+            time.sleep(0.05)
+        return last
+
+    def stored_since(self, since: float) -> tuple[int, int]:
+        # (annonces envoyées depuis since, enregistrées parmi elles)
+        with self._lock:
+            sent = [r for r, ts in self.sent.items() if ts >= since]
+            return len(sent), sum(1 for r in sent if r in self.committed)
+
+
+def run_ingest(server, collector, rate: float, duration: float) -> dict:
+    collector.reset()
+    count = max(1, int(rate * duration))
+    t0 = time.time()
+    sent = server.announce(count, rate, CHANNEL, on_sent=collector.on_sent)
+    send_s = time.time() - t0
+    stored = collector.wait_drained()
+    with collector._lock:
+        last_commit = max(collector.committed.values(), default=t0)
+        recv = list(collector.recv_to_commit)
+        wire = list(collector.wire_to_commit)
+    elapsed = max(last_commit - t0, 1e-9)
+    return {
+        "rate": rate,
+        "sent": sent,
+        "stored": stored,
+        "lost": sent - stored,
+        "send_s": round(send_s, 3),
+        "stored_per_s": round(stored / elapsed, 1),
+        "recv_to_commit": _latency_summary(recv),
+        "wire_to_commit": _latency_summary(wire),
+    }
+
+
+def run_nfo(server, logger, count: int, store_path: str) -> dict:
+    resolver = nfo_cache.NfoResolver(nfo_cache.NfoStore(store_path), irc=logger, bus=logger.bus)
+    times, found = [], 0
+    for i in range(count):
+        release = f"Bench.Nfo.{i}.{int(time.time())}.FRENCH.WEB.x264-BENCH"
+        t0 = time.perf_counter()
+        sent, url = resolver.resolve(CHANNEL, release, strict=True, timeout=5.0)
+        if sent and url:
+            found += 1
+            times.append(time.perf_counter() - t0)
+    out = {"requests": count, "answered": found, "server_requests": server.nfo_requests,
+           "bot_delay_ms": server.nfo_delay * 1000}
+    out.update(_latency_summary(times))
+    return out
+
+
+def run_drop(server, collector, how: str, rate: float, timeout: float) -> dict:
+    """Coupe (ou expulse) le logger pendant un flux d'annonces; mesure le retour au channel."""
+    collector.reset()
+    stop = threading.Event()
+    feeder = threading.Thread(target=server.announce, args=(10 ** 9, rate, CHANNEL, stop, collector.on_sent),
+                              daemon=True)
+    feeder.start()
+    time.sleep(1.0)
+    t_drop = time.monotonic()
+    wall_drop = time.time()
+    if how == "kick":
+        server.kick(CHANNEL)
+    else:
+        server.drop(how)
+    joined = server.wait_for_joins(1, since=t_drop, timeout=timeout)
+    time.sleep(1.0)
+    stop.set()
+    feeder.join(5)
+    attempted = max(0, int(rate * (time.time() - wall_drop)))
+    collector.wait_drained()
+    _, stored = collector.stored_since(wall_drop)
+    return {
+        "drop": how,
+        "rejoined": joined is not None,
+        "rejoin_s": None if joined is None else round(joined - t_drop, 3),
+        # Annonces de la coupure jusqu'à la fin: non reçues (client absent) ou perdues en route
+        "announces": attempted,
+        "stored": stored,
+        "missed": max(0, attempted - stored),
+    }
+
+
+def connect_logger(logger, server, ssl_on: bool, timeout: float = 15.0) -> bool:
+    since = time.monotonic()
+    logger.server_var.set("localhost")
+    logger.port_var.set(server.port)
+    logger.ssl_var.set(ssl_on)
+    logger.nick_var.set(NICK)
+    logger.channels_var.set(CHANNEL)
+    logger.max_reconnect_attempts_var.set(0)
+    logger.start_connection()
+    return server.wait_for_joins(1, since=since, timeout=timeout) is not None
+
+
+def disconnect_logger(logger):
+    logger.stop_connection()
+    # Laisse irc_loop sortir (un tour de process_once) avant une nouvelle connexion
+    time.sleep(1.0)
+
+
+def run_mode(logger, collector, args, tls: bool, workdir: str, log) -> dict:
+    context = None
+    if tls:
+        context, _cert = irc_standin.self_signed_context(workdir)
+    server = irc_standin.StandinServer(ssl_context=context, nfo_delay=args.nfo_delay, seed=args.seed)
+    mode = "tls" if tls else "plain"
+    result = {"mode": mode, "ingest": [], "nfo": None, "drops": []}
+    try:
+        log(f"[{mode}] Connexion du logger à localhost:{server.port}...")
+        if not connect_logger(logger, server, tls):
+            result["error"] = "pas de JOIN du logger"
+            return result
+        for rate in (float(r) for r in args.rates.split(",") if r.strip()):
+            log(f"[{mode}] Ingestion à {rate:g} annonces/s...")
+            result["ingest"].append(run_ingest(server, collector, rate, args.duration))
+        if args.nfo:
+            log(f"[{mode}] {args.nfo} aller-retours !nfo...")
+            result["nfo"] = run_nfo(server, logger, args.nfo, os.path.join(workdir, f"nfo-{mode}.db"))
+        for how in (d.strip() for d in args.drops.split(",") if d.strip()):
+            log(f"[{mode}] Coupure « {how} »...")
+            result["drops"].append(run_drop(server, collector, how, args.drop_rate, args.reconnect_timeout))
+    finally:
+        disconnect_logger(logger)
+        server.close()
+    return result
+
+
+def _print_mode(result: dict):
+    print(f"\n== {result['mode']} ==")
+    if result.get("error"):
+        print(f"Échec: {result['error']}")
+        return
+    print(f"{'débit':>8} {'envoyées':>9} {'stockées':>9} {'perdues':>8} {'stock/s':>8} "
+          f"{'recv p50':>9} {'recv p99':>9} {'fil p50':>9} {'fil p99':>9} {'fil max':>9}")
+    for s in result["ingest"]:
+        r, w = s["recv_to_commit"], s["wire_to_commit"]
+        print(f"{s['rate']:>8g} {s['sent']:>9} {s['stored']:>9} {s['lost']:>8} {s['stored_per_s']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {w['p50_ms']:>9.1f} {w['p99_ms']:>9.1f} {w['max_ms']:>9.1f}")
+    nfo = result.get("nfo")
+    if nfo:
+        print(f"NFO: {nfo['answered']}/{nfo['requests']} réponses, p50 {nfo['p50_ms']:.1f} ms, "
+              f"p99 {nfo['p99_ms']:.1f} ms (bot {nfo['bot_delay_ms']:.0f} ms)")
+    for d in result["drops"]:
+        back = f"rejoint en {d['rejoin_s']:.2f} s" if d["rejoined"] else "pas de retour"
+        print(f"Coupure {d['drop']:<7} {back}, {d['missed']}/{d['announces']} annonces manquées")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du logger IRC contre un serveur local")
+    parser.add_argument("--rates", default="10,50,200,1000", help="Débits d'annonces testés (par seconde)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée d'envoi par débit (s)")
+    parser.add_argument("--nfo", type=int, default=20, help="Nombre d'aller-retours !nfo (0: aucun)")
+    parser.add_argument("--nfo-delay", type=float, default=0.05, help="Délai de réponse du bot (s)")
+    parser.add_argument("--drops", default="close,reset,silent,kick", help="Coupures testées")
+    parser.add_argument("--drop-rate", type=float, default=20.0, help="Débit d'annonces pendant les coupures")
+    parser.add_argument("--reconnect-timeout", type=float, default=60.0, help="Attente maximale du retour (s)")
+    parser.add_argument("--ping-interval", type=float, default=2.0, help="PING du watchdog (s), pour « silent »")
+    parser.add_argument("--pong-timeout", type=float, default=3.0, help="Attente du PONG (s), pour « silent »")
+    parser.add_argument("--tls", action="store_true", help="TLS seulement (certificat auto-signé)")
+    parser.add_argument("--both", action="store_true", help="En clair puis en TLS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="Garder le répertoire de travail (base, journaux)")
+    parser.add_argument("--out", help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    args = parser.parse_args()
+    if args.out:
+        args.out = os.path.abspath(args.out)
+
+    log = (lambda text: print(text, file=sys.stderr)) if args.json else print
+    workdir = tempfile.mkdtemp(prefix="bench_irc-")
+    # Avant l'import de irclog+ (lu au chargement): le logger fait confiance au certificat de test
+    cert_path = os.path.join(workdir, "standin-cert.pem")
+    os.environ["IRC_SSL_CAFILE"] = cert_path
+    # irclog+ écrit irc_logs.db, irc_log.txt et lit irc_config.json dans le répertoire courant
+    os.chdir(workdir)
+    sys.path.insert(0, BASE_DIR)
+    import irc_suite
+    IRCLoggerGUI = irc_suite.load_irclog_plus_class()
+
+    root = tk.Tk()
+    root.withdraw()
+    logger = IRCLoggerGUI(root)
+    logger.watchdog.ping_interval = args.ping_interval
+    logger.watchdog.pong_timeout = args.pong_timeout
+    collector = ReleaseCollector(logger.bus)
+    modes = [False, True] if args.both else [args.tls]
+    started = datetime.now().isoformat(timespec="seconds")
+    results = []
+
+    def drive():
+        # Hors du thread Tk: la boucle d'événements traite les appels aux widgets
+        try:
+            for tls in modes:
+                results.append(run_mode(logger, collector, args, tls, workdir, log))
+        except Exception as e:
+            log(f"Erreur: {e}")
+        finally:
+            root.after(0, root.quit)
+
+    threading.Thread(target=drive, name="bench-irc", daemon=True).start()
+    root.mainloop()
+    root.destroy()
+    os.chdir(BASE_DIR)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        log(f"Répertoire de travail: {workdir}")
+
+    report = {
+        "meta": {
+            "duration_s": args.duration,
+            "nfo_delay_s": args.nfo_delay,
+            "drop_rate": args.drop_rate,
+            "ping_interval_s": args.ping_interval,
+            "pong_timeout_s": args.pong_timeout,
+            "seed": args.seed,
+            "started": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": bench_db.git_commit(),
+        },
+        "modes": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for result in results:
+        _print_mode(result)
+
+
+if __name__ == "__main__":
+    main()
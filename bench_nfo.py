@@ -0,0 +1,169 @@
+# Vérification du téléchargement du texte des NFO (nfo_cache.NfoDownloader) contre
+# le serveur local de nfo_standin.py, sans hébergeur distant:
+#   python bench_nfo.py [--workers 2] [--pending 8] [--burst 20] [--delay 0.2] [--out rapport.json]
+# La table nfo est dans une base temporaire. Scénarios:
+# - content: un NFO UTF-8, un NFO CP437 (art ASCII, illisible en UTF-8), une URL
+#   en 404 et un NFO trop volumineux; le texte (ou l'erreur) enregistré est comparé
+#   à l'attendu, le CP437 doit passer par le repli;
+# - pool: une rafale de demandes contre un serveur lent; au plus --workers
+#   téléchargements simultanés vus par le serveur, au plus --pending acceptés
+#   (les autres refusés, réessayés au prochain accès), une demande déjà en cours
+#   n'est pas refaite, puis la file se vide et accepte de nouveau.
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+import bench_db
+import nfo_cache
+import nfo_standin
+
+UTF8_TEXT = "Release.Name.2024.1080p-GRP\nQualité: très bonne — sous-titres inclus\n"
+# Caractères de dessin de cadre et accents: octets > 0x7F invalides en UTF-8
+CP437_TEXT = "╔══════════════╗\n║ ░▒▓ GRP ▓▒░  ║\n╚══════════════╝\nNoté: ½ ≥ é\n"
+
+
+def _write(root: str, name: str, data: bytes):
+    with open(os.path.join(root, name), "wb") as f:
+        f.write(data)
+
+
+def _wait_idle(downloader, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if downloader.inflight() == 0:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def scenario_content(workdir: str, server, timeout: float) -> dict:
+    root = server.root
+    _write(root, "utf8.nfo", UTF8_TEXT.encode("utf-8"))
+    _write(root, "cp437.nfo", CP437_TEXT.encode("cp437"))
+    _write(root, "big.nfo", b"x" * (nfo_cache.NFO_MAX_BYTES + 1))
+    cases = {
+        "Content.UTF8-GRP": ("utf8.nfo", lambda e: e["content"] == UTF8_TEXT and e["error"] is None),
+        "Content.CP437-GRP": ("cp437.nfo", lambda e: e["content"] == CP437_TEXT and e["error"] is None),
+        "Content.Missing-GRP": ("missing.nfo", lambda e: e["content"] is None and "404" in (e["error"] or "")),
+        "Content.Big-GRP": ("big.nfo", lambda e: e["content"] is None and "volumineux" in (e["error"] or "")),
+    }
+    store = nfo_cache.NfoStore(os.path.join(workdir, "content.nfo.db"))
+    downloader = nfo_cache.NfoDownloader(store, max_workers=2)
+    server.reset_stats()
+    try:
+        for release, (name, _check) in cases.items():
+            store.put_url(release, server.url(name))
+            downloader.submit(release, server.url(name))
+        finished = _wait_idle(downloader, timeout)
+    finally:
+        downloader.shutdown()
+    checks = {}
+    for release, (name, check) in cases.items():
+        entry = store.get(release)
+        checks[name] = bool(entry and entry["content_fetched_at"] is not None and check(entry))
+    store.conn.close()
+    return {"scenario": "content", "finished": finished, "checks": checks, "server": dict(server.stats),
+            "ok": finished and all(checks.values())}
+
+
+def scenario_pool(workdir: str, server, workers: int, pending: int, burst: int, delay: float,
+                  timeout: float) -> dict:
+    root = server.root
+    for i in range(burst):
+        _write(root, f"pool{i:03d}.nfo", f"NFO {i}\n".encode("ascii"))
+    store = nfo_cache.NfoStore(os.path.join(workdir, "pool.nfo.db"))
+    downloader = nfo_cache.NfoDownloader(store, max_workers=workers, max_pending=pending)
+    releases = [f"Pool.Test.{i:03d}-GRP" for i in range(burst)]
+    server.reset_stats()
+    server.delay = delay
+    try:
+        for i, release in enumerate(releases):
+            store.put_url(release, server.url(f"pool{i:03d}.nfo"))
+        accepted = [downloader.submit(release, server.url(f"pool{i:03d}.nfo")) for i, release in enumerate(releases)]
+        # Même release encore en file: acceptée sans nouvelle requête
+        duplicate = downloader.submit(releases[0], server.url("pool000.nfo"))
+        inflight = downloader.inflight()
+        finished = _wait_idle(downloader, timeout)
+        requests = server.stats["requests"]
+        peak = server.stats["peak_active"]
+        # File vidée: une demande refusée plus tôt passe maintenant
+        refused = [i for i, ok in enumerate(accepted) if not ok]
+        retried = downloader.submit(releases[refused[0]], server.url(f"pool{refused[0]:03d}.nfo")) if refused else True
+        finished = _wait_idle(downloader, timeout) and finished
+    finally:
+        downloader.shutdown()
+        server.delay = 0.0
+    stored = sum(1 for release in releases if (store.get(release) or {}).get("content") is not None)
+    store.conn.close()
+    n_accepted = sum(accepted)
+    expected = min(burst, pending)
+    return {"scenario": "pool", "finished": finished, "workers": workers, "pending": pending, "burst": burst,
+            "accepted": n_accepted, "inflight": inflight, "requests": requests, "peak_active": peak,
+            "duplicate_accepted": duplicate, "retried": retried, "stored": stored,
+            "server": dict(server.stats),
+            "ok": finished and n_accepted == expected and inflight == expected and requests == expected
+            and peak == min(workers, expected) and duplicate and retried
+            and stored == expected + (1 if refused else 0)}
+
+
+def _print(result: dict):
+    status = "OK " if result["ok"] else "ÉCHEC"
+    if result["scenario"] == "content":
+        detail = ", ".join(f"{name} {'ok' if ok else 'KO'}" for name, ok in result["checks"].items())
+    else:
+        detail = (f"{result['accepted']}/{result['burst']} acceptés (file {result['pending']}), "
+                  f"pic {result['peak_active']}/{result['workers']} téléchargements, "
+                  f"{result['requests']} requêtes, {result['stored']} NFO enregistrés")
+    print(f"[{status}] {result['scenario']:<8} {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérifie le téléchargement des NFO contre un serveur HTTP local")
+    parser.add_argument("--workers", type=int, default=2, help="Téléchargements simultanés (NFO_DOWNLOAD_WORKERS)")
+    parser.add_argument("--pending", type=int, default=8, help="Demandes acceptées en file au plus")
+    parser.add_argument("--burst", type=int, default=20, help="Demandes envoyées d'un coup (scénario pool)")
+    parser.add_argument("--delay", type=float, default=0.2, help="Attente du serveur avant chaque réponse (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Attente maximale par scénario (s)")
+    parser.add_argument("--out", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_nfo-")
+    served = os.path.join(workdir, "served")
+    os.makedirs(served)
+    started = datetime.now().isoformat(timespec="seconds")
+    results = []
+    server = nfo_standin.NfoStandin(served)
+    try:
+        results.append(scenario_content(workdir, server, args.timeout))
+        results.append(scenario_pool(workdir, server, args.workers, args.pending, args.burst, args.delay,
+                                     args.timeout))
+    finally:
+        server.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    for result in results:
+        _print(result)
+
+    if args.out:
+        report = {
+            "meta": {
+                "started": started,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "commit": bench_db.git_commit(),
+            },
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Rapport: {args.out}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import time
+import threading
+from collections import deque, namedtuple
+
+
+# Sujets publiés par le logger IRC (IRCLoggerGUI)
+RELEASE_LOGGED = "release-logged"  # row_id, channel, nick, message, type, server
+IRC_LINE = "irc-line"  # line (telle qu'écrite dans irc_log.txt), kind, nick, channel
+STATUS_CHANGED = "status-changed"  # connected
+TOPICS = (RELEASE_LOGGED, IRC_LINE, STATUS_CHANGED)
+
+# Politiques quand la file d'un abonné est pleine (la publication ne bloque jamais)
+DROP_OLDEST = "drop-oldest"  # on garde les plus récents (flux, affichage)
+DROP_NEWEST = "drop-newest"  # on garde les plus anciens (traitement dans l'ordre)
+
+Event = namedtuple("Event", "topic seq ts data")
+
+
+class Subscription:
+    """File bornée d'événements pour un abonné; lue par get() ou par un thread de rappel."""
+
+    def __init__(self, bus, topics, maxsize: int, policy: str, name: str):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.bus = bus
+        self.topics = frozenset(topics)
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.name = name
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def _offer(self, event: Event):
+        with self._cond:
+            if self.closed:
+                return
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return
+                self._items.popleft()
+            self._items.append(event)
+            self.delivered += 1
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None) -> Event | None:
+        """Prochain événement; None après timeout ou si l'abonnement est fermé."""
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def drain(self) -> list:
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class EventBus:
+    """Bus publish/subscribe en mémoire, pour un seul processus.
+
+    publish() ne bloque jamais: chaque abonné a sa propre file bornée et sa
+    politique de rejet. Le dernier événement de chaque sujet est conservé
+    (last()), ce qui permet à un nouvel abonné de connaître l'état courant.
+    """
+
+    def __init__(self):
+        self._subs = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._last = {}
+        self.published = {}
+
+    def subscribe(self, topics, maxsize: int = 1000, policy: str = DROP_OLDEST, name: str = "",
+                  callback=None) -> Subscription:
+        """Abonne aux sujets donnés (str ou itérable).
+
+        Avec callback, un thread dédié appelle callback(event) pour chaque
+        événement; sinon l'abonné lit lui-même (get, drain).
+        """
+        if isinstance(topics, str):
+            topics = (topics,)
+        sub = Subscription(self, topics, maxsize, policy, name)
+        with self._lock:
+            self._subs.append(sub)
+        if callback is not None:
+            threading.Thread(target=self._dispatch, args=(sub, callback), daemon=True,
+                             name=f"bus-{name or 'callback'}").start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subs = [s for s in self._subs if s is not sub]
+
+    def publish(self, topic: str, **data) -> Event:
+        with self._lock:
+            self._seq += 1
+            event = Event(topic, self._seq, time.time(), data)
+            self._last[topic] = event
+            self.published[topic] = self.published.get(topic, 0) + 1
+            subs = [s for s in self._subs if topic in s.topics]
+        for sub in subs:
+            sub._offer(event)
+        return event
+
+    def last(self, topic: str) -> Event | None:
+        with self._lock:
+            return self._last.get(topic)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = list(self._subs)
+            published = dict(self.published)
+        return {
+            "published": published,
+            "subscribers": [
+                {"name": s.name, "topics": sorted(s.topics), "policy": s.policy, "maxsize": s.maxsize,
+                 "pending": s.pending(), "delivered": s.delivered, "dropped": s.dropped}
+                for s in subs
+            ],
+        }
+
+    @staticmethod
+    def _dispatch(sub: Subscription, callback):
+        while True:
+            event = sub.get()
+            if event is None:
+                if sub.closed:
+                    return
+                continue
+            try:
+                callback(event)
+            except Exception:
+                pass
+
+
+# Bus du processus: le logger y publie, GUI / serveur Web / IPC s'y abonnent
+BUS = EventBus()
@@ -0,0 +1,460 @@
+# Serveur FTP local minimal, en lecture seule, pour tester ftp_transfer.py sans
+# site distant:
+#   python ftp_standin.py --root dossier [--port 2121] [--rate 2m] [--tls explicit|implicit]
+# puis: python ftp_transfer.py --host 127.0.0.1 --port 2121. Il sert un dossier
+# local (USER/PASS, PASV/EPSV, MLSD ou NLST, SIZE, REST, RETR; AUTH TLS et PROT P
+# pour ftpes, TLS dès la connexion pour ftps), limite le débit de chaque
+# transfert et peut couper chaque fichier en cours de route une première fois
+# (--cut-after): de quoi vérifier la reprise, la récursion et le parallélisme.
+# Utilisé par bench_ftp.py.
+import os
+import ssl
+import sys
+import time
+import socket
+import argparse
+import posixpath
+import threading
+
+BLOCK = 16 * 1024
+
+
+def parse_size(text: str) -> int:
+    """"64k", "2m", "1g" ou un nombre d'octets."""
+    text = str(text).strip().lower()
+    for suffix, factor in (("k", 1024), ("m", 1024 ** 2), ("g", 1024 ** 3)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+class Session:
+    """Une connexion de contrôle; le répertoire courant est un chemin virtuel (/…)."""
+
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.user = None
+        self.logged_in = False
+        self.cwd = "/"
+        self.rest = 0
+        self.protect_data = False
+        self.passive = None
+        self.rfile = sock.makefile("rb")
+
+    def reply(self, line: str):
+        self.sock.sendall((line + "\r\n").encode("utf-8"))
+
+    # --- Chemins ---
+
+    def virtual(self, arg: str | None) -> str:
+        path = posixpath.normpath(posixpath.join(self.cwd, arg or "."))
+        # normpath garde les // de tête; « .. » au-delà de / reste à /
+        return "/" + path.lstrip("/")
+
+    def real(self, virtual: str) -> str:
+        return os.path.join(self.server.root, *[p for p in virtual.split("/") if p])
+
+    # --- Connexion de données ---
+
+    def open_passive(self) -> int:
+        if self.passive is not None:
+            self.passive.close()
+        self.passive = socket.create_server((self.server.host, 0))
+        self.passive.settimeout(10)
+        return self.passive.getsockname()[1]
+
+    def accept_data(self):
+        if self.passive is None:
+            return None
+        try:
+            conn, _ = self.passive.accept()
+        except OSError:
+            return None
+        finally:
+            self.passive.close()
+            self.passive = None
+        if self.protect_data:
+            conn = self.server.ssl_context.wrap_socket(conn, server_side=True)
+        return conn
+
+    @staticmethod
+    def close_data(conn, clean: bool = True):
+        try:
+            if clean and isinstance(conn, ssl.SSLSocket):
+                # ftplib attend la fin de session TLS (unwrap) après chaque transfert
+                conn = conn.unwrap()
+        except (OSError, ValueError):
+            pass
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def send_listing(self, lines):
+        self.reply("150 Liste en cours")
+        conn = self.accept_data()
+        if conn is None:
+            self.reply("425 Connexion de données impossible")
+            return
+        try:
+            conn.sendall("".join(line + "\r\n" for line in lines).encode("utf-8"))
+        finally:
+            self.close_data(conn)
+        self.reply("226 Liste envoyée")
+
+    # --- Boucle de commandes ---
+
+    def run(self):
+        self.reply("220 Serveur FTP de test prêt")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            command, _, arg = line.partition(" ")
+            command = command.upper()
+            if command == "QUIT":
+                self.reply("221 Au revoir")
+                return
+            handler = getattr(self, f"cmd_{command.lower()}", None)
+            if handler is None:
+                self.reply(f"502 Commande non gérée: {command}")
+            elif not self.logged_in and command not in ("USER", "PASS", "AUTH", "PBSZ", "PROT", "FEAT", "SYST"):
+                self.reply("530 Non connecté")
+            else:
+                handler(arg.strip())
+
+    def cmd_auth(self, arg):
+        if self.server.ssl_context is None or isinstance(self.sock, ssl.SSLSocket):
+            self.reply("502 TLS non disponible")
+            return
+        self.reply("234 AUTH TLS accepté")
+        self.sock = self.server.ssl_context.wrap_socket(self.sock, server_side=True)
+        self.rfile = self.sock.makefile("rb")
+
+    def cmd_pbsz(self, arg):
+        self.reply("200 PBSZ=0")
+
+    def cmd_prot(self, arg):
+        if arg.upper() == "P" and not isinstance(self.sock, ssl.SSLSocket):
+            self.reply("503 PROT P sans TLS")
+            return
+        self.protect_data = arg.upper() == "P"
+        self.reply(f"200 PROT {arg.upper()}")
+
+    def cmd_user(self, arg):
+        self.user = arg
+        self.reply("331 Mot de passe?")
+
+    def cmd_pass(self, arg):
+        if self.user == self.server.user and arg == self.server.password:
+            self.logged_in = True
+            self.server.count("logins")
+            self.reply("230 Connecté")
+        else:
+            self.reply("530 Identifiants refusés")
+
+    def cmd_syst(self, arg):
+        self.reply("215 UNIX Type: L8")
+
+    def cmd_feat(self, arg):
+        features = ["SIZE", "REST STREAM", "PASV", "EPSV"]
+        if self.server.mlsd:
+            features.append("MLST type*;size*;")
+        if self.server.ssl_context is not None:
+            features += ["AUTH TLS", "PBSZ", "PROT"]
+        self.reply("211-Extensions:")
+        for feature in features:
+            self.reply(f" {feature}")
+        self.reply("211 Fin")
+
+    def cmd_opts(self, arg):
+        self.reply("200 OK")
+
+    def cmd_noop(self, arg):
+        self.reply("200 OK")
+
+    def cmd_type(self, arg):
+        self.reply(f"200 Type {arg}")
+
+    def cmd_pwd(self, arg):
+        self.reply(f'257 "{self.cwd}"')
+
+    def cmd_cwd(self, arg):
+        path = self.virtual(arg)
+        if os.path.isdir(self.real(path)):
+            self.cwd = path
+            self.reply("250 OK")
+        else:
+            self.reply("550 Dossier introuvable")
+
+    def cmd_cdup(self, arg):
+        self.cmd_cwd("..")
+
+    def cmd_size(self, arg):
+        real = self.real(self.virtual(arg))
+        if os.path.isfile(real):
+            self.reply(f"213 {os.path.getsize(real)}")
+        else:
+            self.reply("550 Fichier introuvable")
+
+    def cmd_pasv(self, arg):
+        port = self.open_passive()
+        h = self.server.host.replace(".", ",")
+        self.reply(f"227 Mode passif ({h},{port >> 8},{port & 0xFF})")
+
+    def cmd_epsv(self, arg):
+        port = self.open_passive()
+        self.reply(f"229 Mode passif étendu (|||{port}|)")
+
+    def cmd_rest(self, arg):
+        try:
+            self.rest = int(arg)
+        except ValueError:
+            self.reply("501 Offset invalide")
+            return
+        self.reply(f"350 Reprise à {self.rest}")
+
+    def cmd_mlsd(self, arg):
+        if not self.server.mlsd:
+            self.reply("500 MLSD non géré")
+            return
+        real = self.real(self.virtual(arg))
+        if not os.path.isdir(real):
+            self.reply("550 Dossier introuvable")
+            return
+        lines = ["type=cdir; ."]
+        for name in sorted(os.listdir(real)):
+            full = os.path.join(real, name)
+            if os.path.isdir(full):
+                lines.append(f"type=dir; {name}")
+            else:
+                lines.append(f"type=file;size={os.path.getsize(full)}; {name}")
+        self.send_listing(lines)
+
+    def cmd_nlst(self, arg):
+        real = self.real(self.virtual(arg))
+        if not os.path.isdir(real):
+            self.reply("550 Dossier introuvable")
+            return
+        self.send_listing(sorted(os.listdir(real)))
+
+    cmd_list = cmd_nlst
+
+    def cmd_retr(self, arg):
+        virtual = self.virtual(arg)
+        real = self.real(virtual)
+        offset, self.rest = self.rest, 0
+        if not os.path.isfile(real):
+            self.reply("550 Fichier introuvable")
+            return
+        self.reply("150 Transfert en cours")
+        conn = self.accept_data()
+        if conn is None:
+            self.reply("425 Connexion de données impossible")
+            return
+        server = self.server
+        cut_at = server.cut_point(virtual, offset)
+        server.transfer_started(offset)
+        sent = 0
+        clean = True
+        try:
+            with open(real, "rb") as f:
+                f.seek(offset)
+                t0 = time.perf_counter()
+                while True:
+                    chunk = f.read(BLOCK)
+                    if not chunk:
+                        break
+                    if cut_at is not None and offset + sent + len(chunk) > cut_at:
+                        chunk = chunk[:max(0, cut_at - offset - sent)]
+                        conn.sendall(chunk)
+                        sent += len(chunk)
+                        clean = False
+                        break
+                    conn.sendall(chunk)
+                    sent += len(chunk)
+                    if server.rate:
+                        # Débit par transfert: attente jusqu'à l'heure prévue du bloc suivant
+                        delay = t0 + sent / server.rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+        except OSError:
+            clean = False
+        finally:
+            server.transfer_finished(sent, cut=cut_at is not None and not clean)
+            self.close_data(conn, clean=clean)
+        if clean:
+            self.reply("226 Transfert terminé")
+        else:
+            self.reply("426 Transfert interrompu")
+
+
+class FtpStandin:
+    """Serveur FTP de test servant `root` en lecture seule; un thread par connexion."""
+
+    def __init__(self, root: str, host: str = "127.0.0.1", port: int = 0, user: str = "bench",
+                 password: str = "bench", tls: str | None = None, ssl_context: ssl.SSLContext | None = None,
+                 rate: int = 0, mlsd: bool = True, cut_after: int = 0, log=None):
+        # tls: None, "explicit" (AUTH TLS, ftpes) ou "implicit" (ftps, TLS dès l'accept)
+        if tls and ssl_context is None:
+            raise ValueError("tls demande un ssl_context")
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.user = user
+        self.password = password
+        self.tls = tls
+        self.ssl_context = ssl_context if tls else None
+        # Octets/s par transfert (0: illimité)
+        self.rate = rate
+        self.mlsd = mlsd
+        # Coupe le premier transfert de chaque fichier après cut_after octets (0: jamais)
+        self.cut_after = cut_after
+        self.log = log or (lambda text: None)
+        self.stats = {"connections": 0, "logins": 0, "retr": 0, "resumed": 0, "cuts": 0, "bytes_sent": 0,
+                      "active": 0, "peak_active": 0}
+        self.rest_offsets = []
+        self._cut_done = set()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._sessions = []
+        self.listener = socket.create_server((host, port))
+        self.address = self.listener.getsockname()[:2]
+        threading.Thread(target=self._accept_loop, name="ftp-standin", daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.address[1]
+
+    def close(self):
+        self._closed.set()
+        try:
+            self.listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            try:
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self.stats:
+                if key != "active":
+                    self.stats[key] = 0
+            self.rest_offsets.clear()
+            self._cut_done.clear()
+
+    # --- Compteurs (appelés par les sessions) ---
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def cut_point(self, virtual: str, offset: int):
+        # Une seule coupure par fichier, sur un transfert parti du début
+        if not self.cut_after or offset:
+            return None
+        with self._lock:
+            if virtual in self._cut_done:
+                return None
+            self._cut_done.add(virtual)
+        return self.cut_after
+
+    def transfer_started(self, offset: int):
+        with self._lock:
+            self.stats["retr"] += 1
+            if offset:
+                self.stats["resumed"] += 1
+                self.rest_offsets.append(offset)
+            self.stats["active"] += 1
+            self.stats["peak_active"] = max(self.stats["peak_active"], self.stats["active"])
+
+    def transfer_finished(self, sent: int, cut: bool):
+        with self._lock:
+            self.stats["active"] -= 1
+            self.stats["bytes_sent"] += sent
+            if cut:
+                self.stats["cuts"] += 1
+
+    # --- Connexions ---
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                sock, address = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock, address), daemon=True).start()
+
+    def _serve(self, sock, address):
+        if self.tls == "implicit":
+            try:
+                sock.settimeout(10)
+                sock = self.ssl_context.wrap_socket(sock, server_side=True)
+                sock.settimeout(None)
+            except (OSError, ssl.SSLError) as e:
+                self.log(f"Échec TLS avec {address}: {e}")
+                sock.close()
+                return
+        session = Session(self, sock, address)
+        if self.tls == "implicit":
+            session.protect_data = True
+        with self._lock:
+            self.stats["connections"] += 1
+            self._sessions.append(session)
+        try:
+            session.run()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._sessions.remove(session)
+            if session.passive is not None:
+                session.passive.close()
+            try:
+                session.sock.close()
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur FTP local de test (lecture seule)")
+    parser.add_argument("--root", required=True, help="Dossier servi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2121)
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--rate", default="0", help="Débit par transfert (ex. 2m; 0: illimité)")
+    parser.add_argument("--cut-after", default="0", help="Coupe le 1er transfert de chaque fichier après N octets")
+    parser.add_argument("--no-mlsd", action="store_true", help="Refuse MLSD (repli NLST du client)")
+    parser.add_argument("--tls", choices=("explicit", "implicit"), help="ftpes (AUTH TLS) ou ftps implicite")
+    args = parser.parse_args()
+
+    context = None
+    if args.tls:
+        import irc_standin
+        context, cert = irc_standin.self_signed_context(os.getcwd())
+        print(f"Certificat auto-signé: {cert} (tls_verify: false dans ftp_sites.json)")
+    server = FtpStandin(args.root, args.host, args.port, args.user, args.password, tls=args.tls,
+                        ssl_context=context, rate=parse_size(args.rate), mlsd=not args.no_mlsd,
+                        cut_after=parse_size(args.cut_after),
+                        log=lambda text: print(f"[{time.strftime('%H:%M:%S')}] {text}"))
+    print(f"Serveur FTP de test sur {server.address[0]}:{server.port}, racine {server.root} "
+          f"(utilisateur {args.user}/{args.password}, TLS={args.tls or 'non'}); Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
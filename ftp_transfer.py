@@ -0,0 +1,686 @@
+import os
+import re
+import ssl
+import time
+import ftplib
+import sqlite3
+import socket
+import posixpath
+import threading
+
+import ftp_export
+from releases_db import DB_PATH
+
+
+# Sites sans max_parallel dans ftp_sites.json
+DEFAULT_PARALLEL = 2
+BLOCK_SIZE = 64 * 1024
+# Écritures de progression en base au plus toutes les N secondes par job
+PROGRESS_INTERVAL = 0.5
+# Base de la file; par défaut <base des releases>.transfers.db. Pas la base des
+# releases: la progression y est écrite deux fois par seconde, et chaque écriture
+# y change PRAGMA data_version (cache Web, ETag et pages de la GUI invalidés)
+TRANSFER_DB_PATH = os.environ.get("TRANSFER_DB_PATH")
+DEFAULT_PORTS = {"ftp": 21, "ftpes": 21, "ftps": 990}
+# Un job « running » appartient au processus qui l'a pris (owner) et qui le signale
+# toutes les HEARTBEAT_INTERVAL secondes; sans signe de vie depuis HEARTBEAT_STALE
+# secondes (ou processus disparu), il est remis en file par les autres processus
+HEARTBEAT_INTERVAL = 10.0
+HEARTBEAT_STALE = 60.0
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# Caractères interdits dans un nom de fichier Windows (dont les séparateurs / et \)
+_UNSAFE_NAME_RE = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+_WINDOWS_RESERVED = {"CON", "PRN", "AUX", "NUL"} | {f"{p}{i}" for p in ("COM", "LPT") for i in range(1, 10)}
+
+
+class TransferError(Exception):
+    pass
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class ImplicitFTP_TLS(ftplib.FTP_TLS):
+    """FTPS implicite (ftps://, port 990): TLS dès l'ouverture de la connexion.
+
+    ftplib ne gère que le mode explicite (AUTH TLS); on chiffre donc la socket
+    de contrôle au moment où elle est affectée.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._sock = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def sock(self):
+        return self._sock
+
+    @sock.setter
+    def sock(self, value):
+        if value is not None and not isinstance(value, ssl.SSLSocket):
+            value = self.context.wrap_socket(value, server_hostname=self.host)
+        self._sock = value
+
+
+def connect(site: dict, timeout: float = 30.0) -> ftplib.FTP:
+    """Ouvre une session FTP/FTPS authentifiée, en mode binaire, selon la config du site."""
+    protocol = site["protocol"]
+    if protocol == "sftp":
+        raise TransferError("SFTP n'est pas géré par le moteur intégré (utilisez l'export WinSCP)")
+    context = ssl.create_default_context()
+    if not site.get("tls_verify", True):
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+    if protocol == "ftp":
+        ftp = ftplib.FTP(timeout=timeout)
+    elif protocol == "ftpes":
+        ftp = ftplib.FTP_TLS(context=context, timeout=timeout)
+    else:
+        ftp = ImplicitFTP_TLS(context=context, timeout=timeout)
+    try:
+        ftp.connect(site["host"], int(site["port"] or DEFAULT_PORTS[protocol]))
+        ftp.login(site["user"], site["pass"])
+        if isinstance(ftp, ftplib.FTP_TLS):
+            # Canal de données chiffré aussi
+            ftp.prot_p()
+        ftp.voidcmd("TYPE I")
+    except BaseException:
+        ftp.close()
+        raise
+    return ftp
+
+
+def safe_name(name: str) -> str:
+    """Nom de release ou de fichier distant utilisable comme un seul élément de chemin local.
+
+    Les noms viennent d'IRC et du serveur FTP: séparateurs, lecteurs (C:) et
+    caractères interdits sont remplacés, "." et ".." refusés.
+    """
+    clean = _UNSAFE_NAME_RE.sub("_", name).strip().rstrip(". ")
+    if clean in ("", ".", ".."):
+        raise TransferError(f"Nom de fichier inutilisable: {name!r}")
+    if clean.split(".")[0].upper() in _WINDOWS_RESERVED:
+        clean = "_" + clean
+    return clean
+
+
+def local_path_under(base: str, *names: str) -> str:
+    """base/nom1/nom2…, chaque nom nettoyé par safe_name; le chemin doit rester sous base."""
+    path = os.path.join(base, *(safe_name(n) for n in names))
+    root = os.path.realpath(base)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        raise TransferError(f"Chemin hors de {base}: {path}")
+    return path
+
+
+def _remote_size(ftp: ftplib.FTP, path: str):
+    try:
+        return ftp.size(path)
+    except ftplib.error_perm:
+        return None
+
+
+def _is_dir(ftp: ftplib.FTP, path: str) -> bool:
+    try:
+        ftp.cwd(path)
+        return True
+    except ftplib.error_perm:
+        return False
+
+
+def _list_dir(ftp: ftplib.FTP, path: str):
+    """Entrées (nom, est_dossier, taille) d'un dossier distant: MLSD, sinon NLST + sondage."""
+    try:
+        entries = []
+        for name, facts in ftp.mlsd(path, facts=["type", "size"]):
+            kind = (facts.get("type") or "").lower()
+            if kind in ("cdir", "pdir") or name in (".", ".."):
+                continue
+            size = facts.get("size")
+            entries.append((name, kind == "dir", int(size) if size and size.isdigit() else None))
+        ftp.voidcmd("TYPE I")
+        return entries
+    except ftplib.error_perm:
+        pass
+    entries = []
+    names = ftp.nlst(path)
+    # Les listings passent la session en ASCII; SIZE n'est fiable qu'en binaire
+    ftp.voidcmd("TYPE I")
+    for name in names:
+        name = posixpath.basename(name.rstrip("/"))
+        if name in ("", ".", ".."):
+            continue
+        full = posixpath.join(path, name)
+        size = _remote_size(ftp, full)
+        if size is not None:
+            entries.append((name, False, size))
+        else:
+            entries.append((name, _is_dir(ftp, full), None))
+    return entries
+
+
+def walk_remote(ftp: ftplib.FTP, path: str):
+    """Liste récursive des fichiers sous path: [(chemin_relatif, chemin_distant, taille)].
+
+    Si path est un fichier, retourne une seule entrée de chemin relatif "".
+    """
+    if not _is_dir(ftp, path):
+        size = _remote_size(ftp, path)
+        if size is None:
+            raise TransferError(f"Introuvable sur le serveur: {path}")
+        return [("", path, size)]
+    files = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        remote_dir = posixpath.join(path, rel_dir) if rel_dir else path
+        for name, is_dir, size in _list_dir(ftp, remote_dir):
+            rel = posixpath.join(rel_dir, name) if rel_dir else name
+            if is_dir:
+                stack.append(rel)
+            else:
+                files.append((rel, posixpath.join(remote_dir, name), size))
+    files.sort()
+    return files
+
+
+def download_file(ftp: ftplib.FTP, remote: str, local: str, size, on_data, cancel=None) -> int:
+    """Télécharge un fichier en reprenant là où le fichier local s'est arrêté (REST).
+
+    on_data(n) est appelé pour chaque bloc reçu. Retourne l'offset de reprise.
+    """
+    os.makedirs(os.path.dirname(local) or ".", exist_ok=True)
+    offset = os.path.getsize(local) if os.path.exists(local) else 0
+    if size is not None and offset == size:
+        return offset
+    if size is not None and offset > size:
+        # Fichier local plus grand que la source: on repart de zéro
+        offset = 0
+
+    with open(local, "ab" if offset else "wb") as f:
+        def on_block(data):
+            if cancel is not None and cancel.is_set():
+                raise TransferCancelled()
+            f.write(data)
+            on_data(len(data))
+
+        ftp.retrbinary(f"RETR {remote}", on_block, blocksize=BLOCK_SIZE, rest=offset or None)
+    return offset
+
+
+def transfers_db_path(releases_db_path: str) -> str:
+    """Fichier SQLite de la file de téléchargements associé à une base de releases."""
+    if TRANSFER_DB_PATH:
+        return TRANSFER_DB_PATH
+    root, _ext = os.path.splitext(releases_db_path)
+    return root + ".transfers.db"
+
+
+class TransferQueue:
+    """File de téléchargements persistante (table transfer_jobs, base SQLite à part).
+
+    Avec legacy_path (base des releases), les jobs d'une ancienne table
+    transfer_jobs y sont recopiés à la première ouverture.
+    """
+
+    def __init__(self, db_path: str, legacy_path: str | None = None):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.ensure_schema()
+        if legacy_path and os.path.exists(legacy_path) \
+                and os.path.abspath(legacy_path) != os.path.abspath(db_path):
+            self._import_legacy(legacy_path)
+        # Jobs interrompus (fermeture, crash): de nouveau en file, ils reprendront.
+        # Pas ceux qu'un autre processus (GUI, ligne de commande) est en train de télécharger
+        self.requeue_stale()
+
+    def ensure_schema(self):
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transfer_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                site TEXT NOT NULL,
+                release_id INTEGER,
+                release_name TEXT,
+                remote_path TEXT NOT NULL,
+                local_path TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                files_total INTEGER NOT NULL DEFAULT 0,
+                files_done INTEGER NOT NULL DEFAULT 0,
+                bytes_total INTEGER NOT NULL DEFAULT 0,
+                bytes_done INTEGER NOT NULL DEFAULT 0,
+                bytes_transferred INTEGER NOT NULL DEFAULT 0,
+                elapsed REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(transfer_jobs)")}
+        for name, decl in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE transfer_jobs ADD COLUMN {name} {decl}")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transfer_jobs_status ON transfer_jobs(status, site, id)"
+        )
+        self.conn.commit()
+
+    def requeue_stale(self) -> int:
+        """Remet en file les jobs « running » dont le propriétaire a disparu ou ne donne plus signe de vie."""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, owner, heartbeat FROM transfer_jobs WHERE status = 'running'"
+            ).fetchall()
+            stale = [r["id"] for r in rows
+                     if r["heartbeat"] is None or now - r["heartbeat"] > HEARTBEAT_STALE
+                     or not _owner_alive(r["owner"])]
+            if stale:
+                self.conn.executemany(
+                    "UPDATE transfer_jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running'",
+                    [(i,) for i in stale],
+                )
+                self.conn.commit()
+        return len(stale)
+
+    def touch(self, ids):
+        # Signe de vie des jobs en cours de ce processus
+        if not ids:
+            return
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE transfer_jobs SET heartbeat = ? WHERE id = ? AND owner = ?",
+                [(time.time(), i, OWNER) for i in ids],
+            )
+            self.conn.commit()
+
+    def _import_legacy(self, legacy_path: str):
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM transfer_jobs LIMIT 1").fetchone():
+                return
+            try:
+                legacy = sqlite3.connect(f"file:{legacy_path}?mode=ro", uri=True)
+                try:
+                    cur = legacy.execute("SELECT * FROM transfer_jobs ORDER BY id")
+                    columns = [d[0] for d in cur.description]
+                    rows = cur.fetchall()
+                finally:
+                    legacy.close()
+            except sqlite3.Error:
+                # Pas d'ancienne table transfer_jobs
+                return
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO transfer_jobs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows,
+            )
+            self.conn.commit()
+
+    def enqueue(self, site: dict, rows) -> list[int]:
+        """Ajoute une release par ligne; ignore celles déjà en file ou en cours pour ce site,
+        et celles dont le nom ne donne pas de chemin local sûr."""
+        ids = []
+        now = time.time()
+        with self.lock:
+            for r in rows:
+                remote = ftp_export.remote_path(r, site)
+                exists = self.conn.execute(
+                    "SELECT 1 FROM transfer_jobs WHERE site = ? AND remote_path = ? AND status IN ('queued', 'running')",
+                    (site["name"], remote),
+                ).fetchone()
+                if exists:
+                    continue
+                try:
+                    local = local_path_under(site["local_base_dir"], ftp_export.release_type(r),
+                                             posixpath.basename(remote))
+                except TransferError:
+                    continue
+                cur = self.conn.execute(
+                    """
+                    INSERT INTO transfer_jobs(site, release_id, release_name, remote_path, local_path, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (site["name"], r["id"], (r["message"] or "").strip(), remote, local, now),
+                )
+                ids.append(cur.lastrowid)
+            self.conn.commit()
+        return ids
+
+    def claim(self, site_name: str):
+        """Passe le plus ancien job en file de ce site à 'running' et le retourne (ou None).
+
+        La base est partagée entre processus (GUI, CLI): l'UPDATE ne réussit que si
+        le job est toujours en file, sinon un autre l'a pris et on passe au suivant.
+        """
+        with self.lock:
+            while True:
+                row = self.conn.execute(
+                    "SELECT * FROM transfer_jobs WHERE status = 'queued' AND site = ? ORDER BY id LIMIT 1",
+                    (site_name,),
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                cur = self.conn.execute(
+                    """
+                    UPDATE transfer_jobs SET status = 'running', error = NULL, attempts = attempts + 1,
+                        started_at = COALESCE(started_at, ?), owner = ?, heartbeat = ?
+                    WHERE id = ? AND status = 'queued'
+                    """,
+                    (now, OWNER, now, row["id"]),
+                )
+                self.conn.commit()
+                if cur.rowcount == 1:
+                    return dict(row)
+
+    def update(self, job_id: int, **fields):
+        if not fields:
+            return
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self.lock:
+            self.conn.execute(f"UPDATE transfer_jobs SET {cols} WHERE id = ?", list(fields.values()) + [job_id])
+            self.conn.commit()
+
+    def pending_sites(self) -> list[str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT site FROM transfer_jobs WHERE status = 'queued'").fetchall()
+        return [r[0] for r in rows]
+
+    def fail_queued(self, site_name: str, error: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE transfer_jobs SET status = 'failed', error = ?, finished_at = ? WHERE status = 'queued' AND site = ?",
+                (error, time.time(), site_name),
+            )
+            self.conn.commit()
+
+    def cancel_queued(self, ids) -> None:
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE transfer_jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                [(time.time(), i) for i in ids],
+            )
+            self.conn.commit()
+
+    def retry(self, ids) -> None:
+        # Les fichiers partiels restent sur disque: la relance reprend où elle s'était arrêtée
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE transfer_jobs SET status = 'queued', error = NULL, finished_at = NULL "
+                "WHERE id = ? AND status IN ('failed', 'cancelled')",
+                [(i,) for i in ids],
+            )
+            self.conn.commit()
+
+    def purge_finished(self) -> int:
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM transfer_jobs WHERE status IN ('done', 'cancelled')")
+            self.conn.commit()
+            return cur.rowcount
+
+    def jobs(self, limit: int = 500) -> list[dict]:
+        """Derniers jobs avec statistiques de débit (octets/s sur le temps de transfert cumulé)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM transfer_jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        out = []
+        for r in rows:
+            job = dict(r)
+            job["rate"] = job["bytes_transferred"] / job["elapsed"] if job["elapsed"] > 0 else 0.0
+            job["progress"] = job["bytes_done"] / job["bytes_total"] if job["bytes_total"] else 0.0
+            out.append(job)
+        return out
+
+
+class TransferEngine:
+    """Exécute la file transfer_jobs: jusqu'à max_parallel connexions par site.
+
+    Chaque worker garde sa connexion FTP d'un job à l'autre. `connect` et
+    `site_overrides` (ex. {"host": "127.0.0.1", "port": 2121}) permettent de
+    viser un serveur local pour les essais.
+    """
+
+    def __init__(self, queue: TransferQueue, load_site=ftp_export.load_site, connect=connect,
+                 site_overrides: dict | None = None, poll_interval: float = 2.0):
+        self.queue = queue
+        self.load_site = load_site
+        self.connect = connect
+        self.site_overrides = dict(site_overrides or {})
+        self.poll_interval = poll_interval
+        self._workers = {}  # site -> [threads]
+        self._cancel = {}  # job_id -> Event
+        self._user_cancelled = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        # Les jobs en cours sont interrompus et remis en file (reprise au prochain démarrage)
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            for ev in self._cancel.values():
+                ev.set()
+            threads = [t for ts in self._workers.values() for t in ts]
+        for t in threads:
+            t.join(timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def cancel(self, ids):
+        self.queue.cancel_queued(ids)
+        with self._lock:
+            for i in ids:
+                ev = self._cancel.get(i)
+                if ev is not None:
+                    self._user_cancelled.add(i)
+                    ev.set()
+
+    def is_idle(self) -> bool:
+        with self._lock:
+            busy = any(t.is_alive() for ts in self._workers.values() for t in ts)
+        return not busy and not self.queue.pending_sites()
+
+    def _site(self, name: str) -> dict:
+        site = self.load_site(site_name=name)
+        site.update(self.site_overrides)
+        return site
+
+    def _heartbeat(self):
+        with self._lock:
+            running = list(self._cancel)
+        self.queue.touch(running)
+        # Jobs d'un autre processus arrêté sans les rendre (crash, fermeture brutale)
+        self.queue.requeue_stale()
+
+    def _dispatch(self):
+        last_beat = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+                last_beat = time.monotonic()
+                self._heartbeat()
+            for name in self.queue.pending_sites():
+                try:
+                    site = self._site(name)
+                except (FileNotFoundError, ftp_export.FtpConfigError) as e:
+                    self.queue.fail_queued(name, f"Config FTP: {e}")
+                    continue
+                self._ensure_workers(site)
+            self._wake.wait(min(self.poll_interval, HEARTBEAT_INTERVAL))
+            self._wake.clear()
+
+    def _ensure_workers(self, site: dict):
+        with self._lock:
+            alive = [t for t in self._workers.get(site["name"], []) if t.is_alive()]
+            for _ in range(max(1, int(site.get("max_parallel") or DEFAULT_PARALLEL)) - len(alive)):
+                t = threading.Thread(target=self._worker, args=(site,), daemon=True)
+                t.start()
+                alive.append(t)
+            self._workers[site["name"]] = alive
+
+    def _worker(self, site: dict):
+        ftp = None
+        try:
+            while not self._stop.is_set():
+                job = self.queue.claim(site["name"])
+                if job is None:
+                    return
+                cancel = threading.Event()
+                with self._lock:
+                    self._cancel[job["id"]] = cancel
+                try:
+                    if ftp is None:
+                        ftp = self.connect(site)
+                    self._run_job(ftp, job, cancel)
+                    self.queue.update(job["id"], status="done", finished_at=time.time())
+                except TransferCancelled:
+                    ftp = _drop(ftp)
+                    # Annulation utilisateur: abandonné; arrêt du moteur: le job reprendra
+                    with self._lock:
+                        user = job["id"] in self._user_cancelled
+                    status = "cancelled" if user or not self._stop.is_set() else "queued"
+                    self.queue.update(job["id"], status=status, finished_at=None if status == "queued" else time.time())
+                except Exception as e:
+                    ftp = _drop(ftp)
+                    self.queue.update(job["id"], status="failed", error=str(e) or e.__class__.__name__,
+                                      finished_at=time.time())
+                finally:
+                    with self._lock:
+                        self._cancel.pop(job["id"], None)
+                        self._user_cancelled.discard(job["id"])
+        finally:
+            _drop(ftp, quit=True)
+            # Des jobs ont pu arriver pendant la fermeture
+            self._wake.set()
+
+    def _run_job(self, ftp: ftplib.FTP, job: dict, cancel: threading.Event):
+        files = walk_remote(ftp, job["remote_path"])
+        bytes_total = sum(size or 0 for _, _, size in files)
+        self.queue.update(job["id"], files_total=len(files), bytes_total=bytes_total)
+
+        stats = {
+            "bytes_done": 0,
+            "bytes_transferred": job["bytes_transferred"],
+            "elapsed": job["elapsed"],
+        }
+        t0 = time.monotonic()
+        last_flush = [t0]
+
+        def flush(files_done: int):
+            now = time.monotonic()
+            self.queue.update(job["id"], files_done=files_done, bytes_done=stats["bytes_done"],
+                              bytes_transferred=stats["bytes_transferred"], elapsed=stats["elapsed"] + (now - t0))
+            last_flush[0] = now
+
+        def on_data(n: int):
+            stats["bytes_done"] += n
+            stats["bytes_transferred"] += n
+            if time.monotonic() - last_flush[0] >= PROGRESS_INTERVAL:
+                flush(files_done)
+
+        files_done = 0
+        try:
+            for rel, remote, size in files:
+                if cancel.is_set():
+                    raise TransferCancelled()
+                # Noms fournis par le serveur: rien ne doit sortir du dossier du job
+                local = local_path_under(job["local_path"], *rel.split("/")) if rel else job["local_path"]
+                offset = download_file(ftp, remote, local, size, on_data, cancel)
+                # Octets déjà présents localement (reprise) comptés comme faits
+                stats["bytes_done"] += offset
+                files_done += 1
+        finally:
+            # Statistiques conservées aussi en cas d'échec ou d'interruption
+            flush(files_done)
+
+
+def _owner_alive(owner) -> bool:
+    """Faux si owner est un processus de cette machine qui n'existe plus; vrai dans le doute."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        # Autre machine, ou Windows (os.kill y termine le processus): on s'en tient au heartbeat
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Existe mais appartient à un autre utilisateur
+        return True
+    return True
+
+
+def _drop(ftp, quit: bool = False):
+    # Connexion dans un état incertain (transfert interrompu): on la ferme
+    if ftp is not None:
+        try:
+            if quit:
+                ftp.quit()
+            else:
+                ftp.close()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+    return None
+
+
+def format_rate(rate: float) -> str:
+    for unit in ("o/s", "Ko/s", "Mo/s"):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} Go/s"
+
+
+def main():
+    # Traite la file en ligne de commande jusqu'à ce qu'elle soit vide:
+    #   python ftp_transfer.py [--host 127.0.0.1 --port 2121]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exécute la file de téléchargements FTP (transfer_jobs)")
+    parser.add_argument("--db", default=DB_PATH, help="Base des releases (la file est dans <base>.transfers.db)")
+    parser.add_argument("--host", help="Remplace l'hôte des sites (serveur de test local)")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--parallel", type=int, help="Remplace max_parallel des sites")
+    args = parser.parse_args()
+
+    overrides = {k: v for k, v in (("host", args.host), ("port", args.port), ("max_parallel", args.parallel)) if v}
+    queue = TransferQueue(transfers_db_path(args.db), legacy_path=args.db)
+    engine = TransferEngine(queue, site_overrides=overrides, poll_interval=0.5)
+    engine.start()
+    try:
+        while True:
+            time.sleep(1.0)
+            if engine.is_idle():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    for job in reversed(queue.jobs(limit=50)):
+        print(f"#{job['id']} {job['status']:<9} {job['files_done']}/{job['files_total']} fichiers "
+              f"{job['bytes_done']}/{job['bytes_total']} o {format_rate(job['rate'])} {job['release_name']}"
+              + (f" ({job['error']})" if job["error"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Latence d'ingestion d'une annonce, depuis sa réception par le logger
+# (on_pubmsg) jusqu'à sa première livraison par le serveur Web:
+#   filtered   réception -> fin du filtrage (toutes les annonces)
+#   committed  réception -> COMMIT de la release en base
+#   delivered  réception -> premier envoi au navigateur (flux SSE ou réponse API)
+# Les temps sont des horodatages time.time(): ils voyagent avec l'événement
+# release-logged (champ recv_ts), y compris vers le processus Web (--web-process).
+# Chaque étape alimente un histogramme (/metrics) et une fenêtre glissante des
+# dernières mesures (percentiles, /api/debug/ingest).
+# INGEST_SAMPLE=0.1 garde en plus 10 % des releases dans la table ingest_latency.
+import os
+import time
+import random
+import threading
+from collections import OrderedDict, deque
+
+import metrics
+
+STAGES = ("filtered", "committed", "delivered")
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+INGEST_SECONDS = metrics.histogram("ingest_latency_seconds", "Latence depuis la réception IRC, par étape", ("stage",),
+                                   buckets=BUCKETS)
+DELIVERIES = metrics.counter("ingest_deliveries_total", "Premières livraisons de releases, par voie", ("via",))
+
+# Fenêtre glissante: dernières mesures par étape, au plus WINDOW_SECONDS
+WINDOW_SIZE = 1000
+WINDOW_SECONDS = 900.0
+# Part des releases dont la latence est gardée en base (0 = aucune)
+SAMPLE_RATE = float(os.environ.get("INGEST_SAMPLE", "0"))
+
+
+class LatencyWindow:
+    """Dernières latences d'une étape, pour des percentiles récents."""
+
+    def __init__(self, size: int = WINDOW_SIZE, seconds: float = WINDOW_SECONDS):
+        self.seconds = seconds
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, value: float, now: float):
+        with self._lock:
+            self._values.append((now, value))
+
+    def summary(self) -> dict:
+        since = time.time() - self.seconds
+        with self._lock:
+            values = sorted(v for t, v in self._values if t >= since)
+        if not values:
+            return {"count": 0}
+
+        def pct(p):
+            # Rang le plus proche, comme loadtest_web.py
+            return values[max(0, min(len(values) - 1, int(round(p / 100.0 * len(values) + 0.5)) - 1))]
+
+        return {"count": len(values), "p50": pct(50), "p90": pct(90), "p99": pct(99), "max": values[-1]}
+
+
+WINDOWS = {stage: LatencyWindow() for stage in STAGES}
+_CHILDREN = {stage: INGEST_SECONDS.labels(stage) for stage in STAGES}
+
+
+def observe(stage: str, recv_ts: float, now: float | None = None) -> float:
+    """Enregistre la latence de `stage` pour une annonce reçue à recv_ts; renvoie les secondes."""
+    now = time.time() if now is None else now
+    latency = max(0.0, now - recv_ts)
+    _CHILDREN[stage].observe(latency)
+    WINDOWS[stage].add(latency, now)
+    return latency
+
+
+def summary() -> dict:
+    return {"window_seconds": WINDOW_SECONDS, "stages": {stage: WINDOWS[stage].summary() for stage in STAGES}}
+
+
+class DeliveryTracker:
+    """Releases enregistrées en attente de leur première livraison (processus Web).
+
+    Une release est comptée une seule fois, par la première voie qui l'envoie:
+    flux SSE (release-logged) ou réponse de /api/releases, /api/page.
+    """
+
+    def __init__(self, maxsize: int = 2000):
+        self.maxsize = maxsize
+        self._pending = OrderedDict()
+        self._done = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_release(self, event):
+        # Abonné du bus (release-logged); recv_ts absent si le logger est ancien
+        recv_ts = event.data.get("recv_ts")
+        row_id = event.data.get("row_id")
+        if recv_ts is None or row_id is None:
+            return
+        with self._lock:
+            if row_id not in self._done:
+                self._pending[row_id] = recv_ts
+                while len(self._pending) > self.maxsize:
+                    self._pending.popitem(last=False)
+
+    def delivered(self, row_id, via: str, recv_ts: float | None = None):
+        with self._lock:
+            recv_ts = self._pending.pop(row_id, None) or recv_ts
+            if recv_ts is None or row_id in self._done:
+                return
+            self._done[row_id] = None
+            while len(self._done) > self.maxsize:
+                self._done.popitem(last=False)
+        observe("delivered", recv_ts)
+        DELIVERIES.labels(via).inc()
+
+    def delivered_rows(self, rows, via: str = "api"):
+        # Appelé à chaque calcul de page: rien à faire sans release en attente
+        if not self._pending:
+            return
+        for row in rows:
+            if row["id"] in self._pending:
+                self.delivered(row["id"], via)
+
+
+# --- Échantillon persistant (INGEST_SAMPLE) ---
+
+def ensure_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_latency (
+            release_id INTEGER PRIMARY KEY,
+            recv_ts REAL NOT NULL,
+            filter_ms REAL,
+            commit_ms REAL NOT NULL
+        )
+        """
+    )
+
+
+class LatencySampler:
+    """Garde la latence réception -> commit d'une partie des releases.
+
+    Les mesures d'une release ne sont connues qu'après son COMMIT: elles sont
+    écrites dans la transaction de la release suivante (flush avant son commit),
+    ce qui n'ajoute ni commit ni changement de génération de la base.
+    """
+
+    def __init__(self, rate: float = SAMPLE_RATE):
+        self.rate = rate
+        self._pending = []
+        self._table_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def add(self, row_id: int, recv_ts: float, filter_s: float | None, commit_s: float):
+        if self.rate >= 1 or random.random() < self.rate:
+            self._pending.append((row_id, recv_ts, None if filter_s is None else filter_s * 1000, commit_s * 1000))
+
+    def flush(self, cursor):
+        # À appeler sous le verrou de la connexion, avant son commit
+        if not self._pending:
+            return
+        if not self._table_ready:
+            ensure_table(cursor.connection)
+            self._table_ready = True
+        cursor.executemany(
+            "INSERT OR REPLACE INTO ingest_latency (release_id, recv_ts, filter_ms, commit_ms) VALUES (?, ?, ?, ?)",
+            self._pending,
+        )
+        self._pending = []
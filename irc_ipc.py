@@ -0,0 +1,358 @@
+import os
+import time
+import secrets
+import threading
+import subprocess
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+import event_bus
+import ingest_trace
+import metrics
+import profiling
+
+
+# Variables transmises au processus Web pour joindre le logger
+IPC_ADDRESS_ENV = "IRC_IPC_ADDRESS"  # "hôte:port"
+IPC_AUTHKEY_ENV = "IRC_IPC_AUTHKEY"  # clé partagée (hex)
+IPC_TIMEOUT = 5.0
+# Événements en attente par abonné; au-delà, les plus anciens sont perdus
+EVENT_QUEUE_SIZE = 1000
+
+
+def _nick(logger):
+    try:
+        nv = getattr(logger, "nick_var", None)
+        return nv.get().strip() if nv else None
+    except Exception:
+        return None
+
+
+class IrcControlServer:
+    """Expose un IRCLoggerGUI aux autres processus via un canal local authentifié.
+
+    Requêtes: status, connect, disconnect, send_privmsg, metrics, ingest, profile.
+    Une connexion qui envoie `subscribe` reçoit ensuite les événements du bus du
+    logger (event_bus.TOPICS), sous la forme {"topic": …, "seq": …, "ts": …, "data": {…}}.
+    """
+
+    def __init__(self, logger, host: str = "127.0.0.1", port: int = 0, authkey: bytes | None = None):
+        self.logger = logger
+        self.bus = getattr(logger, "bus", None) or event_bus.BUS
+        self.authkey = authkey or secrets.token_bytes(32)
+        self.listener = Listener((host, port), authkey=self.authkey)
+        self.address = self.listener.address
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def env(self) -> dict:
+        host, port = self.address
+        return {IPC_ADDRESS_ENV: f"{host}:{port}", IPC_AUTHKEY_ENV: self.authkey.hex()}
+
+    def close(self):
+        self._closed.set()
+        # Débloquer accept() (fermer la socket depuis un autre thread ne suffit pas
+        # sous Linux: elle resterait à l'écoute jusqu'au retour d'accept)
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        try:
+            self.listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+        for sub in subscriptions:
+            sub.close()
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed.is_set():
+                    return
+                continue
+            if self._closed.is_set():
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                msg = conn.recv()
+                op = msg.get("op") if isinstance(msg, dict) else None
+                if op == "subscribe":
+                    conn.send({"ok": True, "result": None})
+                    # La connexion ne sert plus qu'au flux d'événements
+                    return self._stream_events(conn)
+                try:
+                    reply = {"ok": True, "result": self._handle(op, msg)}
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e) or e.__class__.__name__}
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _handle(self, op, msg):
+        logger = self.logger
+        if op == "status":
+            liveness = getattr(logger, "liveness", None)
+            return {"connected": bool(getattr(logger, "connected", False)), "nick": _nick(logger),
+                    "liveness": liveness() if callable(liveness) else None}
+        if op == "connect":
+            if not getattr(logger, "connected", False):
+                logger.start_connection()
+            return None
+        if op == "disconnect":
+            logger.stop_connection()
+            return None
+        if op == "send_privmsg":
+            return bool(logger.send_privmsg(msg.get("channel"), msg.get("text")))
+        if op == "metrics":
+            # Métriques du processus du logger (IRC, base, bus), fusionnées par /metrics
+            return [tuple(f) for f in metrics.REGISTRY.collect() + metrics.bus_families(self.bus)]
+        if op == "ingest":
+            return ingest_trace.summary()
+        if op == "profile":
+            # Profilage du processus du logger (voir profiling.py)
+            return profiling.PROFILER.handle(msg.get("kind"), msg.get("seconds"), msg.get("interval"),
+                                             msg.get("action"))
+        raise ValueError(f"Opération inconnue: {op}")
+
+    def _stream_events(self, conn):
+        # Un thread d'envoi par abonné: un client lent ne bloque pas le thread IRC,
+        # sa file bornée perd ses plus anciens événements
+        sub = self.bus.subscribe(event_bus.TOPICS, maxsize=EVENT_QUEUE_SIZE, name="ipc")
+        with self._lock:
+            self._subscriptions.append(sub)
+        try:
+            # État courant d'abord, pour un client qui (re)vient
+            status = self.bus.last(event_bus.STATUS_CHANGED)
+            if status is not None:
+                conn.send(status._asdict())
+            while True:
+                event = sub.get()
+                if event is None:
+                    return
+                conn.send(event._asdict())
+        except (OSError, ValueError):
+            pass
+        finally:
+            sub.close()
+            with self._lock:
+                self._subscriptions = [s for s in self._subscriptions if s is not sub]
+
+
+class _RemoteNick:
+    # Imite le tk.StringVar nick_var lu par web_server/nfo_cache
+    def __init__(self, remote):
+        self._remote = remote
+
+    def get(self) -> str:
+        return self._remote.status().get("nick") or ""
+
+
+class RemoteIrcLogger:
+    """Mandataire du logger IRC d'un autre processus, utilisable comme irc_logger du serveur Web.
+
+    Fournit connected, start_connection, stop_connection, send_privmsg, nick_var et
+    bus: les événements du logger distant y sont republiés. Si le logger reste
+    injoignable plus de lost_timeout secondes, on_lost() est appelé.
+    """
+
+    def __init__(self, address, authkey: bytes, timeout: float = IPC_TIMEOUT,
+                 on_lost=None, lost_timeout: float = 10.0, bus=None):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.on_lost = on_lost
+        self.lost_timeout = lost_timeout
+        self.bus = bus or event_bus.BUS
+        self.nick_var = _RemoteNick(self)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._status = {"connected": False, "nick": None}
+        self._status_at = 0.0
+        threading.Thread(target=self._event_loop, daemon=True).start()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        address = os.environ.get(IPC_ADDRESS_ENV)
+        authkey = os.environ.get(IPC_AUTHKEY_ENV)
+        if not address or not authkey:
+            return None
+        host, _, port = address.rpartition(":")
+        return cls((host, int(port)), bytes.fromhex(authkey), **kwargs)
+
+    def _call(self, op: str, **params):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, authkey=self.authkey)
+                    self._conn.send(dict(params, op=op))
+                    if not self._conn.poll(self.timeout):
+                        # Réponse en retard: la connexion est désynchronisée, on la jette
+                        self._drop()
+                        raise TimeoutError(f"Pas de réponse du logger IRC ({op})")
+                    reply = self._conn.recv()
+                    break
+                except TimeoutError:
+                    raise
+                except (OSError, EOFError):
+                    # Connexion coupée: une nouvelle tentative sur une connexion neuve
+                    self._drop()
+                    if attempt:
+                        raise ConnectionError("Logger IRC injoignable")
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error") or "Erreur logger IRC")
+        return reply.get("result")
+
+    def _drop(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def status(self) -> dict:
+        # Statut mis en cache 1 s (les changements arrivent aussi par événement)
+        if time.monotonic() - self._status_at > 1.0:
+            try:
+                self._status = self._call("status")
+            except Exception:
+                self._status = {"connected": False, "nick": None}
+            self._status_at = time.monotonic()
+        return self._status
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.status().get("connected"))
+
+    def liveness(self) -> dict | None:
+        return self.status().get("liveness")
+
+    def start_connection(self):
+        self._call("connect")
+        self._status_at = 0.0
+
+    def stop_connection(self):
+        self._call("disconnect")
+        self._status_at = 0.0
+
+    def send_privmsg(self, channel, text) -> bool:
+        try:
+            return bool(self._call("send_privmsg", channel=channel, text=text))
+        except Exception:
+            return False
+
+    def metrics_families(self) -> list:
+        return [metrics.Family(*f) for f in self._call("metrics")]
+
+    def ingest_summary(self) -> dict:
+        return self._call("ingest")
+
+    def profile(self, kind: str = "status", **params) -> dict:
+        # kind: "cpu" (seconds, interval), "memory" (action) ou "status"
+        return self._call("profile", kind=kind, **params)
+
+    def _event_loop(self):
+        lost_since = None
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except (OSError, EOFError, AuthenticationError):
+                now = time.monotonic()
+                lost_since = lost_since or now
+                if self.on_lost is not None and now - lost_since > self.lost_timeout:
+                    self.on_lost()
+                    return
+                time.sleep(1.0)
+                continue
+            lost_since = None
+            try:
+                conn.send({"op": "subscribe"})
+                conn.recv()
+                while True:
+                    self._dispatch(conn.recv())
+            except (OSError, EOFError):
+                lost_since = time.monotonic()
+            finally:
+                conn.close()
+
+    def _dispatch(self, event: dict):
+        topic, data = event.get("topic"), event.get("data") or {}
+        if topic == event_bus.STATUS_CHANGED:
+            self._status = dict(self._status, connected=bool(data.get("connected")))
+            self._status_at = time.monotonic()
+        if topic in event_bus.TOPICS:
+            self.bus.publish(topic, **data)
+
+
+class SupervisedProcess:
+    """Lance un processus enfant et le relance s'il s'arrête, avec un délai croissant.
+
+    Le délai double à chaque arrêt (de min_backoff à max_backoff) et revient au
+    minimum dès que l'enfant a tenu stable_after secondes.
+    """
+
+    def __init__(self, args: list, env: dict | None = None, cwd: str | None = None,
+                 min_backoff: float = 1.0, max_backoff: float = 30.0, stable_after: float = 60.0,
+                 on_event=print):
+        self.args = args
+        self.name = os.path.basename(args[-1])
+        self.env = env
+        self.cwd = cwd
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.on_event = on_event
+        self.restarts = 0
+        self.proc = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._supervise, daemon=True)
+        self._thread.start()
+
+    def _supervise(self):
+        backoff = self.min_backoff
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.proc = subprocess.Popen(self.args, env=self.env, cwd=self.cwd)
+            except OSError as e:
+                self.on_event(f"Processus {self.name}: lancement impossible ({e})")
+                code = None
+            else:
+                code = self.proc.wait()
+            if self._stop.is_set():
+                return
+            if time.monotonic() - started >= self.stable_after:
+                backoff = self.min_backoff
+            self.restarts += 1
+            self.on_event(f"Processus {self.name} arrêté (code {code}), relance dans {backoff:g}s")
+            if self._stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if self._thread is not None:
+            self._thread.join(timeout)
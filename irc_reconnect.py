@@ -0,0 +1,203 @@
+# Reconnexion et rejoin du logger IRC:
+# - Backoff: délai exponentiel entre tentatives (IRC_RECONNECT_MIN, doublé à chaque
+#   échec jusqu'à IRC_RECONNECT_MAX), majoré d'un aléa (jitter) pour ne pas
+#   revenir en même temps que les autres clients après une coupure du serveur.
+#   Une connexion restée ouverte IRC_RECONNECT_STABLE secondes remet le délai
+#   au minimum: une coupure isolée coûte ~1 s, un serveur instable est ménagé.
+# - ReconnectScheduler: attente interruptible (stop_connection), abandon après N
+#   échecs sauf en mode démon, durée de chaque reconnexion (perte -> channels rejoints).
+# - RejoinScheduler: un seul endroit pour les rejoin après PART/KICK, un minuteur
+#   par channel, délai croissant si l'on est expulsé en boucle, tout annulé à la
+#   déconnexion.
+import os
+import time
+import random
+import threading
+
+import metrics
+
+RECONNECT_MIN = float(os.environ.get("IRC_RECONNECT_MIN", "1"))
+RECONNECT_MAX = float(os.environ.get("IRC_RECONNECT_MAX", "300"))
+RECONNECT_FACTOR = 2.0
+# Aléa ajouté au délai (fraction): 0.5 -> entre 1x et 1,5x
+RECONNECT_JITTER = 0.5
+RECONNECT_STABLE = float(os.environ.get("IRC_RECONNECT_STABLE", "60"))
+# Mode démon: jamais d'abandon, quel que soit le nombre d'échecs
+DAEMON = os.environ.get("IRC_DAEMON") == "1"
+
+REJOIN_DELAY = 5.0
+REJOIN_MAX = 300.0
+# Expulsions rapprochées: au-delà de cette fenêtre, le délai de rejoin repart du minimum
+REJOIN_WINDOW = 600.0
+# Longueur d'un JOIN groupé (les lignes IRC sont limitées à 512 octets)
+JOIN_LINE_MAX = 400
+
+RECONNECT_SECONDS = metrics.histogram(
+    "irc_reconnect_seconds", "Durée d'une reconnexion, de la perte aux channels rejoints",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+RECONNECT_DELAY_SECONDS = metrics.histogram(
+    "irc_reconnect_delay_seconds", "Attente choisie avant une tentative de connexion",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+REJOINS = metrics.counter("irc_rejoins_total", "Rejoin programmés après PART ou KICK", ("reason",))
+
+
+class Backoff:
+    """Délais exponentiels avec aléa: minimum, minimum x facteur, … plafonnés."""
+
+    def __init__(self, minimum: float = RECONNECT_MIN, maximum: float = RECONNECT_MAX,
+                 factor: float = RECONNECT_FACTOR, jitter: float = RECONNECT_JITTER, rng=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        base = min(self.maximum, self.minimum * self.factor ** self.attempts)
+        self.attempts += 1
+        # Jamais sous le minimum (délai avant la première tentative)
+        return min(self.maximum, base * (1.0 + self.jitter * self.rng.random()))
+
+    def reset(self):
+        self.attempts = 0
+
+
+class ReconnectScheduler:
+    """Enchaînement des tentatives de irc_loop."""
+
+    def __init__(self, backoff: Backoff | None = None, daemon: bool = DAEMON, stable: float = RECONNECT_STABLE,
+                 clock=time.monotonic):
+        self.backoff = backoff or Backoff()
+        self.daemon = daemon
+        self.stable = stable
+        self.clock = clock
+        self.failures = 0
+        self._connected_at = None
+        self._lost_at = None
+        self._wake = threading.Event()
+
+    def reset(self):
+        # Connexion demandée par l'utilisateur: on repart du délai minimal
+        self.backoff.reset()
+        self.failures = 0
+        self._lost_at = None
+        self._wake.clear()
+
+    def connected(self):
+        self._connected_at = self.clock()
+        self.failures = 0
+
+    def joined(self):
+        """Channels rejoints: fin de la reconnexion en cours. Renvoie sa durée (ou None)."""
+        if self._lost_at is None:
+            return None
+        duration = self.clock() - self._lost_at
+        self._lost_at = None
+        RECONNECT_SECONDS.observe(duration)
+        return duration
+
+    def lost(self) -> float:
+        """Connexion perdue après avoir été établie; renvoie le délai avant la prochaine tentative."""
+        now = self.clock()
+        if self._connected_at is not None and now - self._connected_at >= self.stable:
+            self.backoff.reset()
+        self._connected_at = None
+        if self._lost_at is None:
+            self._lost_at = now
+        return self._next_delay()
+
+    def failed(self, max_attempts: int) -> float | None:
+        """Échec de connexion; renvoie le délai, ou None s'il faut abandonner."""
+        self.failures += 1
+        if self._lost_at is None:
+            self._lost_at = self.clock()
+        if not self.daemon and max_attempts > 0 and self.failures >= max_attempts:
+            self._lost_at = None
+            return None
+        return self._next_delay()
+
+    def _next_delay(self) -> float:
+        delay = self.backoff.next_delay()
+        RECONNECT_DELAY_SECONDS.observe(delay)
+        return delay
+
+    def wait(self, delay: float) -> bool:
+        """Attend delay secondes; False si réveillé par wake() (arrêt demandé)."""
+        woken = self._wake.wait(delay)
+        self._wake.clear()
+        return not woken
+
+    def wake(self):
+        self._wake.set()
+
+
+def join_channels(connection, channels):
+    """Rejoint plusieurs channels en un minimum de lignes JOIN #a,#b,…"""
+    line = []
+    for chan in channels:
+        if line and len(",".join(line + [chan])) > JOIN_LINE_MAX:
+            connection.join(",".join(line))
+            line = []
+        line.append(chan)
+    if line:
+        connection.join(",".join(line))
+
+
+class RejoinScheduler:
+    """Rejoin différés après PART/KICK, un minuteur par channel."""
+
+    def __init__(self, on_join=None, delay: float = REJOIN_DELAY, maximum: float = REJOIN_MAX,
+                 window: float = REJOIN_WINDOW, clock=time.monotonic):
+        # on_join(chan, delay, reason): notification (journal) au moment de la programmation
+        self.on_join = on_join
+        self.delay = delay
+        self.maximum = maximum
+        self.window = window
+        self.clock = clock
+        self._timers = {}
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, connection, chan: str, reason: str) -> float:
+        now = self.clock()
+        with self._lock:
+            # Expulsions répétées dans la fenêtre: délai doublé à chaque fois
+            recent = [t for t in self._history.get(chan, []) if now - t < self.window]
+            recent.append(now)
+            self._history[chan] = recent
+            delay = min(self.maximum, self.delay * 2 ** (len(recent) - 1))
+            old = self._timers.pop(chan, None)
+            if old is not None:
+                old.cancel()
+            timer = threading.Timer(delay, self._fire, args=(connection, chan))
+            timer.daemon = True
+            self._timers[chan] = timer
+            timer.start()
+        REJOINS.labels(reason).inc()
+        if self.on_join is not None:
+            self.on_join(chan, delay, reason)
+        return delay
+
+    def _fire(self, connection, chan):
+        with self._lock:
+            self._timers.pop(chan, None)
+        try:
+            if connection.is_connected():
+                connection.join(chan)
+        except Exception:
+            pass
+
+    def pending(self) -> list:
+        with self._lock:
+            return sorted(self._timers)
+
+    def cancel_all(self):
+        # Déconnexion: les channels seront rejoints au prochain welcome
+        with self._lock:
+            timers = list(self._timers.values())
+            self._timers.clear()
+        for timer in timers:
+            timer.cancel()
@@ -0,0 +1,379 @@
+# Serveur IRC local minimal, scripté, pour tester le logger sans réseau:
+#   python irc_standin.py [--port 6667] [--rate 5] [--tls --cert c.pem --key k.pem]
+# puis connecter irclog+.py à localhost. Il accepte les clients (NICK/USER,
+# welcome 001-004 et fin de MOTD), gère JOIN/PART/PING/QUIT, envoie des
+# annonces de releases au format des bots de pre (couleurs mIRC, [PRE] [TV] …)
+# au débit voulu, répond aux !nfo par un lien et coupe les connexions à la
+# demande: fermeture propre, RST, ou silence (TCP à moitié ouvert). Utilisé par
+# bench_irc.py pour mesurer l'ingestion et les reconnexions de bout en bout.
+import os
+import ssl
+import sys
+import time
+import random
+import socket
+import struct
+import argparse
+import threading
+from datetime import datetime
+
+import bench_db
+import nfo_cache
+
+SERVER_NAME = "standin.local"
+BOT_NICK = "DupeFR"
+NFO_URL = "https://dupefr.fr/nfo/{release}.nfo"
+
+# Étiquette d'annonce (reconnue par extract_release_types) pour chaque type de bench_db
+ANNOUNCE_TAGS = {
+    "TV": "TV", "X264": "MOVIES", "FOREIGN": "MOVIES", "BLURAY": "MOVIES", "UHD": "MOVIES",
+    "MP3": "MP3", "FLAC": "MP3", "GAMES": "GAMES", "EBOOKS": "EBOOKS", "PRE": "PRE",
+}
+
+
+def announce_line(rng: random.Random, seq: int) -> tuple[str, str]:
+    """(release, annonce colorée comme celles des bots de pre); seq rend chaque nom unique."""
+    types, weights = bench_db._weighted(bench_db.TYPES)
+    rtype = rng.choices(types, weights)[0]
+    name = bench_db.scene_name(rng, rtype, datetime.now().year)
+    if name.startswith("["):
+        # Les noms PRE de bench_db portent déjà leurs étiquettes
+        name = nfo_cache.release_key(name)
+    name = name.replace("-", f".{seq}-", 1) if "-" in name else f"{name}.{seq}"
+    tag = ANNOUNCE_TAGS.get(rtype, "PRE")
+    return name, f"\x034[\x0314PRE\x034] \x0315[\x038{tag}\x0315] \x030{name}"
+
+
+class Client:
+    """Connexion d'un client; les écritures passent par send() (plusieurs threads)."""
+
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.nick = None
+        self.user = None
+        self.registered = False
+        self.channels = set()
+        self.connected_at = time.monotonic()
+        self.lines_in = 0
+        self.silent = False
+        self._wlock = threading.Lock()
+
+    @property
+    def prefix(self) -> str:
+        return f"{self.nick}!{self.user or self.nick}@127.0.0.1"
+
+    def send(self, line: str) -> bool:
+        if self.silent:
+            return False
+        data = (line + "\r\n").encode("utf-8", errors="replace")
+        try:
+            with self._wlock:
+                self.sock.sendall(data)
+            return True
+        except OSError:
+            return False
+
+    def numeric(self, code: str, text: str):
+        self.send(f":{SERVER_NAME} {code} {self.nick or '*'} {text}")
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class StandinServer:
+    """Serveur IRC de test: un thread d'écoute, un thread par client."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ssl_context: ssl.SSLContext | None = None,
+                 welcome_delay: float = 0.0, nfo_delay: float = 0.3, nfo_miss: float = 0.0, seed: int = 1,
+                 log=None):
+        self.ssl_context = ssl_context
+        self.welcome_delay = welcome_delay
+        self.nfo_delay = nfo_delay
+        self.nfo_miss = nfo_miss
+        self.rng = random.Random(seed)
+        self.log = log or (lambda text: None)
+        self.clients = []
+        self.seq = 0
+        # Horodatages (monotonic) des JOIN reçus: mesure des reconnexions
+        self.joins = []
+        self.nfo_requests = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closed = threading.Event()
+        self.listener = socket.create_server((host, port))
+        self.address = self.listener.getsockname()[:2]
+        threading.Thread(target=self._accept_loop, name="standin-accept", daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.address[1]
+
+    def close(self):
+        self._closed.set()
+        try:
+            self.listener.close()
+        except OSError:
+            pass
+        for client in self.live_clients():
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                client.close()
+
+    # --- Connexions ---
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                sock, address = self.listener.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve_client, args=(sock, address), daemon=True).start()
+
+    def _serve_client(self, sock, address):
+        if self.ssl_context is not None:
+            try:
+                sock.settimeout(10)
+                sock = self.ssl_context.wrap_socket(sock, server_side=True)
+                sock.settimeout(None)
+            except (OSError, ssl.SSLError) as e:
+                self.log(f"Échec TLS avec {address}: {e}")
+                sock.close()
+                return
+        client = Client(self, sock, address)
+        with self._changed:
+            self.clients.append(client)
+            self._changed.notify_all()
+        buf = b""
+        try:
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                if client.silent:
+                    # Connexion « à moitié ouverte »: plus rien n'est lu ni répondu
+                    continue
+                buf += data
+                while b"\n" in buf:
+                    raw, buf = buf.split(b"\n", 1)
+                    client.lines_in += 1
+                    self._handle(client, raw.rstrip(b"\r").decode("utf-8", errors="replace"))
+        except OSError:
+            pass
+        finally:
+            client.close()
+            with self._changed:
+                if client in self.clients:
+                    self.clients.remove(client)
+                self._changed.notify_all()
+
+    def _handle(self, client: Client, line: str):
+        if not line:
+            return
+        prefix_free = line.split(" ", 1)[1] if line.startswith(":") and " " in line else line
+        head, _, trailing = prefix_free.partition(" :")
+        parts = head.split()
+        command = parts[0].upper()
+        args = parts[1:] + ([trailing] if trailing or " :" in prefix_free else [])
+        if command == "NICK" and args:
+            client.nick = args[0]
+            self._maybe_welcome(client)
+        elif command == "USER" and args:
+            client.user = args[0]
+            self._maybe_welcome(client)
+        elif command == "PING":
+            client.send(f":{SERVER_NAME} PONG {SERVER_NAME} :{args[0] if args else ''}")
+        elif command == "JOIN" and args:
+            for chan in args[0].split(","):
+                client.channels.add(chan)
+                client.send(f":{client.prefix} JOIN :{chan}")
+                client.numeric("353", f"= {chan} :{client.nick} @{BOT_NICK}")
+                client.numeric("366", f"{chan} :End of /NAMES list.")
+            with self._changed:
+                self.joins.append(time.monotonic())
+                self._changed.notify_all()
+        elif command == "PART" and args:
+            for chan in args[0].split(","):
+                client.channels.discard(chan)
+                client.send(f":{client.prefix} PART {chan}")
+        elif command == "PRIVMSG" and len(args) >= 2:
+            self._on_privmsg(client, args[0], args[1])
+        elif command == "QUIT":
+            client.send(f"ERROR :Closing link ({args[0] if args else 'Quit'})")
+            client.close()
+        elif command in ("CAP", "MODE", "WHO", "USERHOST", "PONG"):
+            pass
+        else:
+            client.numeric("421", f"{command} :Unknown command")
+
+    def _maybe_welcome(self, client: Client):
+        if client.registered or not (client.nick and client.user):
+            return
+        client.registered = True
+        if self.welcome_delay:
+            time.sleep(self.welcome_delay)
+        client.numeric("001", f":Welcome to the standin IRC network {client.prefix}")
+        client.numeric("002", f":Your host is {SERVER_NAME}, running version standin-1.0")
+        client.numeric("003", ":This server was created for tests")
+        client.numeric("004", f"{SERVER_NAME} standin-1.0 io ov")
+        client.numeric("375", f":- {SERVER_NAME} Message of the day -")
+        client.numeric("376", ":End of /MOTD command.")
+
+    def _on_privmsg(self, client: Client, target: str, text: str):
+        if not text.startswith("!nfo "):
+            return
+        self.nfo_requests += 1
+        release = nfo_cache.release_key(text[len("!nfo "):])
+        if not release or self.rng.random() < self.nfo_miss:
+            return
+        line = f":{BOT_NICK}!bot@{SERVER_NAME} PRIVMSG {target} :`{NFO_URL.format(release=release)}`"
+        timer = threading.Timer(self.nfo_delay, client.send, args=(line,))
+        timer.daemon = True
+        timer.start()
+
+    # --- Pilotage ---
+
+    def live_clients(self) -> list:
+        with self._lock:
+            return list(self.clients)
+
+    def wait_for_joins(self, count: int = 1, since: float | None = None, timeout: float = 30.0) -> float | None:
+        """Attend `count` JOIN reçus après `since` (monotonic); renvoie l'heure du dernier, ou None."""
+        since = since or 0.0
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                recent = [t for t in self.joins if t > since]
+                if len(recent) >= count:
+                    return recent[count - 1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def announce(self, count: int, rate: float, channel: str | None = None, stop: threading.Event | None = None,
+                 on_sent=None) -> int:
+        """Envoie `count` annonces à `rate` par seconde aux clients présents sur le channel.
+
+        on_sent(release, time.time()) est appelé pour chaque annonce envoyée à au
+        moins un client. Renvoie le nombre de ces annonces.
+        """
+        interval = 1.0 / rate if rate > 0 else 0.0
+        start = time.perf_counter()
+        sent = 0
+        for i in range(count):
+            if stop is not None and stop.is_set():
+                break
+            # Cadence tenue sur l'ensemble, pas message par message
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.seq += 1
+            release, text = announce_line(self.rng, self.seq)
+            delivered = False
+            for client in self.live_clients():
+                for chan in ([channel] if channel else sorted(client.channels)[:1]):
+                    if chan in client.channels:
+                        delivered = client.send(f":{BOT_NICK}!bot@{SERVER_NAME} PRIVMSG {chan} :{text}") or delivered
+            if delivered and on_sent is not None:
+                on_sent(release, time.time())
+            sent += delivered
+        return sent
+
+    def drop(self, how: str = "close") -> int:
+        """Coupe les clients: close (FIN), reset (RST) ou silent (plus aucune réponse)."""
+        clients = self.live_clients()
+        for client in clients:
+            if how == "silent":
+                client.silent = True
+                continue
+            try:
+                if how == "reset":
+                    # Linger nul: la fermeture envoie un RST. SHUT_RD réveille le thread
+                    # du client (bloqué dans recv), qui ferme la socket lui-même
+                    client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    client.sock.shutdown(socket.SHUT_RD)
+                else:
+                    client.send("ERROR :Closing link (standin drop)")
+                    client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                client.close()
+        self.log(f"{len(clients)} client(s) coupé(s) ({how})")
+        return len(clients)
+
+    def kick(self, channel: str, reason: str = "standin kick") -> int:
+        n = 0
+        for client in self.live_clients():
+            if channel in client.channels:
+                client.channels.discard(channel)
+                client.send(f":ChanServ!service@{SERVER_NAME} KICK {channel} {client.nick} :{reason}")
+                n += 1
+        return n
+
+
+def self_signed_context(directory: str, host: str = "localhost"):
+    """Certificat auto-signé (openssl en ligne de commande) et contexte serveur.
+
+    Renvoie (contexte, chemin du certificat), le certificat servant d'autorité au client.
+    """
+    import subprocess
+    cert = os.path.join(directory, "standin-cert.pem")
+    key = os.path.join(directory, "standin-key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert, "-days", "2",
+         "-subj", f"/CN={host}", "-addext", f"subjectAltName=DNS:{host},IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context, cert
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur IRC local de test (annonces, !nfo, coupures)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    parser.add_argument("--rate", type=float, default=1.0, help="Annonces par seconde (0: aucune)")
+    parser.add_argument("--drop-every", type=float, default=0.0, help="Coupe les clients toutes les N secondes")
+    parser.add_argument("--drop-mode", choices=("close", "reset", "silent"), default="close")
+    parser.add_argument("--nfo-delay", type=float, default=0.3)
+    parser.add_argument("--tls", action="store_true", help="TLS (certificat auto-signé si --cert absent)")
+    parser.add_argument("--cert")
+    parser.add_argument("--key")
+    args = parser.parse_args()
+
+    context = None
+    if args.tls:
+        if args.cert:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(args.cert, args.key)
+        else:
+            context, cert = self_signed_context(os.getcwd())
+            print(f"Certificat auto-signé: {cert} (IRC_SSL_CAFILE={cert} pour irclog+.py)")
+    server = StandinServer(args.host, args.port, ssl_context=context, nfo_delay=args.nfo_delay,
+                           log=lambda text: print(f"[{time.strftime('%H:%M:%S')}] {text}"))
+    print(f"Serveur IRC de test sur {server.address[0]}:{server.port} (TLS={context is not None}); Ctrl+C pour arrêter")
+    last_drop = time.monotonic()
+    try:
+        while True:
+            if args.rate > 0:
+                server.announce(max(1, int(args.rate)), args.rate)
+            else:
+                time.sleep(1.0)
+            if args.drop_every and time.monotonic() - last_drop >= args.drop_every:
+                server.drop(args.drop_mode)
+                last_drop = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,14 @@
 import tkinter as tk
 from tkinter import ttk
 import os
+import sys
+import argparse
 import importlib.util
 
 from irc_db_gui import ReleasesGUI
 from web_server import start_web_server_in_thread
+from irc_ipc import IrcControlServer, SupervisedProcess
+import profiling
 
 
 def load_irclog_plus_class():
@@ -17,6 +21,16 @@ def load_irclog_plus_class():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Suite IRC: logger, base releases et serveur Web")
+    parser.add_argument("--web-process", action="store_true",
+                        default=os.environ.get("SUITE_WEB_PROCESS") == "1",
+                        help="Serveur Web dans un processus séparé (relancé s'il s'arrête)")
+    parser.add_argument("--web-host", default=os.environ.get("WEB_HOST", "0.0.0.0"))
+    parser.add_argument("--web-port", type=int, default=int(os.environ.get("WEB_PORT", "8000")))
+    args = parser.parse_args()
+    # Profilage à la demande: kill -USR1 (CPU) / -USR2 (mémoire), voir profiling.py
+    profiling.install_signal_handlers("suite")
+
     root = tk.Tk()
     root.title("Suite IRC")
     root.geometry("1200x800")
@@ -34,16 +48,34 @@ def main():
     # Onglet Base releases
     tab_db = ttk.Frame(nb)
     nb.add(tab_db, text="Base releases")
-    db_app = ReleasesGUI(root, container=tab_db)
+    # Mode live de l'onglet base: réveillé par le bus d'événements du logger
+    db_app = ReleasesGUI(root, container=tab_db, bus=logger_app.bus)
 
-    # Démarrer le serveur web en tâche de fond
-    try:
-        # Injecte l’instance IRC dans le serveur web pour exposer statut/connexion
-        start_web_server_in_thread(host="0.0.0.0", port=8000, irc_logger=logger_app)
-    except Exception:
-        pass
+    ipc = web = None
+    if args.web_process:
+        # Processus séparé: les requêtes Web lourdes ne ralentissent plus le logger.
+        # Le serveur pilote le logger via un canal IPC local et lit la base en WAL.
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        ipc = IrcControlServer(logger_app)
+        env = dict(os.environ, WEB_HOST=args.web_host, WEB_PORT=str(args.web_port), **ipc.env())
+        web = SupervisedProcess([sys.executable, os.path.join(base_dir, "web_server.py")], env=env, cwd=base_dir,
+                                on_event=lambda text: logger_app.log_irc_event(text, event_type="INFO"))
+        web.start()
+    else:
+        # Démarrer le serveur web en tâche de fond
+        try:
+            # Injecte l’instance IRC dans le serveur web pour exposer statut/connexion
+            start_web_server_in_thread(host=args.web_host, port=args.web_port, irc_logger=logger_app)
+        except Exception:
+            pass
 
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        if web is not None:
+            web.stop()
+        if ipc is not None:
+            ipc.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+# Surveillance de la connexion IRC du logger, dans un thread à part:
+# - silence: un PING part toutes les PING_INTERVAL secondes; sans PONG (ni
+#   aucun autre message) sous PONG_TIMEOUT, la connexion est tenue pour morte
+#   (TCP à moitié ouvert: rien ne remonterait sinon avant des heures);
+# - blocage: la boucle du réacteur (irc_loop) signale chaque tour; un gestionnaire
+#   bloqué plus de STALL_TIMEOUT (COMMIT SQLite lent, verrou…) est détecté;
+# - dans les deux cas la socket est coupée et irc_loop se reconnecte.
+# L'état (dernier message, aller-retour PING/PONG, retard du réacteur) est servi
+# par /api/irc/status et /metrics.
+import os
+import time
+import socket
+import threading
+
+import metrics
+
+PING_INTERVAL = float(os.environ.get("IRC_PING_INTERVAL", "60"))
+PONG_TIMEOUT = float(os.environ.get("IRC_PONG_TIMEOUT", "30"))
+# Retard du réacteur: signalé au-delà de STALL_WARN, reconnexion au-delà de STALL_TIMEOUT
+STALL_WARN = float(os.environ.get("IRC_STALL_WARN", "5"))
+STALL_TIMEOUT = float(os.environ.get("IRC_STALL_TIMEOUT", "60"))
+CHECK_INTERVAL = 1.0
+# Délai maximal d'un tour de process_once (borne aussi la détection d'un arrêt)
+REACTOR_TIMEOUT = 0.2
+
+PING_RTT = metrics.histogram("irc_ping_rtt_seconds", "Aller-retour PING/PONG avec le serveur IRC",
+                             buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+TRIPS = metrics.counter("irc_watchdog_trips_total", "Connexions coupées par le watchdog", ("reason",))
+
+_PING_PREFIX = "wd-"
+
+
+class IrcWatchdog:
+    """Liveness d'une connexion irc.client: attach() à la connexion, beat() à chaque tour
+    de boucle, on_event() pour chaque événement reçu (gestionnaire all_events)."""
+
+    def __init__(self, on_trip=None, ping_interval: float = PING_INTERVAL, pong_timeout: float = PONG_TIMEOUT,
+                 stall_timeout: float = STALL_TIMEOUT, clock=time.monotonic):
+        # on_trip(reason, detail): appelé (thread du watchdog) quand la connexion est coupée
+        self.on_trip = on_trip
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.stall_timeout = stall_timeout
+        self.clock = clock
+        self.tripped = None
+        self._lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._reset(None)
+
+    def _reset(self, connection):
+        now = self.clock()
+        self._conn = connection
+        self._since = now
+        self._beat = now
+        self._last_rx = now
+        self._ping_sent = None
+        self._last_ping = now
+        self._rtt = None
+        self.tripped = None
+
+    # --- Appelé par la boucle IRC ---
+
+    def attach(self, connection):
+        with self._lock:
+            self._reset(connection)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="irc-watchdog", daemon=True)
+                self._thread.start()
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+            self._ping_sent = None
+
+    def beat(self):
+        self._beat = self.clock()
+
+    def on_event(self, event):
+        now = self.clock()
+        self._last_rx = now
+        if event.type == "pong" and self._ping_sent is not None:
+            with self._lock:
+                if self._ping_sent is not None:
+                    self._rtt = now - self._ping_sent
+                    PING_RTT.observe(self._rtt)
+                self._ping_sent = None
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Surveillance ---
+
+    def _run(self):
+        while not self._stop.wait(CHECK_INTERVAL):
+            try:
+                self.check()
+            except Exception:
+                pass
+
+    def check(self, now: float | None = None) -> str | None:
+        """Un contrôle; renvoie la raison si la connexion vient d'être coupée."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            conn = self._conn
+            if conn is None or self.tripped:
+                return None
+            lag = now - self._beat
+            if lag > self.stall_timeout:
+                reason, detail = "stall", f"réacteur bloqué depuis {lag:.0f}s"
+            elif self._ping_sent is not None and now - self._ping_sent > self.pong_timeout:
+                if self._last_rx > self._ping_sent:
+                    # Du trafic est arrivé depuis le PING: connexion vivante, PONG perdu
+                    self._ping_sent = None
+                    return None
+                # Réacteur en retard: le PONG est peut-être arrivé sans être lu, on attend
+                if lag > CHECK_INTERVAL + REACTOR_TIMEOUT:
+                    return None
+                reason, detail = "ping_timeout", f"pas de PONG depuis {now - self._ping_sent:.0f}s"
+            else:
+                if self._ping_sent is None and now - self._last_ping >= self.ping_interval:
+                    self._send_ping(conn, now)
+                return None
+            self.tripped = reason
+        TRIPS.labels(reason).inc()
+        if self.on_trip is not None:
+            self.on_trip(reason, detail)
+        _shutdown_socket(conn)
+        return reason
+
+    def _send_ping(self, conn, now):
+        try:
+            conn.ping(f"{_PING_PREFIX}{int(now * 1000)}")
+        except Exception:
+            # Envoi impossible: la connexion est déjà tombée, la boucle IRC le verra
+            return
+        self._ping_sent = now
+        self._last_ping = now
+
+    def status(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            if self._conn is None:
+                return {"state": "disconnected", "alive": False}
+            lag = now - self._beat
+            # PING sans réponse ni autre trafic depuis
+            silent = self._ping_sent is not None and self._last_rx < self._ping_sent
+            waiting = now - self._ping_sent if self._ping_sent is not None else None
+            if self.tripped:
+                state = "reconnecting"
+            elif lag > STALL_WARN:
+                state = "stalled"
+            elif silent and waiting > self.pong_timeout / 2:
+                state = "unresponsive"
+            else:
+                state = "ok"
+            return {
+                "state": state,
+                "alive": state == "ok",
+                "connected_for": round(now - self._since, 1),
+                "last_message_age": round(now - self._last_rx, 3),
+                "reactor_lag": round(lag, 3),
+                "ping_rtt_ms": None if self._rtt is None else round(self._rtt * 1000, 1),
+                "pong_wait": None if waiting is None else round(waiting, 1),
+            }
+
+
+def _shutdown_socket(conn):
+    # Sans passer par le réacteur (son verrou est tenu si un gestionnaire bloque):
+    # la lecture suivante renvoie EOF et irc.client déclenche "disconnect"
+    sock = getattr(conn, "socket", None)
+    if sock is None:
+        return
+    try:
+        # socket.socket.shutdown même en TLS: SSLSocket.shutdown « déballe » la socket
+        # et la lecture suivante lève ValueError au lieu de renvoyer EOF
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
@@ -10,10 +10,35 @@ import json
 import os
 import time
 
+import event_bus
+import ingest_trace
+import irc_reconnect
+import irc_watchdog
+import metrics
+import profiling
+
 CONFIG_FILE = "irc_config.json"
 LOG_FILE = "irc_log.txt"
-RECONNECT_DELAY = 10  # secondes avant tentative de reconnexion
-DEFAULT_MAX_RECONNECT_ATTEMPTS = 5  # nb d'échecs consécutifs avant abandon
+# Délais de reconnexion: voir irc_reconnect.py (backoff exponentiel)
+DEFAULT_MAX_RECONNECT_ATTEMPTS = 5  # nb d'échecs consécutifs avant abandon (0 = jamais)
+# Autorité de certification supplémentaire pour TLS (certificat auto-signé, irc_standin.py)
+SSL_CAFILE = os.environ.get("IRC_SSL_CAFILE") or None
+
+# ---------------- Métriques ----------------
+IRC_EVENTS = metrics.counter("irc_events_total", "Événements IRC reçus, par type", ("type",))
+IRC_MESSAGES = metrics.counter("irc_messages_total", "Messages de channel reçus, par résultat du filtrage", ("result",))
+RELEASES_INSERTED = metrics.counter("irc_releases_inserted_total", "Releases enregistrées en base", ("type",))
+INSERT_SECONDS = metrics.histogram("irc_release_insert_seconds", "Durée de l'INSERT d'une release")
+COMMIT_SECONDS = metrics.histogram("irc_release_commit_seconds", "Durée du COMMIT d'une release")
+CONNECT_ATTEMPTS = metrics.counter("irc_connect_attempts_total", "Tentatives de connexion au serveur IRC")
+RECONNECTS = metrics.counter("irc_reconnects_total", "Reconnexions programmées par irc_loop", ("reason",))
+LOG_BYTES = metrics.counter("irc_log_bytes_written_total", "Octets écrits dans le journal texte", ("file",))
+_MSG_ACCEPTED = IRC_MESSAGES.labels("accepted")
+_MSG_REJECTED = IRC_MESSAGES.labels("rejected")
+_MSG_NO_TYPE = IRC_MESSAGES.labels("no_type")
+_LOG_FILE_BYTES = LOG_BYTES.labels(LOG_FILE)
+_RECONNECT_LOST = RECONNECTS.labels("lost")
+_RECONNECT_ERROR = RECONNECTS.labels("error")
 
 # ---------------- Utils ----------------
 
@@ -52,20 +77,47 @@ class IRCLoggerGUI:
         self.max_reconnect_attempts_var = tk.IntVar(value=DEFAULT_MAX_RECONNECT_ATTEMPTS)
 
         self.type_tabs = {}
+        # Releases, lignes IRC et statut sont publiés sur le bus du processus
+        self.bus = event_bus.BUS
+        metrics.gauge("irc_connected", "1 si le logger est connecté", function=lambda: int(self.connected))
         self.create_widgets()
 
         self.db_lock = threading.Lock()
+        # Latence réception -> commit d'une partie des releases (INGEST_SAMPLE)
+        self.latency_sampler = ingest_trace.LatencySampler()
         self.conn = sqlite3.connect("irc_logs.db", check_same_thread=False)
         self.create_tables()
 
         self.client = None
         self.reactor = irc.client.Reactor()
+        # Silence du serveur (PING/PONG) et gestionnaires bloqués: coupe la connexion
+        self.watchdog = irc_watchdog.IrcWatchdog(on_trip=self._on_watchdog_trip)
+        metrics.gauge("irc_last_message_age_seconds", "Secondes depuis le dernier message du serveur IRC",
+                      function=lambda: self.watchdog.status().get("last_message_age", float("nan")))
+        metrics.gauge("irc_reactor_lag_seconds", "Secondes depuis le dernier tour de la boucle IRC",
+                      function=lambda: self.watchdog.status().get("reactor_lag", float("nan")))
+        # Délais entre tentatives et rejoin après PART/KICK
+        self.reconnect = irc_reconnect.ReconnectScheduler()
+        self.rejoins = irc_reconnect.RejoinScheduler(on_join=self._on_rejoin_scheduled)
         self.connected = False
         self.failed_reconnects = 0
 
         self.load_config()
         self.reconnect_flag = True
 
+    @property
+    def connected(self):
+        return self._connected
+
+    @connected.setter
+    def connected(self, value):
+        # Chaque changement d'état de connexion est publié (status-changed)
+        value = bool(value)
+        changed = value != getattr(self, "_connected", None)
+        self._connected = value
+        if changed:
+            self.bus.publish(event_bus.STATUS_CHANGED, connected=value)
+
     # ---------------- UI ----------------
     def create_widgets(self):
         # Monte toute l'interface dans le conteneur fourni
@@ -86,7 +138,7 @@ class IRCLoggerGUI:
         ttk.Label(config_frame, text="Channels (, séparés):").grid(row=2, column=0, sticky="w")
         ttk.Entry(config_frame, textvariable=self.channels_var, width=30).grid(row=2, column=1, columnspan=3, sticky="we")
         # Nouveau: option max tentatives
-        ttk.Label(config_frame, text="Max tentatives reconnexion:").grid(row=3, column=0, sticky="w")
+        ttk.Label(config_frame, text="Max tentatives reconnexion (0 = illimité):").grid(row=3, column=0, sticky="w")
         ttk.Entry(config_frame, textvariable=self.max_reconnect_attempts_var, width=6).grid(row=3, column=1)
         ttk.Button(config_frame, text="Se connecter", command=self.start_connection).grid(row=6, column=0, pady=5)
         ttk.Button(config_frame, text="Sauvegarder config", command=self.save_config).grid(row=6, column=1)
@@ -102,6 +154,11 @@ class IRCLoggerGUI:
     def create_tables(self):
         with self.db_lock:
             cursor = self.conn.cursor()
+            # WAL: le serveur Web (éventuellement dans un autre processus) lit sans bloquer les insertions
+            try:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS releases (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -118,21 +175,36 @@ class IRCLoggerGUI:
             self.conn.commit()
 
     # ---------------- Logging releases ----------------
-    def log_release(self, nick, message, channel):
+    def log_release(self, nick, message, channel, recv_ts=None, filter_s=None):
         types, text_clean = extract_release_types(message)
         if not types:
+            _MSG_NO_TYPE.inc()
             return
+        _MSG_ACCEPTED.inc()
         type_to_log = types[-1]
-        ts = int(time.time())
+        recv_ts = recv_ts or time.time()
+        ts = int(recv_ts)
         ts_iso = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
 
         with self.db_lock:
             cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO releases (ts, ts_iso, server, channel, nick, message, type) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (ts, ts_iso, self.server_var.get(), channel, nick, text_clean, type_to_log)
-            )
-            self.conn.commit()
+            with INSERT_SECONDS.time():
+                cursor.execute(
+                    "INSERT INTO releases (ts, ts_iso, server, channel, nick, message, type) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (ts, ts_iso, self.server_var.get(), channel, nick, text_clean, type_to_log)
+                )
+            row_id = cursor.lastrowid
+            # Latences échantillonnées des releases précédentes, dans la même transaction
+            self.latency_sampler.flush(cursor)
+            with COMMIT_SECONDS.time():
+                self.conn.commit()
+        commit_s = ingest_trace.observe("committed", recv_ts)
+        if self.latency_sampler.enabled:
+            self.latency_sampler.add(row_id, recv_ts, filter_s, commit_s)
+        RELEASES_INSERTED.labels(type_to_log).inc()
+
+        self.bus.publish(event_bus.RELEASE_LOGGED, row_id=row_id, server=self.server_var.get(), channel=channel,
+                         nick=nick, message=text_clean, type=type_to_log, ts=ts, recv_ts=recv_ts)
 
         if type_to_log not in self.type_tabs:
             frame = ttk.Frame(self.notebook)
@@ -146,8 +218,10 @@ class IRCLoggerGUI:
         self.type_tabs[type_to_log].see(tk.END)
         self.type_tabs[type_to_log].config(state="disabled")
 
+        entry = f"[{ts_iso}] <{nick}@{channel}> [{type_to_log}] {text_clean}\n"
         with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"[{ts_iso}] <{nick}@{channel}> [{type_to_log}] {text_clean}\n")
+            f.write(entry)
+        _LOG_FILE_BYTES.inc(len(entry.encode("utf-8")))
 
     def apply_filters(self, nick, message):
         try:
@@ -193,6 +267,7 @@ class IRCLoggerGUI:
         # Réactiver la boucle de reconnexion si elle a été stoppée
         self.reconnect_flag = True
         self.failed_reconnects = 0
+        self.reconnect.reset()
         # Lancer la boucle IRC en tâche de fond
         threading.Thread(target=self.irc_loop, daemon=True).start()
 
@@ -201,6 +276,9 @@ class IRCLoggerGUI:
         try:
             self.reconnect_flag = False
             self.failed_reconnects = 0
+            # Interrompt une attente de reconnexion en cours
+            self.reconnect.wake()
+            self.rejoins.cancel_all()
             if self.client is not None:
                 # Tenter un QUIT gracieux, sinon une déconnexion directe
                 quit_fn = getattr(self.client, "quit", None)
@@ -239,6 +317,12 @@ class IRCLoggerGUI:
             self.log_irc_event(f"Erreur envoi commande '{text}' sur {channel}: {e}", event_type="INFO")
             return False
 
+    def _max_reconnect_attempts(self) -> int:
+        try:
+            return int(self.max_reconnect_attempts_var.get())
+        except (tk.TclError, ValueError):
+            return DEFAULT_MAX_RECONNECT_ATTEMPTS
+
     def irc_loop(self):
         while self.reconnect_flag:
             server = self.server_var.get()
@@ -247,9 +331,10 @@ class IRCLoggerGUI:
             nick = self.nick_var.get()
             realname = self.realname_var.get()
             try:
+                CONNECT_ATTEMPTS.inc()
                 self.log_irc_event(f"Tentative de connexion à {server}:{port} (SSL={use_ssl})...", event_type="INFO")
                 if use_ssl:
-                    context = ssl.create_default_context()
+                    context = ssl.create_default_context(cafile=SSL_CAFILE)
                     def ssl_wrapper(sock):
                         return context.wrap_socket(sock, server_hostname=server)
                     ssl_factory = irc.connection.Factory(wrapper=ssl_wrapper)
@@ -267,49 +352,84 @@ class IRCLoggerGUI:
                 self.client = c
                 self.connected = True
                 self.failed_reconnects = 0  # reset après succès
-                # Boucle d'événements; retourne quand la connexion est fermée
-                self.reactor.process_forever()
+                self.reconnect.connected()
+                # Boucle d'événements jusqu'à la fermeture de la connexion (process_forever
+                # ne rend jamais la main); chaque tour est signalé au watchdog
+                self.watchdog.attach(c)
+                while self.reconnect_flag and c.is_connected() and not self.watchdog.tripped:
+                    self.watchdog.beat()
+                    self.reactor.process_once(irc_watchdog.REACTOR_TIMEOUT)
+                self.watchdog.detach()
+                self.rejoins.cancel_all()
+                if c.is_connected():
+                    # Coupée par le watchdog: fermeture dans le thread du réacteur
+                    c.disconnect("Watchdog")
+                if not self.reconnect_flag:
+                    # Arrêt demandé (stop_connection)
+                    break
                 # Ici, la connexion est terminée (déconnexion serveur)
                 self.connected = False
-                self.log_irc_event(f"Connexion IRC perdue. Tentative de reconnexion dans {RECONNECT_DELAY}s...", event_type="INFO")
-                time.sleep(RECONNECT_DELAY)
+                _RECONNECT_LOST.inc()
+                delay = self.reconnect.lost()
+                self.log_irc_event(f"Connexion IRC perdue. Tentative de reconnexion dans {delay:.1f}s...", event_type="INFO")
             except Exception as e:
                 # Échec d'établissement de connexion
                 self.failed_reconnects += 1
-                max_attempts = int(self.max_reconnect_attempts_var.get() or DEFAULT_MAX_RECONNECT_ATTEMPTS)
-                if self.failed_reconnects >= max_attempts:
+                self.connected = False
+                max_attempts = self._max_reconnect_attempts()
+                delay = self.reconnect.failed(max_attempts)
+                if delay is None:
                     self.log_irc_event(
                         f"Abandon après {max_attempts} tentatives infructueuses. Connexion stoppée.",
                         event_type="INFO"
                     )
-                    self.connected = False
                     self.client = None
                     self.reconnect_flag = False
                     break
-                else:
-                    self.log_irc_event(
-                        f"Erreur de connexion: {e}. Reconnexion dans {RECONNECT_DELAY}s (tentative {self.failed_reconnects}/{max_attempts})...",
-                        event_type="INFO"
-                    )
-                    self.connected = False
-                    time.sleep(RECONNECT_DELAY)
+                _RECONNECT_ERROR.inc()
+                limit = f"/{max_attempts}" if max_attempts > 0 and not self.reconnect.daemon else ""
+                self.log_irc_event(
+                    f"Erreur de connexion: {e}. Reconnexion dans {delay:.1f}s (tentative {self.failed_reconnects}{limit})...",
+                    event_type="INFO"
+                )
+            # Attente interrompue par stop_connection
+            if not self.reconnect.wait(delay):
+                break
+
+    def _on_rejoin_scheduled(self, chan, delay, reason):
+        what = "KICK reçu sur" if reason == "kick" else "Nous avons quitté"
+        self.log_irc_event(f"{what} {chan}. Rejoin dans {delay:.0f}s...", event_type="INFO")
 
     # ---------------- Handlers ----------------
     def on_connect(self, connection, event):
         self.log_irc_event(f"Connecté au serveur {self.server_var.get()}:{self.port_var.get()}", event_type="INFO")
-        for chan in [c.strip() for c in self.channels_var.get().split(",") if c.strip()]:
-            connection.join(chan)
+        # Un seul JOIN #a,#b,… plutôt qu'une ligne par channel
+        channels = [c.strip() for c in self.channels_var.get().split(",") if c.strip()]
+        irc_reconnect.join_channels(connection, channels)
+        if not channels:
+            self.reconnect.joined()
 
     def on_pubmsg(self, connection, event):
         nick = event.source.nick
         message = event.arguments[0]
         chan = event.target
+        # Réception: point de départ de la latence d'ingestion (voir ingest_trace.py)
+        recv_ts = time.time()
         self.log_irc_event(message, nick=nick, event_type="MSG", channel=chan)
-        if self.apply_filters(nick, re.sub(r'\x03(\d{1,2}(,\d{1,2})?)?','', message)):
-            self.log_release(nick, message, chan)
+        accepted = self.apply_filters(nick, re.sub(r'\x03(\d{1,2}(,\d{1,2})?)?','', message))
+        filter_s = ingest_trace.observe("filtered", recv_ts)
+        if accepted:
+            self.log_release(nick, message, chan, recv_ts=recv_ts, filter_s=filter_s)
+        else:
+            _MSG_REJECTED.inc()
 
     def on_join(self, connection, event):
         self.log_irc_event("", nick=event.source.nick, event_type="JOIN", channel=event.target)
+        if event.source.nick == connection.get_nickname():
+            # Premier channel rejoint: fin de la reconnexion (durée mesurée)
+            duration = self.reconnect.joined()
+            if duration is not None:
+                self.log_irc_event(f"Reconnecté en {duration:.1f}s", event_type="INFO")
 
     def on_part(self, connection, event):
         self.log_irc_event("", nick=event.source.nick, event_type="PART", channel=event.target)
@@ -317,9 +437,7 @@ class IRCLoggerGUI:
         try:
             my_nick = self.nick_var.get().strip()
             if event.source and getattr(event.source, 'nick', None) == my_nick:
-                chan = event.target
-                self.log_irc_event(f"Nous avons quitté {chan}. Rejoin dans 5s...", event_type="INFO")
-                threading.Timer(5.0, lambda: connection.join(chan)).start()
+                self.rejoins.schedule(connection, event.target, "part")
         except Exception:
             pass
 
@@ -331,8 +449,7 @@ class IRCLoggerGUI:
         chan = event.target
         my_nick = self.nick_var.get().strip()
         if target == my_nick:
-            self.log_irc_event(f"KICK reçu sur {chan}. Rejoin dans 5s...", event_type="INFO")
-            threading.Timer(5.0, lambda: connection.join(chan)).start()
+            self.rejoins.schedule(connection, chan, "kick")
         else:
             self.log_irc_event("", nick=getattr(event.source, 'nick', ''), event_type="KICK", channel=chan)
 
@@ -342,7 +459,10 @@ class IRCLoggerGUI:
         self.log_irc_event("Déconnecté du serveur IRC", event_type="INFO")
 
     def on_event(self, connection, event):
+        # Tout message du serveur prouve que la connexion vit (voir irc_watchdog)
+        self.watchdog.on_event(event)
         # Logging générique pour debug
+        IRC_EVENTS.labels(event.type).inc()
         try:
             ev_src = getattr(event.source, 'nick', str(event.source))
         except Exception:
@@ -366,12 +486,14 @@ class IRCLoggerGUI:
         self.logs_text.insert(tk.END, line + "\n")
         self.logs_text.see(tk.END)
         self.logs_text.config(state="disabled")
-        # Fichier texte pour consultation via web_server
+        # Fichier texte (historique) et bus (consommateurs en direct: NFO, Web)
         try:
             with open(LOG_FILE, "a", encoding="utf-8") as f:
                 f.write(line + "\n")
+            _LOG_FILE_BYTES.inc(len(line.encode("utf-8")) + 1)
         except Exception:
             pass
+        self.bus.publish(event_bus.IRC_LINE, line=line, kind=event_type, nick=nick, channel=channel)
 
     # ---------------- Test message ----------------
     def test_message(self):
@@ -391,6 +513,7 @@ class IRCLoggerGUI:
 
 
 if __name__ == "__main__":
+    profiling.install_signal_handlers("logger")
     root = tk.Tk()
     app = IRCLoggerGUI(root)
     root.mainloop()
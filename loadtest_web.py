@@ -0,0 +1,394 @@
+# Test de charge HTTP du serveur Web (web_server.py) sur une base synthétique:
+#   python loadtest_web.py [--db bench_100k.db] [--users 1,5,10,25,50] [--duration 20] [--out rapport.json]
+# Le serveur est lancé dans un processus à part (le générateur ne lui prend pas
+# le GIL), avec un logger IRC factice qui répond aux !nfo. Chaque utilisateur
+# virtuel garde sa connexion (keep-alive), revalide par ETag comme un navigateur
+# et rejoue un mélange d'actions de la Web UI: ouverture de la page, changement
+# de filtre ou de tri, pages suivantes et lointaines, export CSV, sondage du
+# statut IRC, logs, bouton NFO. Pour chaque palier d'utilisateurs: débit et
+# percentiles de latence par endpoint.
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlparse
+
+import bench_db
+import event_bus
+import nfo_cache
+from releases_db import ReleasesDB
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Actions de la Web UI et poids dans le mélange (un utilisateur en choisit une par tour)
+ACTIONS = [
+    ("page_load", 8),
+    ("filter_change", 22),
+    ("sort_change", 10),
+    ("next_page", 14),
+    ("deep_page", 5),
+    ("status_poll", 27),
+    ("irc_logs", 4),
+    ("nfo", 7),
+    ("export_csv", 3),
+]
+PAGE_LIMITS = ((1000, 6), (500, 2), (100, 2))
+SORTS = ("", "ts:DESC", "ts:ASC", "channel:ASC", "nick:ASC", "type:ASC,ts:DESC", "message:ASC")
+PERCENTILES = (50, 90, 95, 99)
+
+
+class StubIrcLogger:
+    """Logger IRC factice pour le serveur: toujours connecté, répond aux !nfo par un lien."""
+
+    def __init__(self, reply_delay: float = 0.3, miss_ratio: float = 0.0, seed: int = 1):
+        self.bus = event_bus.BUS
+        self.reply_delay = reply_delay
+        self.miss_ratio = miss_ratio
+        self._rng = random.Random(seed)
+        self.connected = True
+        # Tient lieu de tk.StringVar (nick_var.get())
+        self.nick_var = self
+
+    def get(self) -> str:
+        return "loadtest"
+
+    def start_connection(self):
+        self.connected = True
+
+    def stop_connection(self):
+        self.connected = False
+
+    def send_privmsg(self, channel, text) -> bool:
+        release = nfo_cache.release_key(text[len("!nfo "):]) if text.startswith("!nfo ") else ""
+        if release and self._rng.random() >= self.miss_ratio:
+            line = f"[{datetime.now():%Y-%m-%d %H:%M:%S}] <DupeFR@{channel}> `https://dupefr.fr/nfo/{release}.nfo`"
+            timer = threading.Timer(self.reply_delay, self.bus.publish,
+                                    args=(event_bus.IRC_LINE,),
+                                    kwargs={"line": line, "kind": "PRIVMSG", "nick": "DupeFR", "channel": channel})
+            timer.daemon = True
+            timer.start()
+        return True
+
+
+def serve(db_path: str, host: str, port: int, reply_delay: float, miss_ratio: float):
+    # Processus serveur (lancé par run_server): importe web_server seulement ici
+    import web_server
+    logger = StubIrcLogger(reply_delay=reply_delay, miss_ratio=miss_ratio)
+    web_server.start_web_server(host=host, port=port, irc_logger=logger, db_path=db_path)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_server(db_path: str, reply_delay: float, miss_ratio: float, timeout: float = 30.0):
+    """Démarre le serveur dans un processus enfant; renvoie (processus, url)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--db", db_path, "--port", str(port),
+         "--nfo-delay", str(reply_delay), "--nfo-miss", str(miss_ratio)],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (code {proc.returncode})")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/irc/status")
+            conn.getresponse().read()
+            conn.close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("Le serveur ne répond pas")
+
+
+class Workload:
+    """Valeurs de filtres et releases tirées de la base, pour des requêtes plausibles."""
+
+    def __init__(self, db_path: str, sample: int = 2000):
+        db = ReleasesDB(db_path)
+        self.distinct = {col: db.distinct_values(col) for col in ("server", "channel", "nick", "type")}
+        self.filters = [f for name, f in bench_db.filter_sets(db).items() if name != "none"]
+        with db.lock:
+            lo, hi = db.conn.execute("SELECT MIN(ts_iso), MAX(ts_iso) FROM releases").fetchone()
+        self.last_day = datetime.strptime((hi or "2000-01-01")[:10], "%Y-%m-%d")
+        self.first_day = datetime.strptime((lo or "2000-01-01")[:10], "%Y-%m-%d")
+        # Releases pour le bouton NFO: ids au hasard (pas de ORDER BY RANDOM() sur 10M lignes)
+        rng = random.Random(0)
+        max_id = db.max_id()
+        ids = sorted({rng.randint(1, max_id) for _ in range(sample)}) if max_id else []
+        self.releases = [(r["channel"], r["message"]) for r in db.get_many(ids) if r["channel"] and r["message"]]
+        db.conn.close()
+
+    def random_filters(self, rng: random.Random) -> dict:
+        kind = rng.random()
+        if kind < 0.35:
+            col = rng.choice(("type", "type", "channel", "nick", "server"))
+            values = self.distinct[col]
+            return {col: rng.choice(values)} if values else {}
+        if kind < 0.6:
+            # Texte tapé: un morceau de nom de release
+            if self.releases:
+                words = self.releases[rng.randrange(len(self.releases))][1].replace("-", ".").split(".")
+                return {"query": rng.choice(words)[:rng.randint(3, 8)]}
+            return {}
+        if kind < 0.8:
+            days = rng.choice((1, 7, 30, 365))
+            end = self.last_day - timedelta(days=rng.randint(0, max((self.last_day - self.first_day).days - days, 0)))
+            return {"date_from": (end - timedelta(days=days)).strftime("%Y-%m-%d"), "date_to": end.strftime("%Y-%m-%d")}
+        return dict(rng.choice(self.filters)) if self.filters else {}
+
+
+def _weighted_choice(rng: random.Random, pairs):
+    return rng.choices([v for v, _ in pairs], [w for _, w in pairs])[0]
+
+
+class VirtualUser(threading.Thread):
+    """Un onglet de navigateur: une connexion persistante, un état (filtres, tri, page)."""
+
+    def __init__(self, base_url: str, workload: Workload, think: float, stop: threading.Event, seed: int):
+        super().__init__(daemon=True)
+        u = urlparse(base_url)
+        self.host, self.port = u.hostname, u.port or 80
+        self.workload = workload
+        self.think = think
+        self.stop = stop
+        self.rng = random.Random(seed)
+        self.samples = []  # (endpoint, secondes, statut, octets)
+        self.conn = None
+        self.etags = {}
+        self.filters = {}
+        self.sort = ""
+        self.page = 1
+        self.limit = 1000
+
+    def _get(self, endpoint: str, path: str):
+        headers = {"Accept-Encoding": "gzip"}
+        etag = self.etags.get(path)
+        if etag:
+            headers["If-None-Match"] = etag
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            t0 = time.perf_counter()
+            try:
+                self.conn.request("GET", path, headers=headers)
+                resp = self.conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException):
+                # Connexion persistante fermée par le serveur: une nouvelle, une seule fois
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    self.samples.append((endpoint, time.perf_counter() - t0, 0, 0))
+                    return
+                continue
+            elapsed = time.perf_counter() - t0
+            if resp.getheader("ETag"):
+                self.etags[path] = resp.getheader("ETag")
+            if resp.will_close:
+                self.conn.close()
+                self.conn = None
+            self.samples.append((endpoint, elapsed, resp.status, len(body)))
+            return
+
+    def _page_path(self, page: int) -> str:
+        params = dict(self.filters, page=page, limit=self.limit, sort=self.sort, format="columns", total="estimate")
+        return "/api/page?" + urlencode(params)
+
+    def act(self, action: str):
+        rng = self.rng
+        if action == "page_load":
+            self.filters, self.sort, self.page = {}, "", 1
+            self.limit = _weighted_choice(rng, PAGE_LIMITS)
+            self._get("index", "/")
+            self._get("filters", "/api/filters")
+            self._get("page", self._page_path(1))
+            self._get("status", "/api/irc/status")
+        elif action == "filter_change":
+            self.filters, self.page = self.workload.random_filters(rng), 1
+            self._get("page", self._page_path(1))
+        elif action == "sort_change":
+            self.sort, self.page = rng.choice(SORTS), 1
+            self._get("page", self._page_path(1))
+        elif action == "next_page":
+            self.page += 1
+            self._get("page_next", self._page_path(self.page))
+        elif action == "deep_page":
+            self.page = rng.randint(20, 200)
+            self._get("page_deep", self._page_path(self.page))
+        elif action == "status_poll":
+            self._get("status", "/api/irc/status")
+        elif action == "irc_logs":
+            self._get("irc_logs", "/api/irc/logs?tail=200")
+        elif action == "nfo" and self.workload.releases:
+            channel, release = rng.choice(self.workload.releases)
+            self._get("nfo", "/api/irc/nfo?" + urlencode({"channel": channel, "release": release}))
+        elif action == "export_csv":
+            # Export d'une sélection filtrée (l'export complet d'une grosse base n'est pas un clic courant)
+            params = dict(self.filters or self.workload.random_filters(rng), sort=self.sort)
+            self._get("export_csv", "/api/export.csv?" + urlencode(params))
+
+    def run(self):
+        while not self.stop.is_set():
+            self.act(_weighted_choice(self.rng, ACTIONS))
+            if self.think > 0 and self.stop.wait(self.rng.expovariate(1.0 / self.think)):
+                break
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples: list, duration: float) -> dict:
+    by_endpoint = {}
+    for endpoint, seconds, status, size in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, status, size))
+    by_endpoint["(total)"] = [(s, st, b) for _, s, st, b in samples]
+    out = {}
+    for endpoint, items in sorted(by_endpoint.items()):
+        lat = sorted(s * 1000 for s, _, _ in items)
+        errors = sum(1 for _, st, _ in items if st == 0 or st >= 500)
+        out[endpoint] = {
+            "requests": len(items),
+            "rps": len(items) / duration if duration else 0.0,
+            "errors": errors,
+            "not_modified": sum(1 for _, st, _ in items if st == 304),
+            "bytes": sum(b for _, _, b in items),
+            "mean_ms": sum(lat) / len(lat) if lat else 0.0,
+            "max_ms": lat[-1] if lat else 0.0,
+            **{f"p{p}_ms": _percentile(lat, p) for p in PERCENTILES},
+        }
+    return out
+
+
+def run_stage(base_url: str, workload: Workload, users: int, duration: float, think: float,
+              warmup: float = 2.0, seed: int = 1) -> dict:
+    stop = threading.Event()
+    vus = [VirtualUser(base_url, workload, think, stop, seed=seed * 1000 + i) for i in range(users)]
+    for vu in vus:
+        vu.start()
+    # Échantillons de la mise en route ignorés (connexions, premiers calculs non mis en cache)
+    time.sleep(warmup)
+    marks = [len(vu.samples) for vu in vus]
+    t0 = time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - t0
+    samples = []
+    for vu, mark in zip(vus, marks):
+        samples.extend(vu.samples[mark:len(vu.samples)])
+    stop.set()
+    for vu in vus:
+        vu.join(10)
+    return {"users": users, "duration_s": elapsed, "endpoints": summarize(samples, elapsed)}
+
+
+def _print_stage(stage: dict):
+    print(f"\n== {stage['users']} utilisateur(s), {stage['duration_s']:.1f} s ==")
+    print(f"{'endpoint':<12} {'req':>7} {'req/s':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8} "
+          f"{'304':>5} {'err':>5}")
+    for name, e in stage["endpoints"].items():
+        print(f"{name:<12} {e['requests']:>7} {e['rps']:>8.1f} {e['p50_ms']:>8.1f} {e['p90_ms']:>8.1f} "
+              f"{e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} {e['max_ms']:>8.1f} {e['not_modified']:>5} {e['errors']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du serveur Web")
+    parser.add_argument("--db", help="Base à servir (par défaut bench_<rows>.db, générée si absente)")
+    parser.add_argument("--rows", default="100k", help="Taille de la base générée si absente (voir bench_db.py)")
+    parser.add_argument("--url", help="Viser un serveur déjà lancé au lieu d'en démarrer un")
+    parser.add_argument("--users", default="1,5,10,25,50", help="Paliers d'utilisateurs simultanés")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée mesurée par palier (s)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Mise en route non mesurée par palier (s)")
+    parser.add_argument("--think", type=float, default=1.0, help="Temps de réflexion moyen entre actions (s)")
+    parser.add_argument("--nfo-delay", type=float, default=0.3, help="Délai de réponse du bot factice (s)")
+    parser.add_argument("--nfo-miss", type=float, default=0.0, help="Part des !nfo sans réponse (0-1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(BASE_DIR, f"bench_{args.rows.lower()}.db")
+    if args.serve:
+        return serve(db_path, "127.0.0.1", args.port, args.nfo_delay, args.nfo_miss)
+
+    log = (lambda text: print(text, file=sys.stderr)) if args.json else print
+    if not os.path.exists(db_path):
+        count = bench_db.SIZES.get(args.rows.lower()) or int(args.rows)
+        log(f"Génération de {db_path} ({count} lignes)...")
+        bench_db.generate(db_path, count, seed=args.seed, progress=lambda text: None)
+
+    started = datetime.now().isoformat(timespec="seconds")
+    workload = Workload(db_path)
+    proc = None
+    base_url = args.url
+    if not base_url:
+        proc, base_url = run_server(db_path, args.nfo_delay, args.nfo_miss)
+    stages = []
+    try:
+        for users in (int(u) for u in args.users.split(",") if u.strip()):
+            log(f"Palier {users} utilisateur(s)...")
+            stage = run_stage(base_url, workload, users, args.duration, args.think, warmup=args.warmup, seed=args.seed)
+            stages.append(stage)
+            if not args.json:
+                _print_stage(stage)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    report = {
+        "meta": {
+            "db": os.path.abspath(db_path),
+            "url": args.url,
+            "think_s": args.think,
+            "duration_s": args.duration,
+            "nfo_delay_s": args.nfo_delay,
+            "nfo_miss": args.nfo_miss,
+            "seed": args.seed,
+            "started": started,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": bench_db.git_commit(),
+        },
+        "stages": stages,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    # Palier au meilleur débit: au-delà, les requêtes font la queue
+    best = max(stages, key=lambda s: s["endpoints"].get("(total)", {}).get("rps", 0), default=None)
+    if best:
+        total = best["endpoints"]["(total)"]
+        print(f"\nDébit maximal: {total['rps']:.1f} req/s à {best['users']} utilisateur(s) "
+              f"(p95 {total['p95_ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
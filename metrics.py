@@ -0,0 +1,366 @@
+# Instrumentation légère (compteurs, jauges, histogrammes) au format texte de
+# Prometheus, servie par web_server.py sur /metrics.
+# Sur le chemin chaud, une mesure coûte un verrou non contendu et une addition;
+# tout ce qui peut se lire à la demande (tailles de files, statistiques de
+# cache, bus d'événements) est calculé seulement quand /metrics est lu.
+# METRICS=0 désactive les mesures (les appels deviennent sans effet).
+import os
+import time
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from functools import wraps
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+
+# Bornes par défaut (secondes): de 0,5 ms à 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Famille de métriques telle que collectée: samples = [(nom, ((label, valeur), …), valeur)]
+Family = namedtuple("Family", "name type help samples")
+
+
+class _Child:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        if ENABLED:
+            with self._lock:
+                self.value += amount
+
+
+class _GaugeChild(_Child):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        if not ENABLED:
+            return
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Série pour ces valeurs d'étiquettes; à garder en variable sur un chemin chaud."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: étiquettes attendues {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self):
+        with self._lock:
+            items = list(self._children.items())
+        return [(tuple(zip(self.labelnames, key)), child) for key, child in items]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Child()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def collect(self) -> Family:
+        return Family(self.name, self.type, self.help, [(self.name, labels, c.value) for labels, c in self._series()])
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        # Valeur lue à la collecte: fn() -> nombre, ou {valeurs d'étiquettes: nombre}
+        self._function = function
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set_function(self, fn):
+        self._function = fn
+
+    def clear_function(self, fn):
+        # Seulement si fn est toujours la fonction lue (un autre propriétaire a pu la remplacer)
+        if self._function is fn:
+            self._function = None
+
+    def collect(self) -> Family:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = {} if self.labelnames else float("nan")
+            if self.labelnames:
+                samples = [(self.name, tuple(zip(self.labelnames, (str(k) for k in (key if isinstance(key, tuple) else (key,))))), v)
+                           for key, v in value.items()]
+            else:
+                samples = [(self.name, (), value)]
+            return Family(self.name, self.type, self.help, samples)
+        return Family(self.name, self.type, self.help, [(self.name, labels, c.value) for labels, c in self._series()])
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def collect(self) -> Family:
+        samples = []
+        for labels, child in self._series():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.bounds + (float("inf"),), counts):
+                cumulative += n
+                samples.append((self.name + "_bucket", labels + (("le", _format_value(bound)),), cumulative))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, count))
+        return Family(self.name, self.type, self.help, samples)
+
+
+class Registry:
+    """Ensemble des métriques d'un processus, plus des collecteurs appelés à la lecture."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrique {name} déjà déclarée autrement")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames=(), function=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help, labelnames)
+        if function is not None:
+            gauge.set_function(function)
+        return gauge
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def add_collector(self, fn):
+        """fn() -> itérable de Family, appelé à chaque lecture (statistiques existantes)."""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def remove_collector(self, fn):
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c is not fn]
+
+    def collect(self) -> list:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [m.collect() for m in metrics]
+        for fn in collectors:
+            try:
+                families.extend(fn())
+            except Exception:
+                pass
+        # Un même nom peut venir de plusieurs collecteurs: une seule famille par nom
+        return merge(families)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def timed(hist, *labels):
+    """Décorateur: durée de chaque appel dans l'histogramme (série `labels`)."""
+    child = hist.labels(*labels) if labels else hist._default
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+
+def merge(*groups, label: str | None = None, values=()) -> list:
+    """Fusionne des listes de Family (plusieurs processus) en ajoutant label=valeur à chaque groupe."""
+    merged = {}
+    for group, value in zip(groups, values or [None] * len(groups)):
+        for fam in group:
+            extra = ((label, value),) if label and value is not None else ()
+            samples = [(name, extra + tuple(labels), v) for name, labels, v in fam.samples]
+            if fam.name in merged:
+                merged[fam.name].samples.extend(samples)
+            else:
+                merged[fam.name] = Family(fam.name, fam.type, fam.help, samples)
+    return list(merged.values())
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families) -> str:
+    """Format d'exposition texte (version 0.0.4)."""
+    lines = []
+    for fam in families:
+        lines.append(f"# HELP {fam.name} {_escape(fam.help)}")
+        lines.append(f"# TYPE {fam.name} {fam.type}")
+        for name, labels, value in fam.samples:
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Collecteurs pour les statistiques existantes ---
+
+def bus_families(bus, prefix: str = "event_bus") -> list:
+    """Événements publiés par sujet; file, livrés et perdus par abonné (agrégés par nom)."""
+    stats = bus.stats()
+    subs = {}
+    for s in stats["subscribers"]:
+        agg = subs.setdefault(s["name"] or "?", [0, 0, 0])
+        agg[0] += s["pending"]
+        agg[1] += s["delivered"]
+        agg[2] += s["dropped"]
+    return [
+        Family(f"{prefix}_published_total", "counter", "Événements publiés",
+               [(f"{prefix}_published_total", (("topic", t),), n) for t, n in stats["published"].items()]),
+        Family(f"{prefix}_pending", "gauge", "Événements en attente par abonné",
+               [(f"{prefix}_pending", (("subscriber", k),), v[0]) for k, v in subs.items()]),
+        Family(f"{prefix}_delivered_total", "counter", "Événements livrés par abonné",
+               [(f"{prefix}_delivered_total", (("subscriber", k),), v[1]) for k, v in subs.items()]),
+        Family(f"{prefix}_dropped_total", "counter", "Événements perdus (file pleine) par abonné",
+               [(f"{prefix}_dropped_total", (("subscriber", k),), v[2]) for k, v in subs.items()]),
+    ]
+
+
+def cache_families(caches: dict, prefix: str = "query_cache") -> list:
+    """Statistiques de QueryCache ({nom: cache}): hits, misses, évictions, taille."""
+    fams = {
+        "hits": (f"{prefix}_hits_total", "counter", "Lectures servies par le cache"),
+        "misses": (f"{prefix}_misses_total", "counter", "Lectures absentes du cache"),
+        "evictions": (f"{prefix}_evictions_total", "counter", "Entrées évincées (LRU)"),
+        "invalidations": (f"{prefix}_invalidations_total", "counter", "Vidages après écriture en base"),
+        "hit_rate": (f"{prefix}_hit_ratio", "gauge", "Part des lectures servies par le cache"),
+        "entries": (f"{prefix}_entries", "gauge", "Entrées en cache"),
+        "bytes": (f"{prefix}_bytes", "gauge", "Taille du cache en octets"),
+    }
+    out = []
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    for key, (name, mtype, help) in fams.items():
+        out.append(Family(name, mtype, help,
+                          [(name, (("cache", cname),), s.get(key, 0)) for cname, s in stats.items()]))
+    return out
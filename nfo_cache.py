@@ -0,0 +1,415 @@
+import os
+import re
+import time
+import queue
+import sqlite3
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import event_bus
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_PATH = os.path.join(BASE_DIR, "irc_log.txt")
+
+# Délai minimal entre deux !nfo envoyés par le préchargement (respect du bot)
+NFO_MIN_INTERVAL = float(os.environ.get("NFO_MIN_INTERVAL", "5"))
+# Réponse « pas de NFO » mémorisée avant de redemander au bot
+NFO_NEGATIVE_TTL = float(os.environ.get("NFO_NEGATIVE_TTL", "3600"))
+NFO_REPLY_TIMEOUT = 10.0
+# Base de la table nfo; par défaut <base des releases>.nfo.db. Jamais la base des
+# releases elle-même: chaque écriture y change PRAGMA data_version, ce qui vide le
+# cache de réponses Web, change les ETag et invalide les pages de la GUI
+NFO_DB_PATH = os.environ.get("NFO_DB_PATH")
+NFO_MAX_BYTES = 512 * 1024
+
+_TICK_RE = re.compile(r'`(https?://[^`\s]+)`', re.IGNORECASE)
+_URL_RE = re.compile(r'https?://\S+', re.IGNORECASE)
+_NFO_ANY_RE = re.compile(r'https?://[^`\s]+?\.nfo\b', re.IGNORECASE)
+_CONTROL_RE = re.compile(r'[\x00-\x1F\x7F]')
+_TAGS_RE = re.compile(r'^(?:\s*\[[^\]]*\])+\s*')
+
+
+def release_key(release: str) -> str:
+    """Clé de cache d'une release: le message sans les étiquettes [PRE] [TV]… de tête."""
+    return _TAGS_RE.sub("", release or "").strip()
+
+
+def _candidates(line: str) -> list[str]:
+    line_clean = _CONTROL_RE.sub('', line)
+    # D’abord tenter le lien entre backticks, sinon toutes les URLs de la ligne
+    m_tick = _TICK_RE.search(line_clean)
+    candidates = [m_tick.group(1)] if m_tick else [m.group(0) for m in _URL_RE.finditer(line_clean)]
+    normalized = []
+    for u in candidates:
+        u = u.rstrip('.,)>]"\'`')
+        # Retirer codes de couleur IRC (\x03xx) et autres caractères de contrôle après .nfo
+        u = re.sub(r'(?<=\.nfo)\\x[0-9a-fA-F]{2,4}.*$', '', u)
+        u = re.sub(r'(?<=\.nfo)\d+$', '', u)
+        normalized.append(u)
+    return normalized
+
+
+def pick_nfo_url(line: str, release: str | None = None) -> str | None:
+    """URL NFO d'une ligne de log, ou None.
+
+    Tout lien se terminant par .nfo (priorité dupefr.fr), à défaut un lien
+    dupefr.fr en /nfo*. Avec `release`, seuls les liens contenant son nom comptent.
+    """
+    normalized = _candidates(line)
+    if release:
+        key = release_key(release).lower()
+        normalized = [u for u in normalized if key and key in urllib.parse.unquote(u).lower()]
+    nfo_any = [u for u in normalized if _NFO_ANY_RE.match(u)]
+    if nfo_any:
+        preferred = [u for u in nfo_any if 'dupefr.fr' in u]
+        return preferred[-1] if preferred else nfo_any[-1]
+    preferred = [u for u in normalized if 'dupefr.fr' in u and '/nfo' in u]
+    return preferred[-1] if preferred else None
+
+
+def find_nfo_url(lines, channel: str | None = None, my_nick: str | None = None,
+                 release: str | None = None, strict: bool = False) -> str | None:
+    """Cherche une URL NFO dans des lignes de irc_log.txt.
+
+    Les réponses adressées au bot (Target: <nick>) ou au channel sont lues avant
+    les autres lignes, et un lien au nom de la release avant tout autre lien;
+    avec strict, seul un lien au nom de la release est accepté.
+    """
+    addressed = [line for line in lines
+                 if (my_nick and f"Target: {my_nick}" in line) or (channel and f"@{channel}" in line)]
+    wanted = [release] if strict or not release else [release, None]
+    for want in wanted:
+        for candidates in (addressed, lines):
+            for line in candidates:
+                url = pick_nfo_url(line, want)
+                if url:
+                    return url
+    return None
+
+
+def wait_for_nfo_url(log_path: str, start: int, channel: str, my_nick: str | None, release: str,
+                     strict: bool = False, timeout: float = NFO_REPLY_TIMEOUT, interval: float = 0.5):
+    """Attend la réponse du bot dans les lignes ajoutées au log après `start` (octets)."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+                f.seek(start)
+                lines = f.readlines()
+            url = find_nfo_url(lines, channel, my_nick, release, strict=strict)
+            if url:
+                return url
+        except OSError:
+            pass
+        time.sleep(interval)
+    return None
+
+
+def wait_for_nfo_event(sub, channel: str, my_nick: str | None, release: str,
+                       strict: bool = False, timeout: float = NFO_REPLY_TIMEOUT):
+    """Attend la réponse du bot parmi les lignes IRC reçues par l'abonnement `sub` (event_bus.IRC_LINE)."""
+    deadline = time.monotonic() + timeout
+    lines = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        event = sub.get(remaining)
+        if event is None:
+            continue
+        lines.append(event.data.get("line") or "")
+        url = find_nfo_url(lines, channel, my_nick, release, strict=strict)
+        if url:
+            return url
+
+
+def _log_size(log_path: str) -> int:
+    try:
+        return os.path.getsize(log_path)
+    except OSError:
+        return 0
+
+
+def nfo_db_path(releases_db_path: str) -> str:
+    """Fichier SQLite du cache NFO associé à une base de releases."""
+    if NFO_DB_PATH:
+        return NFO_DB_PATH
+    root, _ext = os.path.splitext(releases_db_path)
+    return root + ".nfo.db"
+
+
+class NfoStore:
+    """Table nfo: URL (et texte optionnel) des NFO déjà résolus, par release.
+
+    Avec legacy_path (base des releases), les entrées d'une ancienne table nfo
+    y sont recopiées à la première ouverture (lecture seule de l'ancienne base).
+    """
+
+    def __init__(self, db_path: str, legacy_path: str | None = None):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.ensure_schema()
+        if legacy_path and os.path.exists(legacy_path) \
+                and os.path.abspath(legacy_path) != os.path.abspath(db_path):
+            self._import_legacy(legacy_path)
+
+    def ensure_schema(self):
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS nfo (
+                release TEXT PRIMARY KEY,
+                url TEXT,
+                fetched_at REAL NOT NULL,
+                content TEXT,
+                content_fetched_at REAL,
+                error TEXT
+            )
+            """
+        )
+        self.conn.commit()
+
+    def _import_legacy(self, legacy_path: str):
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM nfo LIMIT 1").fetchone():
+                return
+            try:
+                legacy = sqlite3.connect(f"file:{legacy_path}?mode=ro", uri=True)
+                try:
+                    rows = legacy.execute(
+                        "SELECT release, url, fetched_at, content, content_fetched_at, error FROM nfo"
+                    ).fetchall()
+                finally:
+                    legacy.close()
+            except sqlite3.Error:
+                # Pas d'ancienne table nfo
+                return
+            self.conn.executemany("INSERT OR IGNORE INTO nfo VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def get(self, release: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM nfo WHERE release = ?", (release_key(release),)).fetchone()
+        return dict(row) if row else None
+
+    def fresh(self, release: str) -> dict | None:
+        # Entrée utilisable: une URL, ou une absence de NFO encore récente
+        entry = self.get(release)
+        if entry and (entry["url"] or time.time() - entry["fetched_at"] < NFO_NEGATIVE_TTL):
+            return entry
+        return None
+
+    def put_url(self, release: str, url: str | None):
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO nfo(release, url, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT(release) DO UPDATE SET
+                    url = excluded.url, fetched_at = excluded.fetched_at,
+                    content = CASE WHEN nfo.url IS excluded.url THEN nfo.content END,
+                    content_fetched_at = CASE WHEN nfo.url IS excluded.url THEN nfo.content_fetched_at END
+                """,
+                (release_key(release), url, time.time()),
+            )
+            self.conn.commit()
+
+    def put_content(self, release: str, content: str | None = None, error: str | None = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE nfo SET content = ?, content_fetched_at = ?, error = ? WHERE release = ?",
+                (content, time.time(), error, release_key(release)),
+            )
+            self.conn.commit()
+
+
+class NfoDownloader:
+    """Télécharge le texte des NFO dans un pool borné (threads et file d'attente)."""
+
+    def __init__(self, store: NfoStore, max_workers: int = 2, max_pending: int = 100,
+                 timeout: float = 15.0, opener=urllib.request.urlopen):
+        self.store = store
+        self.timeout = timeout
+        self.opener = opener
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nfo-dl")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, release: str, url: str) -> bool:
+        """Planifie le téléchargement; False si la file est pleine (réessayé au prochain accès)."""
+        key = release_key(release)
+        with self._lock:
+            if key in self._inflight:
+                return True
+            if not self._slots.acquire(blocking=False):
+                return False
+            self._inflight.add(key)
+        try:
+            self._pool.submit(self._run, key, url)
+        except RuntimeError:
+            self._done(key)
+            return False
+        return True
+
+    def _done(self, key: str):
+        with self._lock:
+            self._inflight.discard(key)
+            self._slots.release()
+
+    def fetch(self, url: str) -> str:
+        req = urllib.request.Request(url, headers={"User-Agent": "irclog-nfo/1.0"})
+        with self.opener(req, timeout=self.timeout) as resp:
+            data = resp.read(NFO_MAX_BYTES + 1)
+            charset = resp.headers.get_content_charset() if hasattr(resp, "headers") else None
+        if len(data) > NFO_MAX_BYTES:
+            raise ValueError(f"NFO trop volumineux (> {NFO_MAX_BYTES} octets)")
+        if charset:
+            return data.decode(charset, errors="replace")
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            # Les .nfo sont historiquement en CP437 (art ASCII)
+            return data.decode("cp437", errors="replace")
+
+    def _run(self, release: str, url: str):
+        try:
+            self.store.put_content(release, content=self.fetch(url))
+        except Exception as e:
+            self.store.put_content(release, error=str(e) or e.__class__.__name__)
+        finally:
+            self._done(release)
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class NfoResolver:
+    """Résout l'URL NFO d'une release via le bot IRC (!nfo) et la met en cache.
+
+    Les demandes interactives partent immédiatement; le préchargement (prefetch)
+    attend au moins min_interval secondes depuis le dernier !nfo envoyé et passe
+    par une file bornée (les demandes en trop sont abandonnées). Avec un bus
+    d'événements, la réponse est lue sur le flux IRC_LINE; sinon dans irc_log.txt.
+    """
+
+    def __init__(self, store: NfoStore, irc=None, downloader: NfoDownloader | None = None,
+                 log_path: str = LOG_PATH, min_interval: float = NFO_MIN_INTERVAL, max_pending: int = 200,
+                 bus=None):
+        self.store = store
+        self.irc = irc
+        self.downloader = downloader
+        self.bus = bus
+        self.log_path = log_path
+        self.min_interval = min_interval
+        self._last_sent = 0.0
+        self._send_lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def lookup(self, release: str) -> dict | None:
+        entry = self.store.fresh(release)
+        if entry and entry["url"] and entry["content_fetched_at"] is None and self.downloader is not None:
+            self.downloader.submit(release, entry["url"])
+        return entry
+
+    def _send(self, channel: str, release: str) -> bool:
+        irc = self.irc
+        if irc is None:
+            return False
+        cmd = "!nfo " + release
+        send_fn = getattr(irc, "send_privmsg", None)
+        if callable(send_fn):
+            return bool(send_fn(channel, cmd))
+        client = getattr(irc, "client", None)
+        if client is not None and getattr(irc, "connected", False):
+            client.privmsg(channel, cmd)
+            return True
+        return False
+
+    def _my_nick(self) -> str | None:
+        try:
+            nv = getattr(self.irc, "nick_var", None)
+            return nv.get().strip() if nv else None
+        except Exception:
+            return None
+
+    def resolve(self, channel: str, release: str, strict: bool = False, timeout: float = NFO_REPLY_TIMEOUT):
+        """Envoie !nfo et attend l'URL. Retourne (envoyé, url); l'URL est mise en cache."""
+        # Abonnement (ou position dans le log) pris avant l'envoi: la réponse ne peut pas être manquée
+        sub = start = None
+        if self.bus is not None:
+            sub = self.bus.subscribe(event_bus.IRC_LINE, maxsize=500, name="nfo-reply")
+        else:
+            start = _log_size(self.log_path)
+        try:
+            with self._send_lock:
+                sent = self._send(channel, release)
+                if sent:
+                    self._last_sent = time.monotonic()
+            if not sent:
+                return False, None
+            if sub is not None:
+                url = wait_for_nfo_event(sub, channel, self._my_nick(), release, strict=strict, timeout=timeout)
+            else:
+                url = wait_for_nfo_url(self.log_path, start, channel, self._my_nick(), release,
+                                       strict=strict, timeout=timeout)
+        finally:
+            if sub is not None:
+                sub.close()
+        # Le préchargement (strict) mémorise aussi l'absence de réponse
+        if url or strict:
+            self.store.put_url(release, url)
+        if url and self.downloader is not None:
+            self.downloader.submit(release, url)
+        return True, url
+
+    # --- Préchargement ---
+
+    def on_release(self, event):
+        """Rappel du bus (event_bus.RELEASE_LOGGED): précharge le NFO de la release enregistrée."""
+        channel = event.data.get("channel")
+        release = (event.data.get("message") or "").strip()
+        if channel and release:
+            self.prefetch(channel, release)
+
+    def prefetch(self, channel: str, release: str) -> bool:
+        self._ensure_thread()
+        try:
+            self._pending.put_nowait((channel, release))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pending(self) -> int:
+        return self._pending.qsize()
+
+    def _ensure_thread(self):
+        # Appelé depuis le bus et les requêtes Web: une seule boucle, sinon
+        # NFO_MIN_INTERVAL ne serait plus respecté entre deux !nfo
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._prefetch_loop, daemon=True, name="nfo-prefetch")
+                self._thread.start()
+
+    def _prefetch_loop(self):
+        while True:
+            channel, release = self._pending.get()
+            try:
+                if self.store.fresh(release):
+                    continue
+                delay = self._last_sent + self.min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.resolve(channel, release, strict=True)
+            except Exception:
+                pass
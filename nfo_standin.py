@@ -0,0 +1,120 @@
+# Serveur HTTP local minimal qui sert des .nfo, pour tester le téléchargement du
+# texte des NFO (nfo_cache.NfoDownloader) sans hébergeur distant:
+#   python nfo_standin.py --root dossier [--port 8081] [--delay 0.5]
+# puis une URL http://127.0.0.1:8081/<fichier>.nfo dans la table nfo. Les fichiers
+# sont envoyés tels quels, en text/plain sans charset (comme la plupart des
+# hébergeurs de NFO: le client devine l'encodage); un fichier absent répond 404.
+# --delay retarde chaque réponse, pour voir les téléchargements simultanés.
+# Utilisé par bench_nfo.py.
+import os
+import sys
+import time
+import argparse
+import threading
+from urllib.parse import unquote, urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "nfo-standin/1.0"
+    # Contexte partagé (injecté par NfoStandin)
+    standin = None
+
+    def do_GET(self):
+        standin = self.standin
+        standin.request_started(self.path)
+        status = 500
+        try:
+            if standin.delay:
+                time.sleep(standin.delay)
+            path = standin.real(urlsplit(self.path).path)
+            if path is None or not os.path.isfile(path):
+                status = 404
+                self.send_error(404, "NFO introuvable")
+                return
+            with open(path, "rb") as f:
+                data = f.read()
+            status = 200
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            standin.request_finished(status)
+
+    def log_message(self, format, *args):
+        self.standin.log(f"{self.address_string()} {format % args}")
+
+
+class NfoStandin:
+    """Serveur HTTP de test dans des threads; port=0 choisit un port libre (self.port)."""
+
+    def __init__(self, root: str, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, log=None):
+        self.root = os.path.abspath(root)
+        self.delay = delay
+        self.log = log or (lambda text: None)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        handler = type("Handler", (_Handler,), {"standin": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self.port = self.address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="nfo-standin")
+        self._thread.start()
+
+    def url(self, name: str) -> str:
+        return f"http://{self.address[0]}:{self.port}/{name}"
+
+    def real(self, path: str) -> str | None:
+        # Chemin de l'URL vers le dossier servi; rien en dehors de root
+        rel = unquote(path).lstrip("/")
+        real = os.path.realpath(os.path.join(self.root, *rel.split("/")))
+        return real if os.path.commonpath([self.root, real]) == self.root else None
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "active": 0, "peak_active": 0, "status": {}}
+            self.paths = []
+
+    def request_started(self, path: str):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["active"] += 1
+            self.stats["peak_active"] = max(self.stats["peak_active"], self.stats["active"])
+            self.paths.append(path)
+
+    def request_finished(self, status: int):
+        with self._lock:
+            self.stats["active"] -= 1
+            self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur HTTP local de test pour les NFO")
+    parser.add_argument("--root", required=True, help="Dossier servi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="Attente avant chaque réponse (s)")
+    args = parser.parse_args()
+
+    server = NfoStandin(args.root, args.host, args.port, delay=args.delay,
+                        log=lambda text: print(f"[{time.strftime('%H:%M:%S')}] {text}"))
+    print(f"Serveur NFO de test sur http://{server.address[0]}:{server.port}/, racine {server.root}; "
+          f"Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+# Profilage à la demande, sans redémarrer sous un profileur:
+# - CPU: échantillonnage des piles de tous les threads (sys._current_frames)
+#   pendant N secondes; rapport texte (fonctions les plus coûteuses) et piles
+#   « repliées » (.folded) lisibles par flamegraph.pl ou speedscope;
+# - mémoire: instantanés tracemalloc, avec les plus fortes progressions depuis
+#   l'instantané précédent.
+# Déclenchement: endpoints /api/debug/profile* du serveur Web, signaux SIGUSR1
+# (CPU) et SIGUSR2 (mémoire) hors Windows. Rapports dans PROFILE_DIR.
+# Au repos, rien ne tourne: pas de thread, pas de hook, tracemalloc arrêté.
+import os
+import sys
+import time
+import signal
+import threading
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(BASE_DIR, "profiles")
+# Durée par défaut d'une fenêtre CPU et bornes acceptées (secondes)
+PROFILE_SECONDS = float(os.environ.get("PROFILE_SECONDS", "30"))
+PROFILE_MAX_SECONDS = 600.0
+# Intervalle entre deux échantillons (secondes)
+SAMPLE_INTERVAL = 0.005
+# Profondeur des piles gardées par tracemalloc
+TRACEMALLOC_FRAMES = int(os.environ.get("PROFILE_TRACEMALLOC_FRAMES", "10"))
+TOP_N = 30
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = SAMPLE_INTERVAL, stop: threading.Event | None = None):
+    """Échantillonne les piles des autres threads; renvoie (Counter{pile: n}, nb d'échantillons).
+
+    Une pile est un tuple (nom du thread, fonction la plus externe, …, fonction courante).
+    """
+    stop = stop or threading.Event()
+    me = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    labels = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and not stop.is_set():
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(tid, f"thread-{tid}"))
+            stacks[tuple(reversed(stack))] += 1
+        samples += 1
+        stop.wait(interval)
+    return stacks, samples
+
+
+def write_cpu_report(stacks: Counter, samples: int, seconds: float, interval: float, base_path: str) -> str:
+    """Écrit base_path.folded (piles repliées) et base_path.txt (résumé); renvoie le chemin du .txt."""
+    with open(base_path + ".folded", "w", encoding="utf-8") as f:
+        for stack, n in stacks.most_common():
+            f.write(";".join(stack) + f" {n}\n")
+
+    own = Counter()
+    total = Counter()
+    per_thread = Counter()
+    for stack, n in stacks.items():
+        per_thread[stack[0]] += n
+        if len(stack) > 1:
+            own[stack[-1]] += n
+        for label in set(stack[1:]):
+            total[label] += n
+
+    def pct(n):
+        return f"{100.0 * n / samples:6.1f}%" if samples else "     -"
+
+    lines = [
+        f"Profil CPU — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, pid {os.getpid()}",
+        f"{seconds:g} s, {samples} échantillons toutes les {interval * 1000:g} ms",
+        "Pourcentages: part des échantillons où la fonction est active dans un thread",
+        "(un thread en attente — select, sleep, verrou — compte aussi).",
+        "",
+        "Threads:",
+    ]
+    lines += [f"  {pct(n)}  {name}" for name, n in per_thread.most_common()]
+    lines += ["", f"Fonctions en cours (temps propre), top {TOP_N}:"]
+    lines += [f"  {pct(n)}  {label}" for label, n in own.most_common(TOP_N)]
+    lines += ["", f"Fonctions sur la pile (temps cumulé), top {TOP_N}:"]
+    lines += [f"  {pct(n)}  {label}" for label, n in total.most_common(TOP_N)]
+    path = base_path + ".txt"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def write_memory_report(snapshot, previous, path: str) -> str:
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [
+        f"Mémoire (tracemalloc) — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, pid {os.getpid()}",
+        f"Tracé: {current / 1048576:.1f} Mo (pic {peak / 1048576:.1f} Mo)",
+        "",
+    ]
+    if previous is not None:
+        lines.append(f"Plus fortes progressions depuis l'instantané précédent, top {TOP_N}:")
+        for stat in snapshot.compare_to(previous, "lineno")[:TOP_N]:
+            lines.append(f"  {stat}")
+        lines.append("")
+    lines.append(f"Plus grosses allocations, top {TOP_N}:")
+    for stat in snapshot.statistics("lineno")[:TOP_N]:
+        lines.append(f"  {stat}")
+    # Pile complète de la première: souvent le plus parlant
+    top = snapshot.statistics("traceback")[:1]
+    if top:
+        lines += ["", "Pile de la plus grosse allocation:"]
+        lines += [f"  {line}" for line in top[0].traceback.format()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+class Profiler:
+    """Profilage du processus: une fenêtre CPU à la fois, instantanés mémoire successifs."""
+
+    def __init__(self, label: str | None = None, directory: str = PROFILE_DIR):
+        self.label = label or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        self.directory = directory
+        self.reports = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._cpu_thread = None
+        self._cpu_until = None
+        self._cpu_stop = threading.Event()
+        self._mem_previous = None
+
+    def _path(self, kind: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.directory, f"{kind}-{self.label}-{os.getpid()}-{stamp}")
+
+    def start_cpu(self, seconds: float | None = None, interval: float | None = None) -> dict:
+        """Lance une fenêtre d'échantillonnage en arrière-plan; le rapport est écrit à la fin."""
+        seconds = min(max(float(seconds or PROFILE_SECONDS), 1.0), PROFILE_MAX_SECONDS)
+        interval = min(max(float(interval or SAMPLE_INTERVAL), 0.001), 1.0)
+        with self._lock:
+            if self._cpu_thread is not None and self._cpu_thread.is_alive():
+                return {"started": False, "running": True, "until": self._cpu_until}
+            base_path = self._path("cpu")
+            self._cpu_stop.clear()
+            self._cpu_until = time.time() + seconds
+            self._cpu_thread = threading.Thread(target=self._run_cpu, args=(seconds, interval, base_path),
+                                                name="profiler", daemon=True)
+            self._cpu_thread.start()
+        return {"started": True, "seconds": seconds, "interval": interval, "report": base_path + ".txt"}
+
+    def stop_cpu(self):
+        # Arrête la fenêtre en cours; le rapport porte sur la durée écoulée
+        self._cpu_stop.set()
+
+    def _run_cpu(self, seconds, interval, base_path):
+        t0 = time.monotonic()
+        try:
+            stacks, samples = sample_stacks(seconds, interval, self._cpu_stop)
+            self.reports.append(write_cpu_report(stacks, samples, time.monotonic() - t0, interval, base_path))
+        except Exception as e:
+            self.reports.append(f"(échec du profil CPU: {e})")
+        finally:
+            self._cpu_until = None
+
+    def memory(self, action: str = "snapshot") -> dict:
+        """start: active tracemalloc; snapshot: rapport (différence avec le précédent); stop: désactive."""
+        with self._lock:
+            if action == "stop":
+                self._mem_previous = None
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                return {"tracing": False}
+            if action not in ("start", "snapshot"):
+                raise ValueError(f"Action mémoire inconnue: {action}")
+            if not tracemalloc.is_tracing():
+                # Les allocations antérieures ne sont pas tracées: l'instantané de
+                # référence est pris maintenant, le rapport au prochain appel
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._mem_previous = _snapshot()
+                return {"tracing": True, "started": True, "report": None}
+            if action == "start":
+                return {"tracing": True, "started": False, "report": None}
+            snapshot = _snapshot()
+            path = write_memory_report(snapshot, self._mem_previous, self._path("mem") + ".txt")
+            self._mem_previous = snapshot
+            self.reports.append(path)
+            return {"tracing": True, "report": path}
+
+    def handle(self, kind: str = "status", seconds=None, interval=None, action=None) -> dict:
+        """Point d'entrée commun (Web, IPC): kind = "cpu", "memory" ou "status"."""
+        if kind == "cpu":
+            return self.start_cpu(seconds, interval)
+        if kind == "memory":
+            return self.memory(action or "snapshot")
+        return self.status()
+
+    def status(self) -> dict:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "label": self.label,
+            "pid": os.getpid(),
+            "directory": self.directory,
+            "cpu_running": self._cpu_until is not None,
+            "cpu_until": self._cpu_until,
+            "tracemalloc": tracing,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "reports": list(self.reports),
+        }
+
+
+# Profileur du processus
+PROFILER = Profiler()
+
+
+def install_signal_handlers(label: str | None = None) -> bool:
+    """SIGUSR1: fenêtre CPU de PROFILE_SECONDS; SIGUSR2: instantané mémoire (active tracemalloc au 1er).
+
+    À appeler depuis le thread principal. Sans ces signaux (Windows), ne fait rien et renvoie False.
+    Sous Tk, le gestionnaire s'exécute au prochain rappel de la boucle d'événements.
+    """
+    if label:
+        PROFILER.label = label
+    cpu_sig = getattr(signal, "SIGUSR1", None)
+    mem_sig = getattr(signal, "SIGUSR2", None)
+    if cpu_sig is None or mem_sig is None:
+        return False
+
+    def on_cpu(signum, frame):
+        PROFILER.start_cpu()
+
+    def on_memory(signum, frame):
+        # L'instantané peut prendre du temps: hors du gestionnaire de signal
+        threading.Thread(target=PROFILER.memory, name="profiler-mem", daemon=True).start()
+
+    try:
+        signal.signal(cpu_sig, on_cpu)
+        signal.signal(mem_sig, on_memory)
+    except ValueError:
+        # Pas dans le thread principal
+        return False
+    return True
@@ -0,0 +1,658 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import queue
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import metrics
+
+
+# Emplacement de la base SQLite (à côté de ce script)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "irc_logs.db")
+
+
+# Durée de chaque appel SQL, par méthode (voir metrics.py)
+QUERY_SECONDS = metrics.histogram("releasesdb_query_seconds", "Durée des appels de ReleasesDB", ("method",))
+SLOW_QUERY_COUNT = metrics.counter("releasesdb_slow_queries_total", "Requêtes au-delà du seuil", ("method", "full_scan"))
+
+# Requêtes lentes: seuil en ms (0 = désactivé), nombre d'entrées gardées
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_KEEP = int(os.environ.get("DB_SLOW_QUERY_KEEP", "100"))
+
+_SPACES_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+# "SCAN releases" sans index = lecture de toute la table
+_FULL_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?releases\b(?!.*USING (?:COVERING )?INDEX)")
+
+
+def normalize_sql(sql: str) -> str:
+    # Une ligne, et les listes IN (?, ?, …) de longueur variable réduites à une forme
+    return _IN_LIST_RE.sub("(?, …)", _SPACES_RE.sub(" ", sql).strip())
+
+
+def params_shape(params) -> list[str]:
+    """Type des paramètres sans leur valeur: str(12), like(7), int, null…"""
+    shape = []
+    for p in params or ():
+        if p is None:
+            shape.append("null")
+        elif isinstance(p, str):
+            shape.append(f"like({len(p)})" if p.startswith("%") or p.endswith("%") else f"str({len(p)})")
+        else:
+            shape.append(type(p).__name__)
+    return shape
+
+
+class SlowQueryLog:
+    """Dernières requêtes lentes (file circulaire), avec leur plan d'exécution."""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, keep: int = SLOW_QUERY_KEEP):
+        self.threshold_ms = threshold_ms
+        self.total = 0
+        self._entries = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def enabled_for(self, seconds: float) -> bool:
+        return self.threshold_ms > 0 and seconds * 1000 >= self.threshold_ms
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.total += 1
+            entry["id"] = self.total
+            self._entries.append(entry)
+        SLOW_QUERY_COUNT.labels(entry["method"], str(entry["full_scan"]).lower()).inc()
+
+    def entries(self) -> list:
+        # Plus récentes d'abord
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> list:
+        """Par requête normalisée: nombre, durée max et moyenne, drapeaux."""
+        groups = {}
+        for e in self.entries():
+            g = groups.setdefault((e["method"], e["sql"]), {
+                "method": e["method"], "sql": e["sql"], "count": 0, "max_ms": 0.0, "total_ms": 0.0,
+                "full_scan": e["full_scan"], "temp_btree": e["temp_btree"],
+            })
+            g["count"] += 1
+            g["total_ms"] += e["ms"]
+            g["max_ms"] = max(g["max_ms"], e["ms"])
+        out = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+        for g in out:
+            g["avg_ms"] = g.pop("total_ms") / g["count"]
+        return out
+
+
+# Journal partagé par toutes les connexions du processus (GUI, serveur Web)
+SLOW_QUERIES = SlowQueryLog()
+
+
+class ReleasesDB:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # check_same_thread=False pour permettre la mise à jour depuis callbacks
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # La connexion est partagée entre threads (serveur web multi-thread)
+        self.lock = threading.RLock()
+        # Compteur des écritures faites via cette instance (voir generation())
+        self._writes = 0
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        # WAL: lecteurs (GUI, serveur Web, autre processus) et écrivain (logger)
+        # ne se bloquent pas mutuellement. Le mode est persistant dans le fichier.
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass
+        # Crée la table si elle n'existe pas (selon le schéma observé)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS releases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts INTEGER NOT NULL,
+                ts_iso TEXT NOT NULL,
+                server TEXT,
+                channel TEXT,
+                nick TEXT,
+                message TEXT,
+                type TEXT
+            )
+            """
+        )
+        # Index utile pour recherche par message
+        self.conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_message ON releases(message)
+            """
+        )
+        self.conn.commit()
+
+    @metrics.timed(QUERY_SECONDS, "generation")
+    def generation(self) -> tuple:
+        # Jeton de version des données: nos propres écritures + PRAGMA data_version,
+        # qui change quand une autre connexion (logger, autre processus) a commité.
+        with self.lock:
+            row = self.conn.execute("PRAGMA data_version").fetchone()
+            return (self._writes, int(row[0]) if row else 0)
+
+    def _execute(self, method: str, sql: str, params=(), fetch: str | None = "all"):
+        """Exécute une requête (verrou déjà pris); au-delà du seuil, elle est notée avec son plan.
+
+        fetch: "all" (liste), "one" (une ligne) ou None (curseur, seule l'exécution est chronométrée).
+        """
+        t0 = time.perf_counter()
+        cur = self.conn.execute(sql, params)
+        result = cur.fetchall() if fetch == "all" else cur.fetchone() if fetch == "one" else cur
+        elapsed = time.perf_counter() - t0
+        if SLOW_QUERIES.enabled_for(elapsed):
+            self._record_slow(method, sql, params, elapsed, len(result) if fetch == "all" else None)
+        return result
+
+    def _record_slow(self, method: str, sql: str, params, elapsed: float, rows: int | None):
+        try:
+            plan = [row[3] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        except sqlite3.Error as e:
+            plan = [f"(plan indisponible: {e})"]
+        SLOW_QUERIES.record({
+            "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(elapsed * 1000, 2),
+            "method": method,
+            "sql": normalize_sql(sql),
+            "params": params_shape(params),
+            "rows": rows,
+            "plan": plan,
+            "full_scan": any(_FULL_SCAN_RE.match(d) for d in plan),
+            "temp_btree": any("USE TEMP B-TREE" in d for d in plan),
+        })
+
+    @metrics.timed(QUERY_SECONDS, "distinct_values")
+    def distinct_values(self, column: str):
+        if column not in ("server", "channel", "nick", "type"):
+            return []
+        sql = f"SELECT DISTINCT {column} FROM releases WHERE {column} IS NOT NULL AND {column} <> '' ORDER BY {column} ASC"
+        with self.lock:
+            return [row[0] for row in self._execute("distinct_values", sql)]
+
+    @staticmethod
+    def _where(filters: dict):
+        where = []
+        params = []
+
+        # Filtres exacts
+        for key in ("server", "channel", "nick", "type"):
+            val = filters.get(key)
+            if val:
+                where.append(f"{key} = ?")
+                params.append(val)
+
+        # Recherche texte dans message (contient)
+        q = filters.get("query")
+        if q:
+            where.append("message LIKE ?")
+            params.append(f"%{q}%")
+
+        # Plage de dates (ISO) – simple, basé sur ts_iso préfixe YYYY-MM-DD
+        date_from = filters.get("date_from")
+        date_to = filters.get("date_to")
+        if date_from:
+            where.append("ts_iso >= ?")
+            params.append(f"{date_from} 00:00:00")
+        if date_to:
+            where.append("ts_iso <= ?")
+            params.append(f"{date_to} 23:59:59")
+
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+        return where_sql, params
+
+    @staticmethod
+    def _order(order_by: list | None) -> str:
+        # ORDER BY multi-colonnes
+        valid_cols = {"id", "ts", "ts_iso", "server", "channel", "nick", "message", "type"}
+        order_clauses = []
+        if order_by:
+            for col, direction in order_by:
+                col = str(col)
+                direction = str(direction).upper()
+                if col in valid_cols and direction in ("ASC", "DESC"):
+                    order_clauses.append(f"{col} {direction}")
+        return f"ORDER BY {', '.join(order_clauses)}" if order_clauses else "ORDER BY ts DESC"
+
+    @metrics.timed(QUERY_SECONDS, "search")
+    def search(self, filters: dict, limit: int = 500, offset: int = 0, order_by: list | None = None):
+        where_sql, params = self._where(filters)
+        sql = f"""
+            SELECT id, ts_iso, server, channel, nick, message, type, ts
+            FROM releases
+            {where_sql}
+            {self._order(order_by)}
+            LIMIT ? OFFSET ?
+        """
+        params.extend([limit, offset])
+        with self.lock:
+            return self._execute("search", sql, params)
+
+    def search_all(self, filters: dict, order_by: list | None = None):
+        return list(self.iter_all(filters, order_by=order_by))
+
+    def iter_all(self, filters: dict, order_by: list | None = None, batch_size: int = 1000):
+        # Parcours par lots: le verrou n'est tenu que le temps de lire chaque lot,
+        # ce qui laisse les autres threads utiliser la connexion entre deux lots.
+        where_sql, params = self._where(filters)
+        sql = f"""
+            SELECT id, ts_iso, server, channel, nick, message, type, ts
+            FROM releases
+            {where_sql}
+            {self._order(order_by)}
+        """
+        with self.lock, QUERY_SECONDS.labels("iter_all").time():
+            cur = self._execute("iter_all", sql, params, fetch=None)
+        try:
+            while True:
+                with self.lock:
+                    batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            cur.close()
+
+    @metrics.timed(QUERY_SECONDS, "count")
+    def count(self, filters: dict) -> int:
+        where_sql, params = self._where(filters)
+        sql = f"SELECT COUNT(*) AS cnt FROM releases {where_sql}"
+        with self.lock:
+            row = self._execute("count", sql, params, fetch="one")
+        return int(row[0]) if row else 0
+
+    # Colonnes NOT NULL: comparées telles quelles; les autres via IFNULL(col, '')
+    _KEYSET_NOT_NULL = ("id", "ts", "ts_iso")
+
+    @classmethod
+    def _keyset_order(cls, order_by: list | None) -> list:
+        valid_cols = {"id", "ts", "ts_iso", "server", "channel", "nick", "message", "type"}
+        cols = []
+        for col, direction in order_by or []:
+            col = str(col)
+            direction = str(direction).upper()
+            if col in valid_cols and direction in ("ASC", "DESC") and col not in (c for c, _ in cols):
+                cols.append((col, direction))
+        if not cols:
+            cols = [("ts", "DESC")]
+        # id départage les égalités: l'ordre est total, donc paginable par clé
+        if not any(c == "id" for c, _ in cols):
+            cols.append(("id", cols[0][1]))
+        return cols
+
+    @classmethod
+    def _keyset_expr(cls, col: str) -> str:
+        return col if col in cls._KEYSET_NOT_NULL else f"IFNULL({col}, '')"
+
+    @classmethod
+    def keyset_key(cls, row, order_by: list | None) -> list:
+        # Valeurs de tri d'une ligne, à passer en after=/before= de search_keyset
+        return [row[c] if c in cls._KEYSET_NOT_NULL else (row[c] or "") for c, _ in cls._keyset_order(order_by)]
+
+    @metrics.timed(QUERY_SECONDS, "search_keyset")
+    def search_keyset(self, filters: dict, order_by: list | None = None, limit: int = 100,
+                      after: list | None = None, before: list | None = None, offset: int = 0):
+        """Pagination par clé (keyset): lignes qui suivent `after` ou précèdent `before`.
+
+        L'ordre est celui de order_by complété par id; les NULL sont traités comme ''.
+        Sans clé, `offset` permet de se positionner (saut direct dans la liste).
+        Les lignes sont toujours renvoyées dans l'ordre d'affichage.
+        """
+        cols = self._keyset_order(order_by)
+        where_sql, params = self._where(filters)
+        conds = [where_sql[len("WHERE "):]] if where_sql else []
+        key = after if after is not None else before
+        reverse = after is None and before is not None
+        if key is not None:
+            ors = []
+            for k, (col, direction) in enumerate(cols):
+                parts = []
+                for j in range(k):
+                    parts.append(f"{self._keyset_expr(cols[j][0])} = ?")
+                    params.append(key[j])
+                forward = (direction == "ASC") != reverse
+                parts.append(f"{self._keyset_expr(col)} {'>' if forward else '<'} ?")
+                params.append(key[k])
+                ors.append("(" + " AND ".join(parts) + ")")
+            conds.append("(" + " OR ".join(ors) + ")")
+        flip = {"ASC": "DESC", "DESC": "ASC"}
+        order_sql = ", ".join(
+            f"{self._keyset_expr(col)} {flip[direction] if reverse else direction}" for col, direction in cols
+        )
+        sql = f"""
+            SELECT id, ts_iso, server, channel, nick, message, type, ts
+            FROM releases
+            {("WHERE " + " AND ".join(conds)) if conds else ""}
+            ORDER BY {order_sql}
+            LIMIT ? OFFSET ?
+        """
+        params.extend([limit, max(int(offset), 0)])
+        with self.lock:
+            rows = self._execute("search_keyset", sql, params)
+        if reverse:
+            rows.reverse()
+        return rows
+
+    @metrics.timed(QUERY_SECONDS, "max_id")
+    def max_id(self) -> int:
+        with self.lock:
+            row = self._execute("max_id", "SELECT MAX(id) FROM releases", fetch="one")
+        return int(row[0]) if row and row[0] is not None else 0
+
+    @metrics.timed(QUERY_SECONDS, "search_since")
+    def search_since(self, filters: dict, last_id: int, limit: int = 500):
+        # Nouvelles lignes (id > last_id) correspondant aux filtres, plus récentes d'abord.
+        # Parcours par plage de clé primaire: ne lit que les lignes nouvelles.
+        where_sql, params = self._where(filters)
+        where_sql = (where_sql + " AND " if where_sql else "WHERE ") + "id > ?"
+        params.append(int(last_id))
+        sql = f"""
+            SELECT id, ts_iso, server, channel, nick, message, type, ts
+            FROM releases
+            {where_sql}
+            ORDER BY id DESC
+            LIMIT ?
+        """
+        params.append(int(limit))
+        with self.lock:
+            return self._execute("search_since", sql, params)
+
+    @metrics.timed(QUERY_SECONDS, "count_bounded")
+    def count_bounded(self, filters: dict, bound: int) -> int:
+        # COUNT(*) qui s'arrête après `bound` lignes: coût borné même pour un filtre large
+        where_sql, params = self._where(filters)
+        sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM releases {where_sql} LIMIT ?)"
+        with self.lock:
+            row = self._execute("count_bounded", sql, params + [int(bound)], fetch="one")
+        return int(row[0]) if row else 0
+
+    @metrics.timed(QUERY_SECONDS, "search_page")
+    def search_page(self, filters: dict, limit: int = 500, offset: int = 0, order_by: list | None = None,
+                    count_mode: str = "exact", count_cap: int = 1000) -> dict:
+        """Page de résultats et total en un seul appel.
+
+        count_mode="exact" fait un COUNT(*) complet si nécessaire; "estimate" se limite
+        à max(count_cap, offset + 2 * limit) lignes et renvoie alors total_exact=False
+        (à afficher "N+"). Aucun comptage n'est fait quand la page est incomplète:
+        le total se déduit alors de offset + len(rows).
+        """
+        rows = self.search(filters, limit=limit, offset=offset, order_by=order_by)
+        if limit > 0 and ((rows and len(rows) < limit) or (not rows and offset == 0)):
+            return {"rows": rows, "total": offset + len(rows), "total_exact": True}
+        if count_mode == "estimate":
+            bound = max(int(count_cap), offset + 2 * limit)
+            total = self.count_bounded(filters, bound)
+            return {"rows": rows, "total": total, "total_exact": total < bound}
+        return {"rows": rows, "total": self.count(filters), "total_exact": True}
+
+    @metrics.timed(QUERY_SECONDS, "add")
+    def add(self, data: dict):
+        ts_iso = data.get("ts_iso")
+        ts = data.get("ts")
+        if not ts_iso and not ts:
+            now = datetime.now()
+            ts_iso = now.strftime("%Y-%m-%d %H:%M:%S")
+            ts = int(now.timestamp())
+        elif ts_iso and not ts:
+            ts = int(datetime.strptime(ts_iso, "%Y-%m-%d %H:%M:%S").timestamp())
+        elif ts and not ts_iso:
+            ts_iso = datetime.fromtimestamp(int(ts)).strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.lock:
+            self._execute(
+                "add",
+                """
+                INSERT INTO releases (ts, ts_iso, server, channel, nick, message, type)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    ts,
+                    ts_iso,
+                    data.get("server", ""),
+                    data.get("channel", ""),
+                    data.get("nick", ""),
+                    data.get("message", ""),
+                    data.get("type", ""),
+                ),
+                fetch=None,
+            )
+            self.conn.commit()
+            self._writes += 1
+
+    @metrics.timed(QUERY_SECONDS, "update")
+    def update(self, row_id: int, data: dict):
+        # Recalcule ts/ts_iso si l'un des deux est modifié
+        ts_iso = data.get("ts_iso")
+        ts = data.get("ts")
+        if ts_iso and not ts:
+            ts = int(datetime.strptime(ts_iso, "%Y-%m-%d %H:%M:%S").timestamp())
+        elif ts and not ts_iso:
+            ts_iso = datetime.fromtimestamp(int(ts)).strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.lock:
+            self._execute(
+                "update",
+                """
+                UPDATE releases
+                SET ts = ?, ts_iso = ?, server = ?, channel = ?, nick = ?, message = ?, type = ?
+                WHERE id = ?
+                """,
+                (
+                    ts,
+                    ts_iso,
+                    data.get("server", ""),
+                    data.get("channel", ""),
+                    data.get("nick", ""),
+                    data.get("message", ""),
+                    data.get("type", ""),
+                    row_id,
+                ),
+                fetch=None,
+            )
+            self.conn.commit()
+            self._writes += 1
+
+    @metrics.timed(QUERY_SECONDS, "get_many")
+    def get_many(self, ids):
+        if not ids:
+            return []
+        qmarks = ",".join(["?"] * len(ids))
+        with self.lock:
+            return self._execute("get_many", f"SELECT * FROM releases WHERE id IN ({qmarks}) ORDER BY id", list(ids))
+
+    @metrics.timed(QUERY_SECONDS, "delete_many")
+    def delete_many(self, ids):
+        if not ids:
+            return
+        qmarks = ",".join(["?"] * len(ids))
+        with self.lock:
+            self._execute("delete_many", f"DELETE FROM releases WHERE id IN ({qmarks})", list(ids), fetch=None)
+            self.conn.commit()
+            self._writes += 1
+
+
+def _estimate_size(obj) -> int:
+    # Estimation grossière de l'empreinte mémoire d'un résultat mis en cache
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj) + 48
+    if isinstance(obj, dict):
+        return 64 + sum(_estimate_size(k) + _estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, sqlite3.Row)):
+        return 56 + sum(_estimate_size(v) for v in obj)
+    return 32
+
+
+class QueryCache:
+    """Cache LRU de résultats de requêtes, invalidé par la génération de la base.
+
+    Chaque lecture fournit le jeton courant de ReleasesDB.generation(); si celui-ci
+    a changé depuis le dernier appel, tout le cache est vidé. La taille est bornée
+    en nombre d'entrées et en octets (estimés).
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (valeur, taille)
+        self._bytes = 0
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def get(self, generation, key):
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, generation, key, value, size: int | None = None):
+        if size is None:
+            size = _estimate_size(value)
+        with self._lock:
+            # Résultat calculé sur une génération périmée: ne pas le garder
+            if generation != self._generation or size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, generation, key, compute, size=None):
+        value = self.get(generation, key)
+        if value is None:
+            value = compute()
+            self.put(generation, key, value, size(value) if callable(size) else None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class QueryWorker:
+    """Exécute les requêtes de la GUI hors du thread Tk.
+
+    Une seule requête est « courante »: en soumettre une nouvelle remplace celle en
+    attente et interrompt celle en cours (sqlite3 interrupt sur la connexion dédiée
+    du worker). Les résultats non périmés sont déposés dans `results`, que le thread
+    Tk relève avec after().
+    """
+
+    def __init__(self, db_path: str):
+        # Connexion de lecture dédiée: interrompre une requête ne gêne pas la GUI
+        self.db = ReleasesDB(db_path)
+        self.results = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = None
+        # Tâche de fond facultative (préchargement), exécutée seulement au repos
+        self._prefetch = None
+        self._running = False
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn) -> int:
+        # fn(db) est exécuté dans le worker; retourne le numéro de la requête
+        with self._cond:
+            self._seq += 1
+            self._pending = (self._seq, fn)
+            if self._running:
+                self.db.conn.interrupt()
+            self._cond.notify()
+            return self._seq
+
+    def cancel(self) -> int:
+        # Abandonne la requête en attente/en cours; retourne un nouveau numéro courant
+        with self._cond:
+            self._seq += 1
+            self._pending = None
+            if self._running:
+                self.db.conn.interrupt()
+            return self._seq
+
+    def prefetch(self, fn):
+        # fn(db) basse priorité: remplacé par le prochain préchargement, interrompu
+        # par toute requête soumise; son résultat n'est pas publié dans `results`.
+        with self._cond:
+            self._prefetch = fn
+            self._cond.notify()
+
+    def is_current(self, seq: int) -> bool:
+        with self._cond:
+            return seq == self._seq
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._prefetch is None:
+                    self._cond.wait()
+                if self._pending is not None:
+                    seq, fn = self._pending
+                    self._pending = None
+                else:
+                    # Préchargement: seq None, résultat jamais publié
+                    seq, fn = None, self._prefetch
+                    self._prefetch = None
+                self._running = True
+            try:
+                result, error = fn(self.db), None
+            except Exception as e:
+                result, error = None, e
+            with self._cond:
+                self._running = False
+                superseded = seq != self._seq
+            # Requête remplacée entre-temps (ou interrompue): résultat ignoré
+            if seq is not None and not superseded:
+                self.results.put((seq, result, error))
@@ -3,76 +3,284 @@ import io
 import csv
 import os
 import threading
-import re
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from urllib.parse import urlparse, parse_qs, quote
-import urllib.request
-import urllib.error
+import hashlib
+import gzip
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 
-# Importer la DB depuis l’interface existante
-from irc_db_gui import ReleasesDB, DB_PATH
+# Couche DB sans Tk: le serveur peut tourner sans interface graphique
+from releases_db import ReleasesDB, DB_PATH, QueryCache, SLOW_QUERIES
+import ftp_export
+import nfo_cache
+import irc_ipc
+import event_bus
+import ingest_trace
+import metrics
+import profiling
 
 
-def _json_response(handler: BaseHTTPRequestHandler, obj, status=200):
-    data = json.dumps(obj).encode("utf-8")
+FILTER_KEYS = ("server", "channel", "nick", "type", "query", "date_from", "date_to")
+SORT_COLUMNS = ("id", "ts", "ts_iso", "server", "channel", "nick", "message", "type")
+
+
+def _parse_filters(q: dict) -> dict:
+    return {key: (q.get(key, [""])[0] or "").strip() for key in FILTER_KEYS}
+
+
+def _parse_sort(q: dict) -> list:
+    sort_param = q.get("sort", [""])[0]
+    sort_state = []
+    if sort_param:
+        for part in sort_param.split(","):
+            if ":" in part:
+                col, direction = part.split(":", 1)
+                col = col.strip()
+                direction = direction.strip().upper()
+                if direction not in ("ASC", "DESC"):
+                    direction = "DESC"
+                # sécurité colonnes tri
+                if col in SORT_COLUMNS:
+                    # préférer tri par ts si ts_iso demandé
+                    sort_state.append((("ts" if col == "ts_iso" else col), direction))
+    return sort_state
+
+
+RELEASE_COLUMNS = ("id", "ts_iso", "server", "channel", "nick", "message", "type")
+# Colonnes à forte répétition, encodées par dictionnaire en format "columns"
+DICT_COLUMNS = ("server", "channel", "nick", "type")
+
+
+def _release_dicts(rows) -> list:
+    return [{col: r[col] for col in RELEASE_COLUMNS} for r in rows]
+
+
+def _release_columns(rows) -> dict:
+    """Format compact: en-têtes + lignes en tableaux, valeurs répétitives indexées.
+
+    {"format": "columns", "columns": [...], "dicts": {"type": [...], ...}, "rows": [[...], ...]}
+    Pour une colonne présente dans "dicts", la cellule est l'indice de la valeur.
+    """
+    dicts = {col: [] for col in DICT_COLUMNS}
+    indexes = {col: {} for col in DICT_COLUMNS}
+    positions = [(i, indexes.get(col), dicts.get(col)) for i, col in enumerate(RELEASE_COLUMNS)]
+    out = []
+    for r in rows:
+        row = [r[col] for col in RELEASE_COLUMNS]
+        for i, index, values in positions:
+            if index is not None:
+                v = row[i]
+                idx = index.get(v)
+                if idx is None:
+                    idx = index[v] = len(values)
+                    values.append(v)
+                row[i] = idx
+        out.append(row)
+    return {"format": "columns", "columns": list(RELEASE_COLUMNS), "dicts": dicts, "rows": out}
+
+
+RELEASE_FORMATS = {"": _release_dicts, "columns": _release_columns}
+
+
+def _query_key(endpoint: str, filters: dict, sort_state: list | None = None, *extra) -> tuple:
+    # Clé normalisée: filtres vides ignorés, ordre des paramètres indifférent
+    return (
+        endpoint,
+        tuple(sorted((k, v) for k, v in filters.items() if v)),
+        tuple(sort_state or ()),
+    ) + tuple(extra)
+
+
+# Identifiant de démarrage: les ETags ne survivent pas à un redémarrage du serveur
+_BOOT_ID = f"{os.getpid():x}.{time.time_ns():x}"
+
+# Politiques Cache-Control par endpoint; les réponses dérivées de la base sont
+# revalidées à chaque fois (ETag + 304), le reste n'est jamais mis en cache.
+CACHE_POLICIES = {
+    "/": "no-cache",
+    "/api/releases": "no-cache",
+    "/api/count": "no-cache",
+    "/api/page": "no-cache",
+    "/api/filters": "private, max-age=30",
+    "/api/export.csv": "no-cache",
+}
+DEFAULT_CACHE_POLICY = "no-store"
+
+# Compression négociée (Accept-Encoding) des réponses au-delà d'un seuil
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+COMPRESS_MIN_BYTES = int(os.environ.get("WEB_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = 6
+
+# Connexions persistantes HTTP/1.1
+KEEPALIVE_TIMEOUT = float(os.environ.get("WEB_KEEPALIVE_TIMEOUT", "15"))
+KEEPALIVE_MAX_REQUESTS = int(os.environ.get("WEB_KEEPALIVE_MAX_REQUESTS", "100"))
+
+# Flux d'événements (Server-Sent Events, /api/events)
+SSE_MAX_CLIENTS = int(os.environ.get("WEB_SSE_MAX_CLIENTS", "32"))
+SSE_HEARTBEAT = 15.0
+SSE_QUEUE_SIZE = 500
+SSE_DEFAULT_TOPICS = (event_bus.RELEASE_LOGGED, event_bus.STATUS_CHANGED)
+# Lignes de irc_log.txt gardées en mémoire pour /api/irc/logs
+LOG_TAIL_LINES = 5000
+
+# Métriques HTTP (/metrics); les chemins inconnus sont regroupés sous "other"
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "Durée de traitement des requêtes HTTP", ("endpoint",))
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requêtes HTTP, par endpoint et code", ("endpoint", "code"))
+METRIC_ENDPOINTS = frozenset((
+    "/", "/api/releases", "/api/count", "/api/page", "/api/filters", "/api/cache/stats", "/api/export.csv",
+    "/api/export/winscp.txt", "/api/export/crossftp.txt", "/api/irc/status", "/api/irc/connect",
+    "/api/irc/disconnect", "/api/irc/logs", "/api/irc/nfo", "/api/nfo", "/api/events", "/api/events/stats",
+    "/api/debug/slow", "/api/debug/ingest", "/api/debug/profile", "/api/debug/profile/cpu", "/api/debug/profile/memory", "/metrics",
+))
+
+
+def _cache_policy(handler: BaseHTTPRequestHandler) -> str:
+    path = urlparse(getattr(handler, "path", "") or "").path
+    return CACHE_POLICIES.get(path, DEFAULT_CACHE_POLICY)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # Comparaison faible (RFC 9110): le préfixe W/ est ignoré
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == wanted:
+            return True
+    return False
+
+
+def _negotiate_encoding(accept_encoding: str | None) -> str | None:
+    # Choisit gzip puis deflate selon Accept-Encoding (q=0 exclut le codage)
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0: sortie déterministe, donc réutilisable en cache
+        return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if encoding == "deflate":
+        # "deflate" en HTTP désigne le format zlib (RFC 1950)
+        return zlib.compress(data, COMPRESS_LEVEL)
+    return data
+
+
+def _send_body(handler: BaseHTTPRequestHandler, data: bytes, content_type: str, status=200,
+               etag: str | None = None, headers: dict | None = None, compressed=None):
+    """Envoie un corps complet, compressé si le client l'accepte et s'il est assez gros.
+
+    `compressed(encoding)` permet de fournir une version déjà compressée (cache).
+    """
+    encoding = None
+    if len(data) >= COMPRESS_MIN_BYTES:
+        encoding = _negotiate_encoding(handler.headers.get("Accept-Encoding"))
+    if encoding:
+        data = compressed(encoding) if compressed else _compress(data, encoding)
     handler.send_response(status)
-    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Content-Type", content_type)
+    if encoding:
+        handler.send_header("Content-Encoding", encoding)
+    handler.send_header("Vary", "Accept-Encoding")
     handler.send_header("Content-Length", str(len(data)))
+    handler.send_header("Cache-Control", _cache_policy(handler))
+    if etag:
+        handler.send_header("ETag", etag)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
     handler.end_headers()
     handler.wfile.write(data)
 
 
+def _json_response(handler: BaseHTTPRequestHandler, obj, status=200):
+    _json_bytes_response(handler, json.dumps(obj).encode("utf-8"), status=status)
+
+
+def _json_bytes_response(handler: BaseHTTPRequestHandler, data: bytes, status=200, etag: str | None = None,
+                         compressed=None):
+    _send_body(handler, data, "application/json; charset=utf-8", status=status, etag=etag, compressed=compressed)
+
+
 def _html_response(handler: BaseHTTPRequestHandler, html: str, status=200):
-    data = html.encode("utf-8")
-    handler.send_response(status)
-    handler.send_header("Content-Type", "text/html; charset=utf-8")
-    handler.send_header("Content-Length", str(len(data)))
-    handler.end_headers()
-    handler.wfile.write(data)
+    _send_body(handler, html.encode("utf-8"), "text/html; charset=utf-8", status=status)
 
 
-class AppContext:
-    def __init__(self, db_path: str, irc_logger=None):
-        self.db = ReleasesDB(db_path)
-        self.irc = irc_logger
+def _sse_frame(event: "event_bus.Event") -> bytes:
+    data = json.dumps(dict(event.data, ts=event.ts), separators=(",", ":"))
+    return f"id: {event.seq}\nevent: {event.topic}\ndata: {data}\n\n".encode("utf-8")
 
 
-class RequestHandler(BaseHTTPRequestHandler):
-    # Contexte partagé (injecté par serveur)
-    context: AppContext = None
+class ChunkedWriter:
+    """Corps HTTP/1.1 en Transfer-Encoding: chunked, éventuellement compressé au fil de l'eau."""
 
-    def log_message(self, format, *args):
-        # Rendre le serveur plus silencieux
-        return
+    def __init__(self, wfile, encoding: str | None = None, buffer_size: int = 64 * 1024):
+        self.wfile = wfile
+        self.buffer_size = buffer_size
+        self._buf = bytearray()
+        self._compressor = None
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._compressor = zlib.compressobj(COMPRESS_LEVEL)
 
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        if parsed.path == "/":
-            return self._serve_index()
-        if parsed.path == "/api/releases":
-            return self._api_releases(parsed)
-        if parsed.path == "/api/count":
-            return self._api_count(parsed)
-        if parsed.path == "/api/filters":
-            return self._api_filters(parsed)
-        if parsed.path == "/api/export.csv":
-            return self._api_export_csv(parsed)
-        if parsed.path == "/api/irc/status":
-            return self._api_irc_status()
-        if parsed.path == "/api/irc/connect":
-            return self._api_irc_connect()
-        if parsed.path == "/api/irc/disconnect":
-            return self._api_irc_disconnect()
-        if parsed.path == "/api/irc/logs":
-            return self._api_irc_logs(parsed)
-        if parsed.path == "/api/irc/nfo":
-            return self._api_irc_nfo(parsed)
+    def _send_chunk(self, data: bytes):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
 
-        _html_response(self, "<h1>404 Not Found</h1>", status=404)
+    def write(self, data: bytes):
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._buf += data
+        if len(self._buf) >= self.buffer_size:
+            self._send_chunk(bytes(self._buf))
+            self._buf.clear()
 
-    def _serve_index(self):
-        html = """
+    def close(self):
+        if self._compressor is not None:
+            self._buf += self._compressor.flush()
+        self._send_chunk(bytes(self._buf))
+        self._buf.clear()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class PrebuiltPage:
+    """Page statique encodée et compressée une seule fois, avec ETag fort par variante."""
+
+    def __init__(self, text: str, content_type: str):
+        self.content_type = content_type
+        raw = text.encode("utf-8")
+        digest = hashlib.sha1(raw).hexdigest()[:24]
+        self.bodies = {None: raw}
+        self.etags = {None: f'"{digest}"'}
+        for encoding in SUPPORTED_ENCODINGS:
+            self.bodies[encoding] = _compress(raw, encoding)
+            self.etags[encoding] = f'"{digest}-{encoding}"'
+
+
+INDEX_HTML = """
 <!doctype html>
 <html lang=\"fr\">
 <head>
@@ -186,6 +394,7 @@ class RequestHandler(BaseHTTPRequestHandler):
         <button id=\"btnTheme\" class=\"btn secondary\" title=\"Basculer le thème\">Mode sombre</button>
         <span id=\"ircStatus\" title=\"État IRC\">IRC: (inconnu)</span>
         <span id=\"count\"></span>
+        <button id=\"btnNewReleases\" class=\"btn secondary\" style=\"display:none\" title=\"Recharger la première page\"></button>
       </div>
     </header>
 
@@ -245,6 +454,7 @@ class RequestHandler(BaseHTTPRequestHandler):
     const btnIrcConnect = document.getElementById('btnIrcConnect');
     const btnIrcDisconnect = document.getElementById('btnIrcDisconnect');
     const ircStatus = document.getElementById('ircStatus');
+    const btnNewReleases = document.getElementById('btnNewReleases');
     const btnShowLogs = document.getElementById('btnShowLogs');
     const logsTail = document.getElementById('logsTail');
     const ircLogs = document.getElementById('ircLogs');
@@ -312,19 +522,19 @@ class RequestHandler(BaseHTTPRequestHandler):
         date_from: f.date_from,
         date_to: f.date_to,
         sort: sortParam,
+        format: 'columns',
+        total: 'estimate',
       });
       status.textContent = 'Chargement...';
       try {
-        const [listRes, countRes] = await Promise.all([
-          fetch('/api/releases?' + params.toString()),
-          fetch('/api/count?' + params.toString())
-        ]);
-        if (!listRes.ok || !countRes.ok) {
-          throw new Error(`API HTTP ${listRes.status}/${countRes.status}`);
+        // Page et total en une seule requête (total borné: affiché "N+")
+        const res = await fetch('/api/page?' + params.toString());
+        if (!res.ok) {
+          throw new Error(`API HTTP ${res.status}`);
         }
-        const list = await listRes.json();
-        const cnt = await countRes.json();
-        countEl.textContent = `Total: ${cnt.count}`;
+        const data = await res.json();
+        const list = decodeReleases(data.items);
+        countEl.textContent = `Total: ${data.total}${data.total_exact ? '' : '+'}`;
         status.textContent = `OK (${list.length} lignes)`;
         render(list);
       } catch (e) {
@@ -342,7 +552,13 @@ class RequestHandler(BaseHTTPRequestHandler):
         if (data.available === false) {
           ircStatus.textContent = 'IRC: indisponible';
         } else if (data.connected === true) {
-          ircStatus.textContent = 'IRC: connecté';
+          const live = data.liveness;
+          if (live && live.state !== 'ok') {
+            ircStatus.textContent = live.state === 'stalled' ? 'IRC: bloqué' : 'IRC: sans réponse';
+          } else {
+            ircStatus.textContent = live && live.ping_rtt_ms != null ? `IRC: connecté (${Math.round(live.ping_rtt_ms)} ms)` : 'IRC: connecté';
+          }
+          ircStatus.title = live ? `Dernier message il y a ${live.last_message_age} s, retard boucle ${live.reactor_lag} s` : 'État IRC';
         } else {
           ircStatus.textContent = 'IRC: non connecté';
         }
@@ -352,6 +568,31 @@ class RequestHandler(BaseHTTPRequestHandler):
       }
     }
 
+    // Événements poussés par le serveur (/api/events): état IRC immédiat et
+    // compteur de nouvelles releases; le sondage du statut reste en secours.
+    let newReleases = 0;
+    function showNewReleases() {
+      btnNewReleases.style.display = newReleases ? '' : 'none';
+      btnNewReleases.textContent = `${newReleases} nouvelle(s) release(s)`;
+    }
+    function listenEvents() {
+      if (!window.EventSource) return;
+      const es = new EventSource('/api/events?topics=status-changed,release-logged');
+      es.addEventListener('status-changed', (e) => {
+        const data = JSON.parse(e.data);
+        ircStatus.textContent = data.connected ? 'IRC: connecté' : 'IRC: non connecté';
+      });
+      es.addEventListener('release-logged', () => {
+        newReleases += 1;
+        showNewReleases();
+      });
+    }
+    btnNewReleases.addEventListener('click', () => {
+      newReleases = 0;
+      showNewReleases();
+      load(1);
+    });
+
     function render(rows) {
       tbody.innerHTML = '';
       for (const r of rows) {
@@ -390,7 +631,7 @@ class RequestHandler(BaseHTTPRequestHandler):
             try {
               const res = await fetch(url);
               const data = await res.json();
-              if (res.ok && data.ok && data.sent) {
+              if (res.ok && data.ok && (data.sent || data.cached)) {
                 if (data.url) {
                   showToast('URL détectée: ' + String(data.url), 'info');
                   window.open(String(data.url), '_blank', 'noopener');
@@ -411,6 +652,21 @@ class RequestHandler(BaseHTTPRequestHandler):
       }
     }
 
+    // Décode le format compact (format=columns) en liste d'objets
+    function decodeReleases(data) {
+      if (Array.isArray(data)) return data;
+      const cols = data.columns || [];
+      const dicts = data.dicts || {};
+      const lookups = cols.map(c => dicts[c] || null);
+      return (data.rows || []).map(row => {
+        const o = {};
+        for (let i = 0; i < cols.length; i++) {
+          o[cols[i]] = lookups[i] ? lookups[i][row[i]] : row[i];
+        }
+        return o;
+      });
+    }
+
     function escapeHtml(s) {
       return String(s).replace(/[&<>"]/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c]));
     }
@@ -578,136 +834,497 @@ class RequestHandler(BaseHTTPRequestHandler):
       load(1);
       updateSortIndicators();
       refreshIrcStatus();
-      setInterval(refreshIrcStatus, 5000);
+      listenEvents();
+      setInterval(refreshIrcStatus, 15000);
     })();
   </script>
 </div>
 </body>
 </html>
 """
-        _html_response(self, html)
+
+
+class IrcLogTail:
+    """Fin de irc_log.txt en mémoire: lue une fois sur disque, puis complétée par le bus (IRC_LINE)."""
+
+    def __init__(self, bus, log_path: str, max_lines: int = LOG_TAIL_LINES):
+        self.log_path = log_path
+        self.lines = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._seeded = False
+        # Abonné sans thread: les lignes attendent dans la file jusqu'à la prochaine lecture
+        self._sub = bus.subscribe(event_bus.IRC_LINE, maxsize=max_lines, name="web-logs")
+
+    def tail(self, n: int) -> list[str]:
+        with self._lock:
+            events = self._sub.drain()
+            if not self._seeded:
+                self._seeded = True
+                try:
+                    with open(self.log_path, "r", encoding="utf-8", errors="ignore") as f:
+                        self.lines.extend(line.rstrip("\n") for line in f)
+                except OSError:
+                    pass
+                # Lignes publiées avant la lecture du fichier: déjà dedans
+                recent = set(list(self.lines)[-len(events):]) if events else set()
+                events = [e for e in events if e.data.get("line") not in recent]
+            self.lines.extend(e.data.get("line") or "" for e in events)
+            return list(self.lines)[-n:] if n else []
+
+
+class AppContext:
+    def __init__(self, db_path: str, irc_logger=None):
+        self.db = ReleasesDB(db_path)
+        self.irc = irc_logger
+        # Bus du logger (même processus, ou republié par RemoteIrcLogger); sans
+        # logger, bus du processus, vide: logs et NFO se rabattent sur irc_log.txt
+        logger_bus = getattr(irc_logger, "bus", None)
+        self.bus = logger_bus or event_bus.BUS
+        self.log_tail = IrcLogTail(logger_bus, nfo_cache.LOG_PATH) if logger_bus is not None else None
+        self._sse_clients = 0
+        self._sse_lock = threading.Lock()
+        self._subscriptions = []
+        # Cache des réponses JSON encodées, invalidé à chaque écriture en base
+        self.cache = QueryCache(
+            max_entries=int(os.environ.get("WEB_CACHE_ENTRIES", "256")),
+            max_bytes=int(os.environ.get("WEB_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        )
+        # Page d'accueil construite une fois au démarrage (brute + gzip + deflate)
+        self.index_page = PrebuiltPage(INDEX_HTML, "text/html; charset=utf-8")
+        # Cache NFO (table nfo, dans sa propre base: voir nfo_cache.NFO_DB_PATH);
+        # préchargement et téléchargement du texte optionnels
+        store = nfo_cache.NfoStore(nfo_cache.nfo_db_path(db_path), legacy_path=db_path)
+        downloader = None
+        if os.environ.get("NFO_DOWNLOAD") == "1":
+            downloader = nfo_cache.NfoDownloader(store, max_workers=int(os.environ.get("NFO_DOWNLOAD_WORKERS", "2")))
+        self.nfo = nfo_cache.NfoResolver(store, irc=irc_logger, downloader=downloader, bus=logger_bus)
+        if os.environ.get("NFO_PREFETCH") == "1" and logger_bus is not None:
+            self._subscriptions.append(logger_bus.subscribe(
+                event_bus.RELEASE_LOGGED, maxsize=200, policy=event_bus.DROP_NEWEST,
+                name="nfo-prefetch", callback=self.nfo.on_release))
+        # Latence d'ingestion: première livraison (SSE ou API) de chaque release
+        self.ingest = ingest_trace.DeliveryTracker()
+        if logger_bus is not None:
+            self._subscriptions.append(logger_bus.subscribe(
+                event_bus.RELEASE_LOGGED, maxsize=1000, name="ingest-trace",
+                callback=self.ingest.on_release))
+        # Lus seulement quand /metrics est demandé; retirés par close() pour qu'un
+        # contexte arrêté ne soit plus référencé par le registre du processus
+        self._collector = metrics.REGISTRY.add_collector(
+            lambda: metrics.bus_families(self.bus) + metrics.cache_families({"web": self.cache}))
+        self._gauges = []
+        for name, help, fn in (
+            ("nfo_prefetch_pending", "!nfo de préchargement en attente", self.nfo.pending),
+            ("nfo_downloads_inflight", "Téléchargements de NFO en cours ou en file",
+             downloader.inflight if downloader is not None else (lambda: 0)),
+            ("http_sse_clients", "Flux /api/events ouverts", lambda: self._sse_clients),
+        ):
+            self._gauges.append((metrics.gauge(name, help, function=fn), fn))
+
+    def close(self):
+        metrics.REGISTRY.remove_collector(self._collector)
+        for gauge, fn in self._gauges:
+            gauge.clear_function(fn)
+        for sub in self._subscriptions:
+            sub.close()
+        self._subscriptions = []
+
+    def metrics_text(self) -> str:
+        families = metrics.REGISTRY.collect()
+        remote = getattr(self.irc, "metrics_families", None)
+        if callable(remote):
+            # Logger dans un autre processus (--web-process): ses séries portent process="logger"
+            try:
+                families = metrics.merge(families, remote(), label="process", values=("web", "logger"))
+            except Exception:
+                pass
+        return metrics.render(families)
+
+    def sse_slot(self, delta: int) -> bool:
+        # Nombre de flux /api/events ouverts (un thread chacun), borné
+        with self._sse_lock:
+            if delta > 0 and self._sse_clients >= SSE_MAX_CLIENTS:
+                return False
+            self._sse_clients += delta
+            return True
+
+    def cached_json(self, key: tuple, compute, generation=None, compact: bool = False) -> bytes:
+        # Le résultat est stocké déjà sérialisé: la taille mémoire est exacte
+        if generation is None:
+            generation = self.db.generation()
+        separators = (",", ":") if compact else None
+        return self.cache.get_or_compute(
+            generation, key, lambda: json.dumps(compute(), separators=separators).encode("utf-8"), size=len
+        )
+
+    def etag(self, key: tuple, generation) -> str:
+        digest = hashlib.sha1(repr((_BOOT_ID, generation, key)).encode("utf-8")).hexdigest()
+        return f'W/"{digest[:24]}"'
+
+    def compressed_json(self, key: tuple, generation, data: bytes):
+        # Fabrique pour _send_body: la version compressée est aussi gardée en cache
+        def compress(encoding):
+            return self.cache.get_or_compute(
+                generation, key + (encoding,), lambda: _compress(data, encoding), size=len
+            )
+        return compress
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Contexte partagé (injecté par serveur)
+    context: AppContext = None
+    # HTTP/1.1: connexions persistantes; toute réponse doit avoir Content-Length ou être chunked
+    protocol_version = "HTTP/1.1"
+    # Délai d'inactivité (socket) avant fermeture d'une connexion persistante
+    timeout = KEEPALIVE_TIMEOUT
+    max_requests_per_connection = KEEPALIVE_MAX_REQUESTS
+    # En-têtes et corps partent en deux écritures: sans TCP_NODELAY, Nagle + ACK
+    # retardé ajoutent ~40 ms aux petites réponses sur une connexion persistante
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # Rendre le serveur plus silencieux
+        return
+
+    def handle(self):
+        self._requests_served = 0
+        super().handle()
+
+    def handle_one_request(self):
+        self._requests_served += 1
+        super().handle_one_request()
+
+    def end_headers(self):
+        # Annonce la politique keep-alive; ferme après le quota de requêtes
+        if self.request_version == "HTTP/1.1" and not self.close_connection:
+            if self._requests_served >= self.max_requests_per_connection:
+                self.send_header("Connection", "close")
+            else:
+                remaining = self.max_requests_per_connection - self._requests_served
+                self.send_header("Keep-Alive", f"timeout={int(self.timeout)}, max={remaining}")
+        super().end_headers()
+
+    def _conditional(self, key: tuple):
+        """Calcule génération + ETag; répond 304 si le client a déjà cette version.
+
+        Retourne (generation, etag, not_modified). Aucune requête SQL sur la table
+        n'est faite ici: seul PRAGMA data_version est lu.
+        """
+        generation = self.context.db.generation()
+        etag = self.context.etag(key, generation)
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", _cache_policy(self))
+            # Mêmes en-têtes de variante que la réponse 200 (gzip/deflate ou brute)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return generation, etag, True
+        return generation, etag, False
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        endpoint = parsed.path if parsed.path in METRIC_ENDPOINTS else "other"
+        self._status = 0
+        t0 = time.perf_counter()
+        try:
+            return self._route(parsed)
+        finally:
+            # Un flux /api/events dure aussi longtemps que le client: compté, pas chronométré
+            if endpoint != "/api/events":
+                HTTP_SECONDS.labels(endpoint).observe(time.perf_counter() - t0)
+            HTTP_REQUESTS.labels(endpoint, self._status).inc()
+
+    def _route(self, parsed):
+        if parsed.path == "/":
+            return self._serve_index()
+        if parsed.path == "/api/releases":
+            return self._api_releases(parsed)
+        if parsed.path == "/api/count":
+            return self._api_count(parsed)
+        if parsed.path == "/api/page":
+            return self._api_page(parsed)
+        if parsed.path == "/api/filters":
+            return self._api_filters(parsed)
+        if parsed.path == "/api/cache/stats":
+            return _json_response(self, self.context.cache.stats())
+        if parsed.path == "/api/export.csv":
+            return self._api_export_csv(parsed)
+        if parsed.path in ("/api/export/winscp.txt", "/api/export/crossftp.txt"):
+            return self._api_export_ftp(parsed)
+        if parsed.path == "/api/irc/status":
+            return self._api_irc_status()
+        if parsed.path == "/api/irc/connect":
+            return self._api_irc_connect()
+        if parsed.path == "/api/irc/disconnect":
+            return self._api_irc_disconnect()
+        if parsed.path == "/api/irc/logs":
+            return self._api_irc_logs(parsed)
+        if parsed.path == "/api/irc/nfo":
+            return self._api_irc_nfo(parsed)
+        if parsed.path == "/api/nfo":
+            return self._api_nfo(parsed)
+        if parsed.path == "/api/events":
+            return self._api_events(parsed)
+        if parsed.path == "/api/events/stats":
+            return _json_response(self, self.context.bus.stats())
+        if parsed.path == "/api/debug/slow":
+            return self._api_debug_slow()
+        if parsed.path == "/api/debug/ingest":
+            return self._api_debug_ingest()
+        if parsed.path.startswith("/api/debug/profile"):
+            return self._api_debug_profile(parsed)
+        if parsed.path == "/metrics":
+            return _send_body(self, self.context.metrics_text().encode("utf-8"), metrics.CONTENT_TYPE)
+
+        _html_response(self, "<h1>404 Not Found</h1>", status=404)
+
+    def _api_debug_slow(self):
+        # Requêtes SQL de ce processus au-delà de DB_SLOW_QUERY_MS, avec leur plan
+        _json_response(self, {
+            "threshold_ms": SLOW_QUERIES.threshold_ms,
+            "total": SLOW_QUERIES.total,
+            "summary": SLOW_QUERIES.summary(),
+            "entries": SLOW_QUERIES.entries(),
+        })
+
+    def _api_debug_ingest(self):
+        # Percentiles récents par étape; avec --web-process, filtrage et commit
+        # sont mesurés dans le processus du logger
+        result = {"web": ingest_trace.summary()}
+        remote = getattr(self.context.irc, "ingest_summary", None)
+        if callable(remote):
+            try:
+                result["logger"] = remote()
+            except Exception as e:
+                result["logger"] = {"error": str(e)}
+        _json_response(self, result)
+
+    def _api_debug_profile(self, parsed):
+        # Profilage à la demande (profiling.py); target=logger vise le processus du
+        # logger quand le serveur tourne à part (--web-process)
+        if not self._is_local_client() and os.environ.get("WEB_DEBUG_REMOTE") != "1":
+            return _json_response(self, {"ok": False, "error": "Profilage réservé aux clients locaux"}, status=403)
+        q = parse_qs(parsed.query)
+        kind = parsed.path.rpartition("/")[2]
+        remote = getattr(self.context.irc, "profile", None)
+        if (q.get("target", ["web"])[0] or "web") == "logger":
+            if not callable(remote):
+                return _json_response(self, {"ok": False, "error": "Le logger tourne dans ce processus: target=web"},
+                                      status=400)
+            run = remote
+        else:
+            run = profiling.PROFILER.handle
+        try:
+            if kind == "cpu":
+                interval_ms = q.get("interval_ms", [""])[0]
+                result = run("cpu", seconds=float(q.get("seconds", [profiling.PROFILE_SECONDS])[0]),
+                             interval=float(interval_ms) / 1000 if interval_ms else None)
+            elif kind == "memory":
+                result = run("memory", action=q.get("action", ["snapshot"])[0])
+            else:
+                result = {"web": profiling.PROFILER.status()}
+                if callable(remote):
+                    result["logger"] = remote("status")
+        except ValueError as e:
+            return _json_response(self, {"ok": False, "error": str(e)}, status=400)
+        except Exception as e:
+            return _json_response(self, {"ok": False, "error": str(e)}, status=500)
+        _json_response(self, dict(result, ok=True))
+
+    def _serve_index(self):
+        page = self.context.index_page
+        encoding = _negotiate_encoding(self.headers.get("Accept-Encoding"))
+        etag = page.etags[encoding]
+        if any(_etag_matches(self.headers.get("If-None-Match"), tag) for tag in page.etags.values()):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", _cache_policy(self))
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        data = page.bodies[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", page.content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", _cache_policy(self))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
 
     def _api_releases(self, parsed):
         q = parse_qs(parsed.query)
         limit = int(q.get("limit", [1000])[0])
         page = int(q.get("page", [1])[0])
         offset = max(0, (page - 1) * limit)
+        # dates non gérées dans l’UI initiale, mais supportées côté DB si fournies
+        filters = _parse_filters(q)
+        sort_state = _parse_sort(q)
+        # format=columns: encodage compact opt-in; par défaut liste d'objets
+        fmt = (q.get("format", [""])[0] or "").strip().lower()
+        if fmt not in RELEASE_FORMATS:
+            return _json_response(self, {"ok": False, "error": f"Format inconnu: {fmt}"}, status=400)
+        encode = RELEASE_FORMATS[fmt]
 
-        filters = {
-            "server": q.get("server", [""])[0],
-            "channel": q.get("channel", [""])[0],
-            "nick": q.get("nick", [""])[0],
-            "type": q.get("type", [""])[0],
-            "query": q.get("query", [""])[0],
-            # dates non gérées dans l’UI initiale, mais supportées côté DB si fournies
-            "date_from": q.get("date_from", [""])[0],
-            "date_to": q.get("date_to", [""])[0],
-        }
+        def compute():
+            rows = self.context.db.search(filters, limit=limit, offset=offset, order_by=sort_state)
+            self.context.ingest.delivered_rows(rows)
+            return encode(rows)
+
+        key = _query_key("releases", filters, sort_state, limit, offset, fmt)
+        generation, etag, not_modified = self._conditional(key)
+        if not_modified:
+            return
+        data = self.context.cached_json(key, compute, generation, compact=bool(fmt))
+        _json_bytes_response(self, data, etag=etag, compressed=self.context.compressed_json(key, generation, data))
+
+    def _api_page(self, parsed):
+        # Page + total en une requête; total=estimate borne le comptage (affiché "N+")
+        q = parse_qs(parsed.query)
+        limit = int(q.get("limit", [1000])[0])
+        page = int(q.get("page", [1])[0])
+        offset = max(0, (page - 1) * limit)
+        filters = _parse_filters(q)
+        sort_state = _parse_sort(q)
+        fmt = (q.get("format", [""])[0] or "").strip().lower()
+        if fmt not in RELEASE_FORMATS:
+            return _json_response(self, {"ok": False, "error": f"Format inconnu: {fmt}"}, status=400)
+        count_mode = (q.get("total", ["exact"])[0] or "exact").strip().lower()
+        if count_mode not in ("exact", "estimate"):
+            count_mode = "exact"
+        count_cap = int(q.get("count_cap", [1000])[0])
+        encode = RELEASE_FORMATS[fmt]
+
+        def compute():
+            result = self.context.db.search_page(
+                filters, limit=limit, offset=offset, order_by=sort_state,
+                count_mode=count_mode, count_cap=count_cap,
+            )
+            self.context.ingest.delivered_rows(result["rows"])
+            return {
+                "page": page,
+                "limit": limit,
+                "total": result["total"],
+                "total_exact": result["total_exact"],
+                "items": encode(result["rows"]),
+            }
 
-        sort_param = q.get("sort", [""])[0]
-        sort_state = []
-        if sort_param:
-            for part in sort_param.split(","):
-                if ":" in part:
-                    col, direction = part.split(":", 1)
-                    col = col.strip()
-                    direction = direction.strip().upper()
-                    if direction not in ("ASC", "DESC"):
-                        direction = "DESC"
-                    # sécurité colonnes tri
-                    if col in ("id", "ts", "ts_iso", "server", "channel", "nick", "message", "type"):
-                        # préférer tri par ts si ts_iso demandé
-                        sort_state.append((("ts" if col == "ts_iso" else col), direction))
-
-        rows = self.context.db.search(filters, limit=limit, offset=offset, order_by=sort_state)
-        out = []
-        for r in rows:
-            out.append({
-                "id": r["id"],
-                "ts_iso": r["ts_iso"],
-                "server": r["server"],
-                "channel": r["channel"],
-                "nick": r["nick"],
-                "message": r["message"],
-                "type": r["type"],
-            })
-        _json_response(self, out)
+        key = _query_key("page", filters, sort_state, limit, offset, fmt, count_mode, count_cap)
+        generation, etag, not_modified = self._conditional(key)
+        if not_modified:
+            return
+        data = self.context.cached_json(key, compute, generation, compact=bool(fmt))
+        _json_bytes_response(self, data, etag=etag, compressed=self.context.compressed_json(key, generation, data))
 
     def _api_count(self, parsed):
         q = parse_qs(parsed.query)
-        filters = {
-            "server": q.get("server", [""])[0],
-            "channel": q.get("channel", [""])[0],
-            "nick": q.get("nick", [""])[0],
-            "type": q.get("type", [""])[0],
-            "query": q.get("query", [""])[0],
-            "date_from": q.get("date_from", [""])[0],
-            "date_to": q.get("date_to", [""])[0],
-        }
-        cnt = self.context.db.count(filters)
-        _json_response(self, {"count": cnt})
+        filters = _parse_filters(q)
+        key = _query_key("count", filters)
+        generation, etag, not_modified = self._conditional(key)
+        if not_modified:
+            return
+        data = self.context.cached_json(key, lambda: {"count": self.context.db.count(filters)}, generation)
+        _json_bytes_response(self, data, etag=etag)
 
     def _api_filters(self, parsed):
-        out = {
-            "server": self.context.db.distinct_values("server"),
-            "channel": self.context.db.distinct_values("channel"),
-            "nick": self.context.db.distinct_values("nick"),
-            "type": self.context.db.distinct_values("type"),
-        }
-        _json_response(self, out)
+        def compute():
+            return {
+                "server": self.context.db.distinct_values("server"),
+                "channel": self.context.db.distinct_values("channel"),
+                "nick": self.context.db.distinct_values("nick"),
+                "type": self.context.db.distinct_values("type"),
+            }
+        generation, etag, not_modified = self._conditional(("filters",))
+        if not_modified:
+            return
+        data = self.context.cached_json(("filters",), compute, generation)
+        _json_bytes_response(self, data, etag=etag, compressed=self.context.compressed_json(("filters",), generation, data))
 
     def _api_export_csv(self, parsed):
         # Construit un CSV avec les mêmes filtres et tri que /api/releases,
         # mais sans pagination (export complet)
         q = parse_qs(parsed.query)
-        filters = {
-            "server": q.get("server", [""])[0],
-            "channel": q.get("channel", [""])[0],
-            "nick": q.get("nick", [""])[0],
-            "type": q.get("type", [""])[0],
-            "query": q.get("query", [""])[0],
-            "date_from": q.get("date_from", [""])[0],
-            "date_to": q.get("date_to", [""])[0],
-        }
+        filters = _parse_filters(q)
+        sort_state = _parse_sort(q)
+        _, etag, not_modified = self._conditional(_query_key("export.csv", filters, sort_state))
+        if not_modified:
+            return
+
+        rows = self.context.db.iter_all(filters, order_by=sort_state)
+        headers = ["id", "ts_iso", "server", "channel", "nick", "type", "message"]
 
-        sort_param = q.get("sort", [""])[0]
-        sort_state = []
-        if sort_param:
-            for part in sort_param.split(","):
-                if ":" in part:
-                    col, direction = part.split(":", 1)
-                    col = col.strip()
-                    direction = direction.strip().upper()
-                    if direction not in ("ASC", "DESC"):
-                        direction = "DESC"
-                    if col in ("id", "ts", "ts_iso", "server", "channel", "nick", "message", "type"):
-                        sort_state.append((("ts" if col == "ts_iso" else col), direction))
-
-        rows = self.context.db.search_all(filters, order_by=sort_state)
-
-        # Générer CSV en mémoire
         buf = io.StringIO()
         writer = csv.writer(buf)
-        writer.writerow(["id", "ts_iso", "server", "channel", "nick", "type", "message"])
-        for r in rows:
-            writer.writerow([
-                r["id"],
-                r["ts_iso"],
-                r["server"],
-                r["channel"],
-                r["nick"],
-                r["type"],
-                r["message"],
-            ])
-
-        data = buf.getvalue().encode("utf-8")
-        self.send_response(200)
-        self.send_header("Content-Type", "text/csv; charset=utf-8")
+
+        def csv_row(values) -> str:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerow(values)
+            return buf.getvalue()
+
+        def csv_lines():
+            yield csv_row(headers)
+            for r in rows:
+                yield csv_row([r["id"], r["ts_iso"], r["server"], r["channel"], r["nick"], r["type"], r["message"]])
+
         # un nom générique; on pourrait ajouter date/filtre dans le nom
-        self.send_header("Content-Disposition", "attachment; filename=irc_releases.csv")
-        self.send_header("Content-Length", str(len(data)))
+        self._stream_text(csv_lines(), "text/csv; charset=utf-8", "irc_releases.csv", etag=etag)
+
+    def _stream_text(self, lines, content_type: str, filename: str, etag: str | None = None):
+        # Export complet diffusé par morceaux, sans matérialiser toutes les lignes
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
+        if self.request_version != "HTTP/1.1":
+            # Client HTTP/1.0: pas de chunked, on construit le corps en mémoire
+            data = "".join(lines).encode("utf-8")
+            return _send_body(self, data, content_type, etag=etag, headers=headers)
+
+        encoding = _negotiate_encoding(self.headers.get("Accept-Encoding"))
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Transfer-Encoding", "chunked")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", _cache_policy(self))
+        if etag:
+            self.send_header("ETag", etag)
         self.end_headers()
-        self.wfile.write(data)
+        out = ChunkedWriter(self.wfile, encoding)
+        for line in lines:
+            out.write(line.encode("utf-8"))
+        out.close()
+
+    def _api_export_ftp(self, parsed):
+        # Mêmes générateurs que la GUI (ftp_export); le script contient les
+        # identifiants FTP, d'où la restriction aux clients locaux par défaut.
+        if not self._is_local_client() and os.environ.get("WEB_FTP_EXPORT_REMOTE") != "1":
+            return _json_response(self, {"ok": False, "error": "Export FTP réservé aux clients locaux"}, status=403)
+        kind = "winscp" if parsed.path.endswith("winscp.txt") else "crossftp"
+        q = parse_qs(parsed.query)
+        try:
+            site = ftp_export.load_site(site_name=(q.get("site", [""])[0] or "").strip() or None)
+        except FileNotFoundError:
+            return _json_response(self, {"ok": False, "error": "Aucun fichier ftp_sites.json trouvé"}, status=404)
+        except ftp_export.FtpConfigError as e:
+            return _json_response(self, {"ok": False, "error": str(e)}, status=400)
+        filters = _parse_filters(q)
+        sort_state = _parse_sort(q)
+        rows = self.context.db.iter_all(filters, order_by=sort_state)
+        filename = "winscp_queue.txt" if kind == "winscp" else "crossftp_urls.txt"
+        self._stream_text(ftp_export.EXPORTERS[kind](rows, site), "text/plain; charset=utf-8", filename)
+
+    def _is_local_client(self) -> bool:
+        host = (self.client_address or ("",))[0]
+        return host in ("127.0.0.1", "::1", "localhost") or host.startswith("127.")
 
     def _api_irc_status(self):
         ctx = self.context
@@ -717,7 +1334,15 @@ class RequestHandler(BaseHTTPRequestHandler):
             connected = bool(getattr(ctx.irc, "connected", False))
         except Exception:
             connected = False
-        return _json_response(self, {"available": True, "connected": connected})
+        result = {"available": True, "connected": connected}
+        # Vivacité vue par le watchdog du logger: état, dernier message, PING/PONG, retard
+        liveness = getattr(ctx.irc, "liveness", None)
+        if callable(liveness):
+            try:
+                result["liveness"] = liveness()
+            except Exception:
+                result["liveness"] = None
+        return _json_response(self, result)
 
     def _api_irc_connect(self):
         ctx = self.context
@@ -753,7 +1378,12 @@ class RequestHandler(BaseHTTPRequestHandler):
         # Retourne la fin du fichier de logs irc_log.txt
         q = parse_qs(parsed.query)
         tail = int(q.get("tail", [200])[0])
-        tail = max(50, min(tail, 5000))
+        tail = max(50, min(tail, LOG_TAIL_LINES))
+        if self.context.log_tail is not None:
+            # Logger joignable: lignes tenues à jour en mémoire, sans relire le fichier
+            lines = self.context.log_tail.tail(tail)
+            text = "".join(line + "\n" for line in lines) if lines else "(Aucun log)"
+            return _json_response(self, {"ok": True, "text": text})
         # Le chemin est relatif au script irclog+.py
         base_dir = os.path.dirname(os.path.abspath(__file__))
         log_path = os.path.join(base_dir, "irc_log.txt")
@@ -767,131 +1397,87 @@ class RequestHandler(BaseHTTPRequestHandler):
         except Exception as e:
             return _json_response(self, {"ok": False, "error": str(e)}, status=500)
 
+    def _api_events(self, parsed):
+        # Server-Sent Events: releases enregistrées et état IRC poussés au navigateur
+        q = parse_qs(parsed.query)
+        wanted = [t for t in ",".join(q.get("topics", [])).split(",") if t in event_bus.TOPICS]
+        topics = tuple(wanted) or SSE_DEFAULT_TOPICS
+        ctx = self.context
+        if not ctx.sse_slot(+1):
+            return _json_response(self, {"ok": False, "error": "Trop de flux d'événements ouverts"}, status=503)
+        sub = ctx.bus.subscribe(topics, maxsize=SSE_QUEUE_SIZE, name="sse")
+        try:
+            # Flux sans fin: pas de longueur connue, la connexion n'est pas réutilisée
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n")
+            status = ctx.bus.last(event_bus.STATUS_CHANGED) if event_bus.STATUS_CHANGED in topics else None
+            if status is not None:
+                self.wfile.write(_sse_frame(status))
+            self.wfile.flush()
+            while True:
+                event = sub.get(SSE_HEARTBEAT)
+                # Commentaire périodique: garde la connexion ouverte à travers les proxies
+                self.wfile.write(_sse_frame(event) if event is not None else b": ping\n\n")
+                self.wfile.flush()
+                if event is not None and event.topic == event_bus.RELEASE_LOGGED:
+                    ctx.ingest.delivered(event.data.get("row_id"), "sse", event.data.get("recv_ts"))
+        except OSError:
+            pass
+        finally:
+            sub.close()
+            ctx.sse_slot(-1)
+
     def _api_irc_nfo(self, parsed):
         # Envoi de la commande !nfo <release> sur le channel fourni
         ctx = self.context
-        if not ctx or not hasattr(ctx, "irc") or ctx.irc is None:
-            return _json_response(self, {"ok": False, "error": "IRC indisponible"}, status=400)
         q = parse_qs(parsed.query)
         channel = (q.get("channel", [""])[0] or "").strip()
         release = (q.get("release", [""])[0] or "").strip()
         if not channel or not release:
             return _json_response(self, {"ok": False, "error": "Paramètres manquants"}, status=400)
-        cmd = "!nfo " + release
+        # URL déjà connue: réponse immédiate, sans solliciter le bot
+        entry = ctx.nfo.lookup(release)
+        if entry and entry["url"]:
+            return _json_response(self, {"ok": True, "sent": False, "cached": True, "url": entry["url"]})
+        if not hasattr(ctx, "irc") or ctx.irc is None:
+            return _json_response(self, {"ok": False, "error": "IRC indisponible"}, status=400)
         try:
-            # Envoi de la commande
-            sent = False
-            send_fn = getattr(ctx.irc, "send_privmsg", None)
-            if callable(send_fn):
-                sent = bool(send_fn(channel, cmd))
-            else:
-                client = getattr(ctx.irc, "client", None)
-                connected = getattr(ctx.irc, "connected", False)
-                if client is not None and connected:
-                    client.privmsg(channel, cmd)
-                    sent = True
+            # Envoi de la commande puis attente d'un lien dans les logs
+            sent, url_found = ctx.nfo.resolve(channel, release)
             if not sent:
                 return _json_response(self, {"ok": False, "error": "Client IRC non disponible ou déconnecté"}, status=500)
-            # Attendre un lien https dans les logs
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            log_path = os.path.join(base_dir, "irc_log.txt")
-            url_found = None
-            url_regex = re.compile(r'https?://\S+', re.IGNORECASE)
-            # Préparer le nick du bot pour filtrer les réponses en privmsg
-            my_nick = None
-            try:
-                nv = getattr(ctx.irc, "nick_var", None)
-                if nv:
-                    my_nick = nv.get().strip()
-            except Exception:
-                my_nick = None
-            deadline = time.time() + 10.0
-            while time.time() < deadline:
-                try:
-                    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
-                        lines = f.readlines()
-                    # Pass 1: lignes mentionnant Target: <nick> (privmsg au bot) ou @<channel>
-                    for line in lines[-500:]:
-                        if (my_nick and f"Target: {my_nick}" in line) or (f"@{channel}" in line):
-                            line_clean = re.sub(r'[\x00-\x1F\x7F]', '', line)
-                            # D’abord tenter le lien entre backticks
-                            tick_re = re.compile(r'`(https?://[^`\s]+)`', re.IGNORECASE)
-                            m_tick = tick_re.search(line_clean)
-                            candidates = []
-                            if m_tick:
-                                candidates.append(m_tick.group(1))
-                            # Sinon, fallback sur toutes les URLs de la ligne
-                            if not candidates:
-                                candidates = [m.group(0) for m in url_regex.finditer(line_clean)]
-                            if candidates:
-                                # Normaliser et sélectionner: préférer dupefr.fr/nfo7/, sinon dernier match
-                                normalized = []
-                                for u in candidates:
-                                    u = u.rstrip('.,)>]"\'`')
-                                    # Retirer codes de couleur IRC (\x03xx) et autres caractères de contrôle après .nfo
-                                    u = re.sub(r'(?<=\.nfo)\\x[0-9a-fA-F]{2,4}.*$', '', u)
-                                    u = re.sub(r'(?<=\.nfo)\d+$', '', u)
-                                    normalized.append(u)
-                                # Sélection NFO: tout lien https://… se terminant par .nfo (priorité dupefr.fr)
-                                nfo_any_re = re.compile(r'https?://[^`\s]+?\.nfo\b', re.IGNORECASE)
-                                nfo_any = [u for u in normalized if nfo_any_re.match(u)]
-                                if nfo_any:
-                                    preferred = [u for u in nfo_any if 'dupefr.fr' in u]
-                                    candidate = preferred[-1] if preferred else nfo_any[-1]
-                                    url_found = candidate
-                                    break
-                                # À défaut, garder dupefr.fr avec chemin /nfo*
-                                preferred = [u for u in normalized if 'dupefr.fr' in u and '/nfo' in u]
-                                if preferred:
-                                    candidate = preferred[-1]
-                                    url_found = candidate
-                                    break
-                                # Sinon, ne rien sélectionner sur cette ligne et continuer
-                    # Pass 2: si rien trouvé, chercher toute URL récente
-                    if not url_found:
-                        for line in lines[-500:]:
-                            line_clean = re.sub(r'[\x00-\x1F\x7F]', '', line)
-                            tick_re = re.compile(r'`(https?://[^`\s]+)`', re.IGNORECASE)
-                            m_tick = tick_re.search(line_clean)
-                            candidates = []
-                            if m_tick:
-                                candidates.append(m_tick.group(1))
-                            if not candidates:
-                                candidates = [m.group(0) for m in url_regex.finditer(line_clean)]
-                            if candidates:
-                                normalized = []
-                                for u in candidates:
-                                    u = u.rstrip('.,)>]"\'`')
-                                    # Retirer codes de couleur IRC (\x03xx) et autres caractères de contrôle après .nfo
-                                    u = re.sub(r'(?<=\.nfo)\\x[0-9a-fA-F]{2,4}.*$', '', u)
-                                    u = re.sub(r'(?<=\.nfo)\d+$', '', u)
-                                    normalized.append(u)
-                                # Sélection NFO: tout lien https://… se terminant par .nfo (priorité dupefr.fr)
-                                nfo_any_re = re.compile(r'https?://[^`\s]+?\.nfo\b', re.IGNORECASE)
-                                nfo_any = [u for u in normalized if nfo_any_re.match(u)]
-                                if nfo_any:
-                                    preferred = [u for u in nfo_any if 'dupefr.fr' in u]
-                                    candidate = preferred[-1] if preferred else nfo_any[-1]
-                                    url_found = candidate
-                                    break
-                                preferred = [u for u in normalized if 'dupefr.fr' in u and '/nfo' in u]
-                                if preferred:
-                                    candidate = preferred[-1]
-                                    url_found = candidate
-                                    break
-                                # Sinon, continuer sans rien sélectionner
-                    if url_found:
-                        break
-                except Exception:
-                    pass
-                time.sleep(0.5)
-            return _json_response(self, {"ok": True, "sent": True, "url": url_found})
+            return _json_response(self, {"ok": True, "sent": True, "cached": False, "url": url_found})
         except Exception as e:
             return _json_response(self, {"ok": False, "error": str(e)}, status=500)
 
+    def _api_nfo(self, parsed):
+        # Lecture seule du cache NFO; channel= permet de demander un préchargement en cas d'absence
+        ctx = self.context
+        q = parse_qs(parsed.query)
+        release = (q.get("release", [""])[0] or "").strip()
+        channel = (q.get("channel", [""])[0] or "").strip()
+        if not nfo_cache.release_key(release):
+            return _json_response(self, {"ok": False, "error": "Paramètre release manquant"}, status=400)
+        entry = ctx.nfo.lookup(release)
+        if entry is None:
+            queued = bool(channel) and ctx.irc is not None and ctx.nfo.prefetch(channel, release)
+            return _json_response(self, {"ok": False, "cached": False, "queued": queued,
+                                         "release": nfo_cache.release_key(release)}, status=404)
+        data = {"ok": True, "cached": True, "release": entry["release"], "url": entry["url"],
+                "fetched_at": entry["fetched_at"], "has_content": entry["content"] is not None,
+                "error": entry["error"]}
+        if q.get("content", ["0"])[0] == "1":
+            data["content"] = entry["content"]
+        return _json_response(self, data)
+
 
-def start_web_server(host: str = "0.0.0.0", port: int = 8000, irc_logger=None):
-    context = AppContext(DB_PATH, irc_logger=irc_logger)
+def start_web_server(host: str = "0.0.0.0", port: int = 8000, irc_logger=None, db_path: str = DB_PATH):
+    context = AppContext(db_path, irc_logger=irc_logger)
 
     class ContextualHandler(RequestHandler):
         pass
@@ -899,7 +1485,9 @@ def start_web_server(host: str = "0.0.0.0", port: int = 8000, irc_logger=None):
     # Injecter le contexte partagé
     ContextualHandler.context = context
 
-    httpd = HTTPServer((host, port), ContextualHandler)
+    httpd = ThreadingHTTPServer((host, port), ContextualHandler)
+    # Un thread par connexion: une connexion persistante inactive ne bloque pas les autres
+    httpd.daemon_threads = True
     print(f"Web UI prêt: http://{host if host != '0.0.0.0' else 'localhost'}:{port}/")
     try:
         httpd.serve_forever()
@@ -907,10 +1495,12 @@ def start_web_server(host: str = "0.0.0.0", port: int = 8000, irc_logger=None):
         pass
     finally:
         httpd.server_close()
+        context.close()
 
 
-def start_web_server_in_thread(host: str = "0.0.0.0", port: int = 8000, irc_logger=None) -> threading.Thread:
-    t = threading.Thread(target=start_web_server, args=(host, port, irc_logger), daemon=True)
+def start_web_server_in_thread(host: str = "0.0.0.0", port: int = 8000, irc_logger=None,
+                               db_path: str = DB_PATH) -> threading.Thread:
+    t = threading.Thread(target=start_web_server, args=(host, port, irc_logger, db_path), daemon=True)
     t.start()
     return t
 
@@ -919,4 +1509,8 @@ if __name__ == "__main__":
     # Permet lancer seul: python web_server.py
     host = os.environ.get("WEB_HOST", "0.0.0.0")
     port = int(os.environ.get("WEB_PORT", "8000"))
-    start_web_server(host=host, port=port)
\ No newline at end of file
+    # Lancé par la Suite (--web-process): le logger IRC est joint par IPC;
+    # s'il disparaît (Suite fermée), le processus s'arrête aussi.
+    irc_logger = irc_ipc.RemoteIrcLogger.from_env(on_lost=lambda: os._exit(0))
+    profiling.install_signal_handlers("web")
+    start_web_server(host=host, port=port, irc_logger=irc_logger)
\ No newline at end of file